@@ -0,0 +1,510 @@
+# analysis_jobs.py
+"""
+DB-backed work queue for bulk analysis.
+
+A CSV upload is recorded as an AnalysisJob and its reviews are split into
+AnalysisBatch rows in the same request (streamed, no file kept on the web node).
+The batches are committed in groups as they are written, so workers start on the
+first ones while the rest of the file is still being read, and no transaction
+holds the whole upload; the job stays 'splitting' until the last group is in.
+A taxonomy edit queues a job of batches of review ids to re-map.
+`flask analysis-worker` processes on any number of nodes claim batches with
+SELECT ... FOR UPDATE SKIP LOCKED and hold a lease while they work:
+
+- a batch is analyzed, its RawText/AspectSentiment rows written and the batch
+  marked done in one transaction, so a retry never duplicates reviews;
+- a worker renews its lease every third of ANALYSIS_LEASE_SECONDS while a batch
+  runs, so a slow batch is not reclaimed mid-run; a worker that dies stops
+  renewing and its lease expires, after which the batch is claimable again;
+- a failed batch goes back to pending with exponential backoff, and after
+  ANALYSIS_MAX_ATTEMPTS attempts it is quarantined for inspection
+  (`flask requeue-quarantined` puts it back).
+
+SQLite ignores FOR UPDATE; the conditional claim UPDATE keeps claiming safe
+there too, so the queue can be tested without MySQL.
+"""
+import datetime
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+
+from sqlalchemy import and_, case, func, insert, or_, select, update
+
+from models import db, AnalysisJob, AnalysisBatch, UploadedFile
+from ingestion import analyze_and_write, iter_review_chunks, DEFAULT_CHUNK_SIZE
+from taxonomy_remap import candidate_review_ids, remap_reviews
+
+logger = logging.getLogger(__name__)
+
+JOB_SPLITTING = 'splitting'
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+ACTIVE_JOB_STATUSES = (JOB_SPLITTING, JOB_QUEUED, JOB_RUNNING)
+
+JOB_KIND_CSV_UPLOAD = 'csv_upload'
+JOB_KIND_TAXONOMY_REMAP = 'taxonomy_remap'
+
+BATCH_PENDING = 'pending'
+BATCH_LEASED = 'leased'
+BATCH_DONE = 'done'
+BATCH_QUARANTINED = 'quarantined'
+
+LEASE_SECONDS = int(os.environ.get('ANALYSIS_LEASE_SECONDS', 600))
+MAX_ATTEMPTS = int(os.environ.get('ANALYSIS_MAX_ATTEMPTS', 5))
+RETRY_BASE_SECONDS = float(os.environ.get('ANALYSIS_RETRY_BASE_SECONDS', 30))
+RETRY_MAX_SECONDS = float(os.environ.get('ANALYSIS_RETRY_MAX_SECONDS', 3600))
+REMAP_BATCH_SIZE = int(os.environ.get('TAXONOMY_REMAP_BATCH_SIZE', 200))
+ENQUEUE_COMMIT_BATCHES = int(os.environ.get('ANALYSIS_ENQUEUE_COMMIT_BATCHES', 20))
+
+
+class LeaseLostError(RuntimeError):
+    """The batch's lease expired and another worker took it over."""
+
+
+class _LeaseRenewer(threading.Thread):
+    """
+    Extends a batch's lease every third of lease_seconds while the batch is being
+    processed. Renewals run on their own connection and commit at once, outside
+    the transaction doing the batch's work. Stops renewing once the lease is lost.
+    """
+
+    def __init__(self, engine, batch_id, worker_id, lease_seconds):
+        super().__init__(name=f"lease-renewer-{batch_id}", daemon=True)
+        self.engine = engine
+        self.batch_id = batch_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._stopped = threading.Event()
+
+    def renew(self):
+        """Extends the lease; returns False (and sets lost) if the worker no longer holds it."""
+        with self.engine.begin() as conn:
+            renewed = conn.execute(
+                update(AnalysisBatch)
+                .where(AnalysisBatch.id == self.batch_id, AnalysisBatch.status == BATCH_LEASED,
+                       AnalysisBatch.worker_id == self.worker_id)
+                .values(lease_expires_at=_utcnow() + datetime.timedelta(seconds=self.lease_seconds))
+            ).rowcount
+        if not renewed:
+            self.lost = True
+        return bool(renewed)
+
+    def run(self):
+        while not self._stopped.wait(self.lease_seconds / 3.0):
+            try:
+                if not self.renew():
+                    logger.warning(f"Lease on batch {self.batch_id} was lost while it was being processed.")
+                    return
+            except Exception as e:
+                # The next attempt may succeed before the lease runs out
+                logger.warning(f"Renewing the lease on batch {self.batch_id} failed: {e}")
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def _utcnow():
+    return datetime.datetime.utcnow()
+
+
+def enqueue_csv_upload(file_storage, user_id, batch_size=DEFAULT_CHUNK_SIZE, commit_batches=ENQUEUE_COMMIT_BATCHES):
+    """
+    Records the upload and splits its reviews into work batches, committing every
+    commit_batches batches. The job is 'splitting' until the whole file is read,
+    so workers that finish the early batches do not mark it complete. If reading
+    fails part-way, the batches already queued are still processed and the error
+    is kept on the job.
+    """
+    uploaded_file = UploadedFile(filename=file_storage.filename, user_id=user_id)
+    db.session.add(uploaded_file)
+    db.session.flush()
+    job = AnalysisJob(
+        user_id=user_id,
+        uploaded_file_id=uploaded_file.id,
+        kind=JOB_KIND_CSV_UPLOAD,
+        status=JOB_SPLITTING,
+        filename=file_storage.filename
+    )
+    db.session.add(job)
+    db.session.commit()
+    job_id = job.id
+
+    total_rows = 0
+    pending_rows = []
+
+    def flush_pending():
+        # Counters are incremented, not set: workers update the same row meanwhile
+        db.session.execute(insert(AnalysisBatch), pending_rows)
+        db.session.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id == job_id)
+            .values(total_rows=AnalysisJob.total_rows + sum(row['row_count'] for row in pending_rows),
+                    total_batches=AnalysisJob.total_batches + len(pending_rows))
+        )
+        db.session.commit()
+        pending_rows.clear()
+
+    try:
+        for review_strs in iter_review_chunks(file_storage.stream, batch_size):
+            pending_rows.append({
+                'job_id': job_id,
+                'seq_start': total_rows,
+                'row_count': len(review_strs),
+                'payload': json.dumps(review_strs),
+                'status': BATCH_PENDING,
+                'attempts': 0,
+                'available_at': _utcnow()
+            })
+            total_rows += len(review_strs)
+            if len(pending_rows) >= commit_batches:
+                flush_pending()
+        if pending_rows:
+            flush_pending()
+    except Exception as e:
+        db.session.rollback()
+        _end_splitting(job_id, f"Reading the upload failed after {total_rows} reviews: {type(e).__name__}: {e}")
+        raise
+
+    try:
+        total_bytes = file_storage.stream.tell()
+    except (AttributeError, OSError, ValueError):
+        total_bytes = None
+    job = _end_splitting(job_id, total_bytes=total_bytes)
+    logger.info(f"Queued analysis job {job.id} for '{job.filename}': {job.total_rows} reviews in {job.total_batches} batches.")
+    return job
+
+
+def _end_splitting(job_id, error=None, total_bytes=None):
+    """
+    Hands a split job over to the workers. Takes the job row lock, so a worker
+    finishing the last batch meanwhile either saw the job still splitting (and
+    left it) or waits and sees it handed over.
+    """
+    job = db.session.execute(
+        select(AnalysisJob).where(AnalysisJob.id == job_id)
+        .with_for_update().execution_options(populate_existing=True)
+    ).scalar_one()
+    job.total_bytes = total_bytes
+    job.status = JOB_RUNNING if job.started_at else JOB_QUEUED
+    if error is not None:
+        job.error = error
+    if job.total_batches == 0:
+        job.status = JOB_FAILED if error is not None else JOB_COMPLETED
+        job.finished_at = _utcnow()
+    else:
+        # Workers may already have done every batch while the file was being read
+        _finish_job_if_complete(job_id)
+    db.session.commit()
+    return job
+
+
+def enqueue_taxonomy_remap(patterns, batch_size=REMAP_BATCH_SIZE):
+    """
+    Queues re-mapping of the stored reviews whose text may contain one of the changed
+    taxonomy patterns (see taxonomy_remap.changed_patterns). Returns the job, or None
+    if no review is affected.
+    """
+    raw_text_ids = candidate_review_ids(patterns)
+    if not raw_text_ids:
+        return None
+    job = AnalysisJob(
+        kind=JOB_KIND_TAXONOMY_REMAP,
+        status=JOB_QUEUED,
+        filename=f"Taxonomy edit: {', '.join(sorted(patterns))}"[:255],
+        total_rows=len(raw_text_ids),
+        total_batches=(len(raw_text_ids) + batch_size - 1) // batch_size
+    )
+    db.session.add(job)
+    db.session.flush()
+    db.session.execute(insert(AnalysisBatch), [
+        {
+            'job_id': job.id,
+            'seq_start': start,
+            'row_count': len(raw_text_ids[start:start + batch_size]),
+            'payload': json.dumps(raw_text_ids[start:start + batch_size]),
+            'status': BATCH_PENDING,
+            'attempts': 0,
+            'available_at': _utcnow()
+        }
+        for start in range(0, len(raw_text_ids), batch_size)
+    ])
+    db.session.commit()
+    logger.info(f"Queued taxonomy re-map job {job.id}: {len(raw_text_ids)} reviews in {job.total_batches} batches.")
+    return job
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _claimable(now):
+    return or_(
+        and_(AnalysisBatch.status == BATCH_PENDING, AnalysisBatch.available_at <= now),
+        and_(AnalysisBatch.status == BATCH_LEASED, AnalysisBatch.lease_expires_at < now)
+    )
+
+
+def claim_next_batch(worker_id, lease_seconds=LEASE_SECONDS):
+    """
+    Leases the next claimable batch to worker_id and returns it, or None.
+
+    The candidate row is locked with FOR UPDATE SKIP LOCKED, so concurrent
+    workers on MySQL pass over each other's candidates instead of queueing
+    behind them. A batch whose expired lease already used up its attempts is
+    quarantined instead of being handed out again.
+    """
+    while True:
+        now = _utcnow()
+        batch = db.session.execute(
+            select(AnalysisBatch)
+            .where(_claimable(now))
+            .order_by(AnalysisBatch.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar_one_or_none()
+        if batch is None:
+            db.session.rollback()
+            return None
+
+        if batch.status == BATCH_LEASED and batch.attempts >= MAX_ATTEMPTS:
+            _quarantine(batch, f"Lease expired on attempt {batch.attempts} (worker {batch.worker_id}).")
+            db.session.commit()
+            continue
+
+        # Conditional on the state just read: a no-op if another worker claimed it meanwhile
+        claimed = db.session.execute(
+            update(AnalysisBatch)
+            .where(AnalysisBatch.id == batch.id, _claimable(now))
+            .values(status=BATCH_LEASED, worker_id=worker_id, attempts=AnalysisBatch.attempts + 1,
+                    lease_expires_at=now + datetime.timedelta(seconds=lease_seconds))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            db.session.rollback()
+            continue
+
+        # A job still splitting stays so until enqueue_csv_upload hands it over
+        db.session.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id == batch.job_id, AnalysisJob.started_at.is_(None))
+            .values(status=case((AnalysisJob.status == JOB_QUEUED, JOB_RUNNING), else_=AnalysisJob.status),
+                    started_at=now, worker_id=worker_id)
+        )
+        db.session.commit()
+        db.session.refresh(batch)
+        return batch
+
+
+def _run_batch(job, batch, processor):
+    """Does the work of a batch (without committing). Returns (reviews, aspect rows written, dedup hits)."""
+    payload = json.loads(batch.payload)
+    if job.kind == JOB_KIND_TAXONOMY_REMAP:
+        # The edit that queued the job must be loaded, whatever the check interval
+        processor.current_taxonomy(max_age=0)
+        remapped, aspects_written, sentiments_reused = remap_reviews(processor, payload)
+        logger.info(f"Re-mapped {remapped} reviews of batch {batch.id} ({sentiments_reused} of {aspects_written} aspect sentiments reused).")
+        return len(payload), aspects_written, 0
+    aspects_written, dedup_hits = analyze_and_write(processor, job.user_id, job.uploaded_file_id, batch.seq_start, payload)
+    return len(payload), aspects_written, dedup_hits
+
+
+def process_batch(batch, processor, worker_id, lease_seconds=LEASE_SECONDS):
+    """
+    Analyzes a leased batch and stores its reviews, marking it done in the same
+    transaction. The lease is renewed while the work runs. On failure the batch
+    is rescheduled with backoff or quarantined.
+    """
+    job = db.session.get(AnalysisJob, batch.job_id)
+    batch_id, job_id, attempts = batch.id, batch.job_id, batch.attempts
+    renewer = _LeaseRenewer(db.engine, batch_id, worker_id, lease_seconds)
+    renewer.start()
+    try:
+        try:
+            rows, aspects_written, dedup_hits = _run_batch(job, batch, processor)
+        finally:
+            # Stopped before this transaction touches the batch row, which a renewal would wait on
+            renewer.stop()
+        if renewer.lost:
+            raise LeaseLostError(f"Lease on batch {batch_id} was lost while it was being processed.")
+
+        # Only commit while still holding the lease; otherwise another worker owns the batch
+        still_leased = db.session.execute(
+            update(AnalysisBatch)
+            .where(AnalysisBatch.id == batch_id, AnalysisBatch.status == BATCH_LEASED,
+                   AnalysisBatch.worker_id == worker_id)
+            .values(status=BATCH_DONE, finished_at=_utcnow(), last_error=None)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not still_leased:
+            raise LeaseLostError(f"Lease on batch {batch_id} was lost before it finished.")
+
+        db.session.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id == job_id)
+            .values(batches_done=AnalysisJob.batches_done + 1,
+                    processed_rows=AnalysisJob.processed_rows + rows,
+                    aspects_count=AnalysisJob.aspects_count + aspects_written,
+                    dedup_hits=AnalysisJob.dedup_hits + dedup_hits)
+        )
+        _finish_job_if_complete(job_id)
+        db.session.commit()
+        logger.info(f"Batch {batch_id} of job {job_id} done ({rows} reviews, {aspects_written} aspects, {dedup_hits} dedup hits).")
+        return True
+    except LeaseLostError as e:
+        db.session.rollback()
+        logger.warning(str(e))
+        return False
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Batch {batch_id} of job {job_id} failed on attempt {attempts}: {e}", exc_info=True)
+        _record_failure(batch_id, worker_id, attempts, f"{type(e).__name__}: {e}")
+        return False
+
+
+def _retry_delay(attempts):
+    """Exponential backoff with jitter: base * 2^(attempts-1), capped."""
+    delay = min(RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)), RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _record_failure(batch_id, worker_id, attempts, error):
+    batch = db.session.execute(
+        select(AnalysisBatch).where(AnalysisBatch.id == batch_id).with_for_update()
+    ).scalar_one()
+    if batch.status != BATCH_LEASED or batch.worker_id != worker_id:
+        db.session.rollback()
+        return
+    if attempts >= MAX_ATTEMPTS:
+        _quarantine(batch, error)
+    else:
+        batch.status = BATCH_PENDING
+        batch.last_error = error
+        batch.lease_expires_at = None
+        batch.available_at = _utcnow() + datetime.timedelta(seconds=_retry_delay(attempts))
+        logger.info(f"Batch {batch_id} will be retried after {batch.available_at.isoformat()} (attempt {attempts} of {MAX_ATTEMPTS}).")
+    db.session.commit()
+
+
+def _quarantine(batch, error):
+    """Parks a poison batch; the rest of its job carries on."""
+    logger.error(f"Quarantining batch {batch.id} of job {batch.job_id} after {batch.attempts} attempts: {error}")
+    batch.status = BATCH_QUARANTINED
+    batch.last_error = error
+    batch.lease_expires_at = None
+    batch.finished_at = _utcnow()
+    db.session.execute(
+        update(AnalysisJob)
+        .where(AnalysisJob.id == batch.job_id)
+        .values(batches_quarantined=AnalysisJob.batches_quarantined + 1,
+                error=f"{error} (batch {batch.id})")
+    )
+    _finish_job_if_complete(batch.job_id)
+
+
+def _finish_job_if_complete(job_id):
+    """
+    Marks the job finished once every batch is done or quarantined. Runs after the
+    counter UPDATE in the same transaction, which holds the job row lock, so exactly
+    one worker sees the final count.
+    """
+    job = db.session.execute(
+        select(AnalysisJob).where(AnalysisJob.id == job_id).execution_options(populate_existing=True)
+    ).scalar_one()
+    if job.status == JOB_SPLITTING or job.batches_done + job.batches_quarantined < job.total_batches:
+        return
+    job.status = JOB_COMPLETED if job.batches_done else JOB_FAILED
+    job.finished_at = _utcnow()
+    if job.batches_quarantined:
+        job.error = f"{job.batches_quarantined} of {job.total_batches} batches quarantined. Last error: {job.error}"
+    logger.info(f"Analysis job {job.id} {job.status}: {job.processed_rows} of {job.total_rows} reviews stored "
+                f"({job.dedup_hits} dedup hits), {job.aspects_count} aspects.")
+
+
+def requeue_quarantined(job_id=None):
+    """Puts quarantined batches back in the queue with a fresh attempt budget."""
+    query = select(AnalysisBatch).where(AnalysisBatch.status == BATCH_QUARANTINED)
+    if job_id is not None:
+        query = query.where(AnalysisBatch.job_id == job_id)
+    batches = db.session.execute(query).scalars().all()
+    for batch in batches:
+        batch.status = BATCH_PENDING
+        batch.attempts = 0
+        batch.available_at = _utcnow()
+        batch.finished_at = None
+        db.session.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id == batch.job_id)
+            .values(batches_quarantined=AnalysisJob.batches_quarantined - 1, finished_at=None,
+                    # A job no worker has started yet goes back to queued, not running
+                    status=case((AnalysisJob.status == JOB_SPLITTING, JOB_SPLITTING),
+                                (AnalysisJob.started_at.is_(None), JOB_QUEUED), else_=JOB_RUNNING))
+        )
+    db.session.commit()
+    return len(batches)
+
+
+def run_worker(processor, poll_interval=2.0, once=False, worker_id=None):
+    """Claims and processes batches until stopped; with once=True, returns when nothing is claimable."""
+    worker_id = worker_id or default_worker_id()
+    logger.info(f"Analysis worker {worker_id} started (lease {LEASE_SECONDS}s, max attempts {MAX_ATTEMPTS}).")
+    while True:
+        batch = claim_next_batch(worker_id)
+        if batch is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+        process_batch(batch, processor, worker_id, LEASE_SECONDS)
+
+
+def queue_stats():
+    """Batch counts per status, for monitoring."""
+    rows = db.session.execute(
+        select(AnalysisBatch.status, func.count(AnalysisBatch.id)).group_by(AnalysisBatch.status)
+    ).all()
+    return {status: count for status, count in rows}
+
+
+def job_status(job):
+    """JSON-ready progress report of a job."""
+    now = _utcnow()
+    elapsed = None
+    if job.started_at:
+        elapsed = ((job.finished_at or now) - job.started_at).total_seconds()
+
+    if job.status == JOB_COMPLETED:
+        progress = 1.0
+    elif job.total_batches:
+        progress = (job.batches_done + job.batches_quarantined) / job.total_batches
+    else:
+        progress = 0.0
+
+    return {
+        'id': job.id,
+        'status': job.status,
+        'filename': job.filename,
+        'progress': round(progress, 4),
+        'total_rows': job.total_rows,
+        'processed_rows': job.processed_rows,
+        'aspects': job.aspects_count,
+        'dedup_hits': job.dedup_hits,
+        'batches': {
+            'total': job.total_batches,
+            'done': job.batches_done,
+            'quarantined': job.batches_quarantined
+        },
+        'rows_per_second': round(job.processed_rows / elapsed, 2) if elapsed else 0.0,
+        'elapsed_seconds': round(elapsed, 1) if elapsed is not None else None,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
@@ -4,17 +4,23 @@ from routes.admin_auth import admin_auth_bp
 from routes.admin_dashboard import admin_dashboard_bp
 from werkzeug.security import generate_password_hash, check_password_hash
 from nlp_processor import NLPProcessor 
-from models import User, RawText, db, AspectSentiment, Admin
+from inference_server import InferenceServer
+from analysis_jobs import enqueue_csv_upload, run_worker, requeue_quarantined, ACTIVE_JOB_STATUSES
+from ingestion import content_hash
+from taxonomy_remap import index_reviews, rebuild_index
+from rollups import add_reviews, remove_reviews, rebuild_rollups
+from models import User, RawText, db, AspectSentiment, Admin, AnalysisJob
 from flask_cors import CORS
 import jwt
 import datetime
 import os
 from dotenv import load_dotenv
 from routes.analysis import analysis_bp
+from routes.jobs import jobs_bp
 from sqlalchemy.orm import joinedload
-import pandas as pd 
 import logging 
 from flask_migrate import Migrate
+import click
 
 # Load environment variables
 load_dotenv()
@@ -60,6 +66,7 @@ nlp_processor_instance = None
 app.register_blueprint(admin_auth_bp)
 app.register_blueprint(admin_dashboard_bp)
 app.register_blueprint(analysis_bp)
+app.register_blueprint(jobs_bp)
 
 UPLOAD_FOLDER = "uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -74,12 +81,13 @@ def _highlight_aspects_in_text(review_content, aspect_sentiments):
     if not review_content or not aspect_sentiments:
         return review_content
 
-    # Use the global nlp_processor_instance here
-    if nlp_processor_instance is None or nlp_processor_instance.nlp is None:
-        logger.warning("spaCy NLP model not initialized in _highlight_aspects_in_text. Aspect highlighting skipped.")
+    # Only sentence boundaries are needed, so this never loads the models
+    sentence_splitter = nlp_processor_instance.sentence_splitter() if nlp_processor_instance is not None else None
+    if sentence_splitter is None:
+        logger.warning("spaCy sentence splitter not available in _highlight_aspects_in_text. Aspect highlighting skipped.")
         return review_content
 
-    doc = nlp_processor_instance.nlp(review_content) 
+    doc = sentence_splitter(review_content)
 
     final_highlighted_review_parts = []
 
@@ -256,85 +264,18 @@ def my_reviews():
     for cat in categories:
         logger.info(f"  - Category: {cat['name']} (ID: {cat['id']}) with {len(cat['aspects'])} aspects")
 
-    # Ensure NLPProcessor is initialized if it somehow wasn't (e.g. during specific requests)
-    # This acts as a safeguard. The main initialization is in the app context startup.
-    global nlp_processor_instance
-    if nlp_processor_instance is None or not nlp_processor_instance.initialized:
-        logger.warning("nlp_processor_instance not fully initialized within my_reviews. Attempting re-init.")
-        # This will get the existing singleton if it was partially created, or create a new one
-        nlp_processor_instance = NLPProcessor() 
-        if not nlp_processor_instance.init_nlp():
-            logger.error("Failed to re-initialize NLP models. Cannot process reviews.")
-            flash("Error: NLP models could not be initialized. Please contact support.", "danger")
-            # Consider returning early or providing a degraded experience
-            raw_texts = RawText.query.filter_by(user_id=user.id).options(db.joinedload(RawText.aspect_sentiments)).order_by(RawText.id.desc()).all()
-            for text in raw_texts:
-                text.highlighted_content = text.content # No highlighting if NLP failed
-            return render_template("my_reviews.html", raw_texts=raw_texts, categories=categories)
-
-
     if request.method == "POST":
         if "file" in request.files:
             file = request.files.get("file")
             if file and file.filename.endswith(".csv"):
                 try:
-                    df = pd.read_csv(file, encoding='latin1')
-                    review_col = df.columns[0] # Assumes the first column contains the reviews
-
-                    reviews_processed_count = 0
-                    for review_text in df[review_col].dropna():
-                        review_str = str(review_text)
-
-                        # Process overall sentiment
-                        overall_sentiment_result = nlp_processor_instance.analyze_sentiment(review_str) 
-                        logger.info(f"CSV Review Overall Sentiment: {overall_sentiment_result['label']}, Score: {overall_sentiment_result['score']}")
-
-                        new_raw_text = RawText(
-                            content=review_str,
-                            user_id=user.id,
-                            sentiment=overall_sentiment_result["label"],
-                            score=overall_sentiment_result["score"]
-                        )
-                        db.session.add(new_raw_text)
-                        db.session.flush() # Flush to get new_raw_text.id
-
-                        # Process aspects
-                        extracted_aspects_raw = nlp_processor_instance.extract_aspects(review_str) 
-
-                        # Store fully analyzed aspects to save to DB
-                        for aspect_data_raw in extracted_aspects_raw:
-                            aspect_sentiment_result = nlp_processor_instance.analyze_aspect_sentiment(
-                                sentence=aspect_data_raw.get('sentence'),
-                                aspect_keyword=aspect_data_raw.get('keyword_found'),
-                                aspect_start=aspect_data_raw.get('start_char'),
-                                aspect_end=aspect_data_raw.get('end_char')
-                            )
-                            
-                            # Create and save AspectSentiment entry
-                            new_aspect_sentiment = AspectSentiment(
-                                raw_text_id=new_raw_text.id,
-                                raw_extracted_aspect=aspect_data_raw['raw_extracted_aspect'],
-                                keyword_found=aspect_data_raw['keyword_found'],
-                                sentence=aspect_data_raw['sentence'],
-                                sentiment=aspect_sentiment_result['label'],
-                                score=aspect_sentiment_result['score'],
-                                aspect_id=aspect_data_raw['aspect_category_id'],
-                                start_char=aspect_data_raw['start_char'],
-                                end_char=aspect_data_raw['end_char']
-                            )
-                            db.session.add(new_aspect_sentiment)
-                            logger.debug(f"Created AspectSentiment for '{new_aspect_sentiment.raw_extracted_aspect}'. Aspect ID: {new_aspect_sentiment.aspect_id}, Keyword: '{new_aspect_sentiment.keyword_found}', Sentiment: {new_aspect_sentiment.sentiment}")
-
-                        db.session.commit() # Commit changes for this review and its aspects
-                        reviews_processed_count += 1
-
-                    if reviews_processed_count > 0:
-                        flash(f"{reviews_processed_count} reviews from '{file.filename}' uploaded & analyzed successfully!", "success")
-                    else:
-                        flash("No valid reviews found in CSV.", "warning")
+                    # Split into batches analyzed by `flask analysis-worker` nodes; the page polls /jobs/<id>
+                    job = enqueue_csv_upload(file, user.id)
+                    flash(f"'{file.filename}' uploaded. Analysis is running in the background (job #{job.id}).", "success")
 
                 except Exception as e:
                     logger.error(f"Error processing file: {e}", exc_info=True) 
+                    db.session.rollback()
                     flash(f"Error processing file: {e}", "danger")
             else:
                 flash("Please select a valid CSV file.", "danger")
@@ -342,30 +283,37 @@ def my_reviews():
         elif "raw_text" in request.form:
             raw_text_content = request.form.get("raw_text")
             if raw_text_content.strip():
-                # Process overall sentiment
-                overall_sentiment_result = nlp_processor_instance.analyze_sentiment(raw_text_content) 
+                # Only this branch analyzes in the request, so models load here on first use;
+                # CSV uploads are analyzed by the workers
+                if not nlp_processor_instance.init_nlp():
+                    logger.error("Failed to initialize NLP models. Cannot process reviews.")
+                    flash("Error: NLP models could not be initialized. Please contact support.", "danger")
+                    return redirect(url_for("my_reviews"))
+
+                # Process aspects
+                extracted_aspects_raw = nlp_processor_instance.extract_aspects(raw_text_content) 
+
+                # Overall sentiment and every aspect context window scored in one batch
+                overall_sentiment_result, aspect_sentiment_results = nlp_processor_instance.analyze_review(
+                    raw_text_content, extracted_aspects_raw
+                )
                 logger.info(f"Raw Text Overall Sentiment: {overall_sentiment_result['label']}, Score: {overall_sentiment_result['score']}")
 
                 new_raw_text = RawText(
                     content=raw_text_content,
                     user_id=user.id,
                     sentiment=overall_sentiment_result["label"],
-                    score=overall_sentiment_result["score"]
+                    score=overall_sentiment_result["score"],
+                    # Lets later uploads of the same text reuse this analysis
+                    content_hash=content_hash(raw_text_content),
+                    analysis_version=nlp_processor_instance.analysis_version()
                 )
                 db.session.add(new_raw_text)
                 db.session.flush() # Flush to get new_raw_text.id
+                index_reviews([(new_raw_text.id, raw_text_content)])
 
-                # Process aspects
-                extracted_aspects_raw = nlp_processor_instance.extract_aspects(raw_text_content) 
                 # Store fully analyzed aspects to save to DB
-                for aspect_data_raw in extracted_aspects_raw:
-                    aspect_sentiment_result = nlp_processor_instance.analyze_aspect_sentiment(
-                        sentence=aspect_data_raw['sentence'],
-                        aspect_keyword=aspect_data_raw['keyword_found'],
-                        aspect_start=aspect_data_raw['start_char'],
-                        aspect_end=aspect_data_raw['end_char']
-                    )
-                    
+                for aspect_data_raw, aspect_sentiment_result in zip(extracted_aspects_raw, aspect_sentiment_results):
                     # Create and save AspectSentiment entry
                     new_aspect_sentiment = AspectSentiment(
                         raw_text_id=new_raw_text.id,
@@ -381,6 +329,8 @@ def my_reviews():
                     db.session.add(new_aspect_sentiment)
                     logger.debug(f"Created AspectSentiment for '{new_aspect_sentiment.raw_extracted_aspect}'. Aspect ID: {new_aspect_sentiment.aspect_id}, Keyword: '{new_aspect_sentiment.keyword_found}', Sentiment: {new_aspect_sentiment.sentiment}")
 
+                db.session.flush()
+                add_reviews([new_raw_text.id])
                 db.session.commit() # Commit changes for this review and its aspects
                 flash("Raw text saved & analyzed successfully!", "success")
             else:
@@ -497,8 +447,13 @@ def my_reviews():
     # Calculate average confidence
     avg_confidence = round((total_confidence / confidence_count * 100)) if confidence_count > 0 else 0
 
+    active_jobs = AnalysisJob.query.filter(
+        AnalysisJob.user_id == user.id, AnalysisJob.status.in_(ACTIVE_JOB_STATUSES)
+    ).order_by(AnalysisJob.id).all()
+
     return render_template("my_reviews.html", 
                          raw_texts=raw_texts, 
+                         active_jobs=active_jobs,
                          categories=categories,
                          total_aspects=total_aspects,
                          positive_count=positive_count,
@@ -514,6 +469,7 @@ def delete_raw_text(text_id):
 
     text_to_delete = RawText.query.get_or_404(text_id)
     if text_to_delete.user_id == session['user_id']:
+        remove_reviews([text_to_delete.id])
         db.session.delete(text_to_delete)
         db.session.commit()
         flash("Raw text deleted successfully!", "success")
@@ -602,6 +558,59 @@ def create_admin():
     logger.info(f"Admin {username} created successfully!")
 
 
+@app.cli.command("analysis-worker")
+@click.option('--poll-interval', default=2.0, type=float, help='Seconds to wait when the queue is empty.')
+@click.option('--once', is_flag=True, help='Exit when no claimable batch is left.')
+def analysis_worker(poll_interval, once):
+    """Processes queued analysis batches (CSV uploads). Run as many as needed, on any number of nodes."""
+    processor = NLPProcessor()
+    if not processor.init_nlp():
+        logger.error("NLP models failed to initialize. Analysis worker not started.")
+        return
+    run_worker(processor, poll_interval=poll_interval, once=once)
+
+
+@app.cli.command("requeue-quarantined")
+@click.option('--job-id', type=int, default=None, help='Only requeue batches of this job.')
+def requeue_quarantined_command(job_id):
+    """Puts quarantined analysis batches back in the queue (after fixing the cause)."""
+    count = requeue_quarantined(job_id)
+    logger.info(f"Requeued {count} quarantined batches.")
+
+
+@app.cli.command("rebuild-review-index")
+@click.option('--batch-size', default=1000, type=int)
+def rebuild_review_index(batch_size):
+    """Rebuilds the word index used to re-map reviews after taxonomy edits (run once after upgrading)."""
+    count = rebuild_index(batch_size)
+    logger.info(f"Review index rebuilt for {count} reviews.")
+
+
+@app.cli.command("rebuild-rollups")
+@click.option('--batch-size', default=5000, type=int)
+def rebuild_rollups_command(batch_size):
+    """Recomputes the daily aspect rollup behind the dashboards (run once after upgrading)."""
+    count = rebuild_rollups(batch_size)
+    logger.info(f"Daily rollup rebuilt from {count} reviews.")
+
+
+@app.cli.command("inference-server")
+@click.option('--socket', 'socket_path', default=lambda: os.environ.get('NLP_INFERENCE_SOCKET', '/tmp/customer_review_nlp.sock'),
+              help='Unix socket to listen on (workers use NLP_INFERENCE_SOCKET).')
+@click.option('--max-batch-size', default=lambda: int(os.environ.get('NLP_INFERENCE_MAX_BATCH_SIZE', 32)), type=int)
+@click.option('--max-wait-ms', default=lambda: float(os.environ.get('NLP_INFERENCE_MAX_WAIT_MS', 5)), type=float)
+@click.option('--starvation-ms', default=lambda: float(os.environ.get('NLP_INFERENCE_STARVATION_MS', 500)), type=float,
+              help='Bulk work waiting this long goes ahead of interactive work in the next batch.')
+def inference_server(socket_path, max_batch_size, max_wait_ms, starvation_ms):
+    """Runs the shared NLP inference daemon for the gunicorn workers on this node."""
+    processor = NLPProcessor()
+    processor.use_local_models()
+    if not processor.init_nlp():
+        logger.error("NLP models failed to initialize. Inference server not started.")
+        return
+    InferenceServer(app, processor, socket_path, max_batch_size, max_wait_ms, starvation_ms).serve_forever()
+
+
 # ------------------------
 # Run App
 # ------------------------
@@ -612,12 +621,15 @@ with app.app_context():
     # db.create_all()  # Disabled to prevent schema conflicts with Alembic
     logger.info("Database tables checked/created.")
 
-    # NOW initialize NLP models within the app context using the global instance
     nlp_processor_instance = NLPProcessor() # Get (or create if first time) the singleton
-    if not nlp_processor_instance.init_nlp():
-        logger.error("NLP models failed to initialize. Application may not function correctly.")
-    else:
-        logger.info("NLP models initialized successfully.")
+    # Models load lazily on first use, so CLI commands and migrations start fast.
+    # NLP_PRELOAD=1 (set by gunicorn.conf.py in preload mode) loads them here instead,
+    # so that forked workers share them.
+    if os.environ.get('NLP_PRELOAD') == '1':
+        if not nlp_processor_instance.init_nlp():
+            logger.error("NLP models failed to initialize. Application may not function correctly.")
+        else:
+            logger.info("NLP models initialized successfully.")
 
 # Only run app directly if this script is executed, not when imported by Gunicorn
 if __name__ == '__main__':
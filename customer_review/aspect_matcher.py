@@ -0,0 +1,132 @@
+# aspect_matcher.py
+import re
+from collections import deque
+from difflib import get_close_matches
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over a fixed set of lowercase patterns.
+    find_all() returns every pattern that occurs as a substring of the text
+    (overlapping hits included) in a single pass over the text.
+    """
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        self.patterns = set()
+
+        for pattern in patterns:
+            if not pattern or pattern in self.patterns:
+                continue
+            self.patterns.add(pattern)
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                state = next_state
+            self._output[state] = self._output[state] + (pattern,)
+
+        # Breadth-first pass to wire failure links and merge outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find_all(self, text):
+        found = set()
+        if not self.patterns:
+            return found
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+class AspectMatcher:
+    """
+    Compiled lookup structure for mapping extracted aspect text to a predefined aspect.
+
+    Built once from the aspect/keyword mapping loaded by NLPProcessor. The rank of an
+    aspect (and of a keyword within its aspect) is its position in that mapping, so
+    picking the lowest-ranked hit reproduces the precedence of the old linear scan:
+    aspect name first, then exact, substring and token keyword matches.
+    """
+
+    def __init__(self, aspect_category_keywords):
+        self.name_index = {}      # aspect name / name token -> (rank, aspect_id, name)
+        self.keyword_index = {}   # keyword -> (rank, aspect_id, keyword)
+        self.empty_keyword_hit = None
+        self.aspect_names = []
+        self._fuzzy_name_index = {}
+
+        for aspect_rank, (aspect_id, aspect_info) in enumerate(aspect_category_keywords.items()):
+            aspect_name_normalized = aspect_info['aspect_name'].lower()
+            self.name_index.setdefault(aspect_name_normalized, (aspect_rank, aspect_id, aspect_name_normalized))
+            self.aspect_names.append(aspect_name_normalized)
+            self._fuzzy_name_index.setdefault(aspect_name_normalized, (aspect_id, aspect_info['aspect_name']))
+
+            for keyword_rank, keyword in enumerate(aspect_info['keywords']):
+                rank = (aspect_rank, keyword_rank)
+                if not keyword:
+                    # An empty keyword is a substring of everything
+                    if self.empty_keyword_hit is None or rank < self.empty_keyword_hit[0]:
+                        self.empty_keyword_hit = (rank, aspect_id, keyword)
+                    continue
+                existing = self.keyword_index.get(keyword)
+                if existing is None or rank < existing[0]:
+                    self.keyword_index[keyword] = (rank, aspect_id, keyword)
+
+        self.automaton = KeywordAutomaton(self.keyword_index.keys())
+
+    @staticmethod
+    def normalize(text):
+        return re.sub(r'[^a-z0-9\s]', ' ', text.lower()).strip()
+
+    def match_name(self, normalized_text, tokens):
+        """Aspect name equal to the whole text or to one of its tokens."""
+        best = self.name_index.get(normalized_text)
+        for token in tokens:
+            hit = self.name_index.get(token)
+            if hit is not None and (best is None or hit[0] < best[0]):
+                best = hit
+        if best is None:
+            return None, None
+        return best[1], best[2]
+
+    def match_keyword(self, normalized_text):
+        """
+        Lowest-ranked keyword contained in the text. Exact and token matches are
+        special cases of a substring hit, so one automaton pass covers all three.
+        """
+        best = self.empty_keyword_hit
+        for keyword in self.automaton.find_all(normalized_text):
+            hit = self.keyword_index[keyword]
+            if best is None or hit[0] < best[0]:
+                best = hit
+        if best is None:
+            return None, None
+        return best[1], best[2]
+
+    def match_fuzzy(self, normalized_text):
+        close = get_close_matches(normalized_text, self.aspect_names, n=1, cutoff=0.8)
+        if not close:
+            return None, None
+        return self._fuzzy_name_index[close[0]]
@@ -0,0 +1,94 @@
+"""
+Benchmark: noun-chunk vs PhraseMatcher aspect extraction.
+
+Runs both extraction modes of NLPProcessor over the reviews in a CSV file
+(first column, same as the upload form) and reports throughput and the recall
+of the PhraseMatcher mode, using the noun-chunk output as the reference.
+
+Usage (from the customer_review directory, with DATABASE_URL pointing at a
+database that has the aspect taxonomy loaded):
+
+    python benchmarks/bench_aspect_extraction.py reviews.csv --limit 2000
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Measure extraction, not lookups in the on-disk cache filled by earlier runs and the warm-up.
+# Set before the app import, which creates the NLPProcessor singleton.
+os.environ['NLP_PERSISTENT_CACHE_PATH'] = ''
+
+from app import app  # noqa: E402
+from nlp_processor import NLPProcessor  # noqa: E402
+
+
+def load_reviews(path, limit):
+    reviews = []
+    with open(path, newline='', encoding='latin1') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # header row, as pd.read_csv does in the upload path
+        for row in reader:
+            if row and row[0].strip():
+                reviews.append(row[0])
+            if limit and len(reviews) >= limit:
+                break
+    return reviews
+
+
+def run_mode(processor, mode, reviews, n_process, batch_size):
+    processor.aspect_extraction_mode = mode
+    # Warm-up so matcher compilation is not counted as extraction time
+    list(processor.extract_aspects_many(reviews[:10], n_process=1, batch_size=batch_size))
+
+    found = {}
+    started = time.perf_counter()
+    for index, aspects in processor.extract_aspects_many(reviews, n_process=n_process, batch_size=batch_size):
+        found[index] = {aspect['aspect_category_id'] for aspect in aspects}
+    elapsed = time.perf_counter() - started
+    return found, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('csv_path')
+    parser.add_argument('--limit', type=int, default=0, help='Only use the first N reviews')
+    parser.add_argument('--n-process', type=int, default=1)
+    parser.add_argument('--batch-size', type=int, default=64)
+    args = parser.parse_args()
+
+    reviews = load_reviews(args.csv_path, args.limit)
+    if not reviews:
+        print("No reviews found.")
+        return
+
+    with app.app_context():
+        processor = NLPProcessor()
+        if not processor.init_nlp():
+            print("NLP models failed to initialize.")
+            return
+
+        original_mode = processor.aspect_extraction_mode
+        reference, chunk_seconds = run_mode(processor, 'noun_chunks', reviews, args.n_process, args.batch_size)
+        candidate, matcher_seconds = run_mode(processor, 'phrase_matcher', reviews, args.n_process, args.batch_size)
+        processor.aspect_extraction_mode = original_mode
+
+    reference_total = sum(len(ids) for ids in reference.values())
+    candidate_total = sum(len(ids) for ids in candidate.values())
+    overlap = sum(len(reference[i] & candidate.get(i, set())) for i in reference)
+
+    recall = overlap / reference_total if reference_total else 0.0
+    precision = overlap / candidate_total if candidate_total else 0.0
+
+    print(f"Reviews: {len(reviews)} (n_process={args.n_process}, batch_size={args.batch_size})")
+    print(f"{'mode':<16}{'seconds':>10}{'reviews/s':>12}{'aspects':>10}")
+    print(f"{'noun_chunks':<16}{chunk_seconds:>10.2f}{len(reviews) / chunk_seconds:>12.1f}{reference_total:>10}")
+    print(f"{'phrase_matcher':<16}{matcher_seconds:>10.2f}{len(reviews) / matcher_seconds:>12.1f}{candidate_total:>10}")
+    print(f"PhraseMatcher recall vs noun chunks: {recall:.3f}  (agreement on its own hits: {precision:.3f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: application startup time, split into phases.
+
+Each run happens in a fresh interpreter so nothing is already imported:
+
+  import_app      `import app` (lazy: no models, no pandas/reportlab/matplotlib)
+  load_spacy      spaCy model load
+  load_sentiment  sentiment backend load (NLP_SENTIMENT_BACKEND)
+  load_taxonomy   aspect categories / keywords from the database
+  first_request   first analyze_sentiment + extract_aspects call after loading
+
+and it lists which heavy libraries the plain import pulled in.
+
+Usage (from the customer_review directory):
+
+    python benchmarks/bench_startup.py --runs 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CUSTOMER_REVIEW_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('torch', 'transformers', 'spacy', 'pandas', 'reportlab', 'matplotlib')
+
+# Runs in the child interpreter; prints one JSON line with the phase timings
+_CHILD = r"""
+import json, sys, time
+timings = {}
+started = time.perf_counter()
+from app import app
+timings['import_app'] = time.perf_counter() - started
+imported = [name for name in HEAVY_MODULES if name in sys.modules]
+
+from nlp_processor import NLPProcessor
+processor = NLPProcessor()
+with app.app_context():
+    started = time.perf_counter()
+    processor._load_spacy_model()
+    timings['load_spacy'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    processor._load_sentiment_backend()
+    timings['load_sentiment'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    processor._load_aspect_categories()
+    timings['load_taxonomy'] = time.perf_counter() - started
+    processor.initialized = True
+
+    started = time.perf_counter()
+    processor.analyze_sentiment("The delivery was quick and the staff were friendly.")
+    processor.extract_aspects("The delivery was quick and the staff were friendly.")
+    timings['first_request'] = time.perf_counter() - started
+
+print(json.dumps({'timings': timings, 'imported_by_app': imported}))
+"""
+
+
+def run_once():
+    env = dict(os.environ, NLP_PRELOAD='0', NLP_PERSISTENT_CACHE_PATH='')
+    code = f"HEAVY_MODULES = {HEAVY_MODULES!r}\n{_CHILD}"
+    completed = subprocess.run(
+        [sys.executable, '-c', code], cwd=CUSTOMER_REVIEW_DIR, env=env,
+        capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        sys.exit(f"Startup run failed:\n{completed.stderr[-2000:]}")
+    # The app logs to stderr; the result is the last stdout line
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+    phases = list(results[0]['timings'])
+
+    print(f"{'phase':<16}{'median s':>10}{'min s':>10}{'max s':>10}")
+    for phase in phases + ['total']:
+        if phase == 'total':
+            values = [sum(result['timings'].values()) for result in results]
+        else:
+            values = [result['timings'][phase] for result in results]
+        print(f"{phase:<16}{statistics.median(values):>10.3f}{min(values):>10.3f}{max(values):>10.3f}")
+
+    imported = results[0]['imported_by_app']
+    print(f"\nHeavy libraries imported by `import app`: {', '.join(imported) if imported else 'none'}")
+
+
+if __name__ == '__main__':
+    main()
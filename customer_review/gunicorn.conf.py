@@ -0,0 +1,93 @@
+# gunicorn.conf.py
+"""
+Gunicorn settings: gunicorn -c gunicorn.conf.py app:app
+
+With GUNICORN_PRELOAD=1 (the default) app.py, and with it spaCy and the
+sentiment model, is imported once in the master. Workers are forked from it and
+share the model memory copy-on-write instead of each loading their own copy.
+The hooks below keep that fork-safe.
+"""
+import gc
+import logging
+import multiprocessing
+import os
+import sys
+
+# Must be set before the tokenizers library is first used in the master; its
+# Rust thread pool does not survive fork() and would deadlock the workers.
+os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 300))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+if preload_app:
+    # app.py loads the NLP models at import only when asked to
+    os.environ.setdefault('NLP_PRELOAD', '1')
+
+# Log every worker's unique memory after this many requests (0 disables)
+memory_report_every = int(os.environ.get('GUNICORN_MEMORY_REPORT_EVERY', 1000))
+
+logger = logging.getLogger('gunicorn.error')
+
+
+def _torch_threads():
+    configured = os.environ.get('NLP_TORCH_THREADS')
+    if configured:
+        return int(configured)
+    # Split the cores between the workers instead of every worker using all of them
+    return max(1, multiprocessing.cpu_count() // max(1, workers))
+
+
+def _dispose_db_engine():
+    """Drops pooled DB connections so no socket is shared across processes."""
+    app_module = sys.modules.get('app')
+    if app_module is None:
+        return
+    from models import db
+    with app_module.app.app_context():
+        db.engine.dispose()
+
+
+def when_ready(server):
+    from process_memory import log_memory_usage
+    log_memory_usage(f"Gunicorn master (preload={'on' if preload_app else 'off'})", logger)
+
+
+def pre_fork(server, worker):
+    # Connections opened while preloading (aspect categories) must not leak into workers
+    _dispose_db_engine()
+    # Keep the preloaded objects out of the cyclic GC so collections in the workers
+    # do not write to (and thereby copy) the pages shared with the master
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    os.environ['TOKENIZERS_PARALLELISM'] = 'false'
+    # Only touch torch if the preloaded app imported it (lexicon / stub / remote backends do not)
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        threads = _torch_threads()
+        torch.set_num_threads(threads)
+        logger.info(f"Worker {worker.pid}: torch using {threads} thread(s).")
+    worker.requests_handled = 0
+
+
+def post_worker_init(worker):
+    from process_memory import log_memory_usage
+    log_memory_usage(f"Worker {worker.pid} ready", logger)
+
+
+def post_request(worker, req, environ, resp):
+    if not memory_report_every:
+        return
+    worker.requests_handled = getattr(worker, 'requests_handled', 0) + 1
+    if worker.requests_handled % memory_report_every == 0:
+        from process_memory import log_memory_usage
+        log_memory_usage(f"Worker {worker.pid} after {worker.requests_handled} requests", logger)
+
+
+def worker_exit(server, worker):
+    from process_memory import log_memory_usage
+    log_memory_usage(f"Worker {worker.pid} exiting", logger)
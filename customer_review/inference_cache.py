@@ -0,0 +1,241 @@
+# inference_cache.py
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """
+    Bounded, thread-safe LRU cache with an optional per-entry TTL.
+    maxsize <= 0 disables caching; ttl <= 0 means entries never expire.
+    """
+
+    def __init__(self, maxsize=10000, ttl=0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if self.ttl > 0 and time.monotonic() - stored_at > self.ttl:
+                    del self._data[key]
+                else:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl
+            }
+
+
+class PersistentInferenceCache:
+    """
+    On-disk result cache in a local SQLite file, shared by every worker process on
+    the node and kept across restarts. Keys are content hashes that callers build
+    from the input text plus the model / taxonomy versions the result depends on,
+    so a version change simply stops matching old entries.
+
+    Old entries are pruned on write: entries older than max_age seconds, and the
+    oldest-written entries once the file holds more than max_rows (down to 90% of
+    it, so pruning does not run on every write). Each process estimates the row
+    count from its own writes and recounts when it prunes. 0 disables either limit.
+
+    A connection is opened lazily per process (and re-opened after a fork).
+    Failures are logged and treated as cache misses.
+    """
+    PRUNE_LOW_WATER = 0.9
+    AGE_PRUNE_INTERVAL = 60.0  # seconds between max_age sweeps in one process
+
+    def __init__(self, path, max_rows=0, max_age=0):
+        self.path = path
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._conn = None
+        self._conn_pid = None
+        self._estimated_rows = 0
+        self._age_pruned_at = float('-inf')
+        self._disabled = not path
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return not self._disabled
+
+    @staticmethod
+    def make_key(*parts):
+        return hashlib.sha256(json.dumps(parts, ensure_ascii=False, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+    def _connection(self):
+        if self._conn is not None and self._conn_pid == os.getpid():
+            return self._conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS inference_cache ("
+            " namespace TEXT NOT NULL,"
+            " cache_key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, cache_key)"
+            ") WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_inference_cache_created_at ON inference_cache (created_at)")
+        self._estimated_rows = conn.execute("SELECT COUNT(*) FROM inference_cache").fetchone()[0]
+        self._conn = conn
+        self._conn_pid = os.getpid()
+        return conn
+
+    def _open(self):
+        try:
+            return self._connection()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Persistent inference cache at '{self.path}' disabled: {e}")
+            self._disabled = True
+            return None
+
+    def get_many(self, namespace, keys):
+        """Returns {key: value} for the keys that are present."""
+        keys = list(dict.fromkeys(keys))
+        if self._disabled or not keys:
+            return {}
+        found = {}
+        with self._lock:
+            conn = self._open()
+            if conn is None:
+                return {}
+            try:
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    placeholders = ','.join('?' * len(chunk))
+                    rows = conn.execute(
+                        f"SELECT cache_key, value FROM inference_cache WHERE namespace = ? AND cache_key IN ({placeholders})",
+                        [namespace] + chunk
+                    ).fetchall()
+                    for cache_key, value in rows:
+                        found[cache_key] = json.loads(value)
+            except sqlite3.Error as e:
+                logger.warning(f"Persistent inference cache lookup failed: {e}")
+                return {}
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, namespace, key):
+        return self.get_many(namespace, [key]).get(key)
+
+    def set_many(self, namespace, items):
+        """Stores {key: value} pairs (values must be JSON-serializable)."""
+        if self._disabled or not items:
+            return
+        now = time.time()
+        rows = [(namespace, key, json.dumps(value), now) for key, value in items.items()]
+        with self._lock:
+            conn = self._open()
+            if conn is None:
+                return
+            try:
+                conn.execute("BEGIN")
+                conn.executemany(
+                    "INSERT OR REPLACE INTO inference_cache (namespace, cache_key, value, created_at) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                logger.warning(f"Persistent inference cache write failed: {e}")
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                return
+            # Over-counts replaced keys, which only makes the next recount come sooner
+            self._estimated_rows += len(rows)
+            self._prune(conn, now)
+
+    def _prune(self, conn, now):
+        """Deletes expired entries and, over max_rows, the oldest ones (caller holds the lock)."""
+        try:
+            if self.max_age > 0 and now - self._age_pruned_at >= self.AGE_PRUNE_INTERVAL:
+                self._age_pruned_at = now
+                self.evictions += conn.execute(
+                    "DELETE FROM inference_cache WHERE created_at < ?", (now - self.max_age,)
+                ).rowcount
+                self._estimated_rows = conn.execute("SELECT COUNT(*) FROM inference_cache").fetchone()[0]
+            if self.max_rows > 0 and self._estimated_rows > self.max_rows:
+                self._estimated_rows = conn.execute("SELECT COUNT(*) FROM inference_cache").fetchone()[0]
+                if self._estimated_rows > self.max_rows:
+                    keep = int(self.max_rows * self.PRUNE_LOW_WATER)
+                    # Entries written at the same instant as the cutoff go too
+                    cutoff = conn.execute(
+                        "SELECT created_at FROM inference_cache ORDER BY created_at DESC LIMIT 1 OFFSET ?", (keep,)
+                    ).fetchone()
+                    if cutoff is not None:
+                        deleted = conn.execute("DELETE FROM inference_cache WHERE created_at <= ?", cutoff).rowcount
+                        self.evictions += deleted
+                        self._estimated_rows -= deleted
+                        logger.info(f"Persistent inference cache pruned {deleted} oldest entries ({self._estimated_rows} left).")
+        except sqlite3.Error as e:
+            logger.warning(f"Persistent inference cache pruning failed: {e}")
+
+    def set(self, namespace, key, value):
+        self.set_many(namespace, {key: value})
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'path': self.path,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'max_rows': self.max_rows,
+            'max_age': self.max_age
+        }
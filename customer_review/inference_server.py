@@ -0,0 +1,505 @@
+# inference_server.py
+"""
+Optional local inference daemon.
+
+One process owns the NLPProcessor models and serves the gunicorn workers on the
+same node over a Unix socket, so spaCy and the sentiment model are loaded once
+instead of once per worker. Concurrent requests are coalesced into micro-batches
+(bounded by a maximum batch size and a maximum wait) before they reach the model.
+Requests carry a priority class: interactive ones (single reviews typed into the
+form) are batched first and bulk ones (CSV uploads, see inference_priority) fill
+the remaining capacity.
+
+Start it with `flask inference-server` and point the workers at it with
+NLP_INFERENCE_SOCKET; NLPProcessor then forwards model work through
+InferenceClient and its public API stays the same.
+
+Wire format: every message is a 4-byte big-endian length followed by that many
+bytes of UTF-8 JSON. Requests are {"op": ..., ...}; responses are
+{"ok": true, "result": ...} or {"ok": false, "error": "..."}.
+"""
+import collections
+import contextlib
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+
+from sentiment_backends import SentimentBackend
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct('>I')
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+
+
+class InferenceServerError(RuntimeError):
+    pass
+
+
+def send_message(sock, message):
+    payload = json.dumps(message, ensure_ascii=False).encode('utf-8')
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1024 * 1024))
+        if not chunk:
+            raise ConnectionError("Inference socket closed.")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_message(sock):
+    (size,) = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    if size > MAX_MESSAGE_BYTES:
+        raise InferenceServerError(f"Message of {size} bytes exceeds the {MAX_MESSAGE_BYTES} byte limit.")
+    return json.loads(_recv_exactly(sock, size).decode('utf-8'))
+
+
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_BULK = 'bulk'
+# Highest first; a batch is filled from the classes in this order
+PRIORITY_CLASSES = (PRIORITY_INTERACTIVE, PRIORITY_BULK)
+
+_priority = threading.local()
+
+
+def current_priority():
+    """Priority class of this thread's inference requests (interactive unless set)."""
+    return getattr(_priority, 'value', PRIORITY_INTERACTIVE)
+
+
+@contextlib.contextmanager
+def inference_priority(priority):
+    """Sends this thread's inference requests with the given priority class."""
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(f"Unknown priority class '{priority}'. Expected one of: {', '.join(PRIORITY_CLASSES)}.")
+    previous = current_priority()
+    _priority.value = priority
+    try:
+        yield
+    finally:
+        _priority.value = previous
+
+
+class _PendingRequest:
+    """A submitted list of items, handed out to batches in slices."""
+
+    def __init__(self, items, priority):
+        self.items = items
+        self.priority = priority
+        self.future = Future()
+        self.results = [None] * len(items)
+        self.next_offset = 0
+        self.outstanding = len(items)
+        self.enqueued_at = time.monotonic()
+        self.waiting_since = self.enqueued_at # Reset every time a slice of it is processed
+        self.first_taken_at = None
+
+
+class _ClassStats:
+    """Queue wait and latency of one priority class, over the last `window` requests."""
+
+    def __init__(self, window=1000):
+        self.requests = 0
+        self.items = 0
+        self.promoted = 0
+        self.waits = collections.deque(maxlen=window)
+        self.latencies = collections.deque(maxlen=window)
+
+    @staticmethod
+    def _summary(values):
+        if not values:
+            return {'avg': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+        ordered = sorted(values)
+        return {
+            'avg': round(sum(ordered) / len(ordered) * 1000.0, 2),
+            'p50': round(ordered[len(ordered) // 2] * 1000.0, 2),
+            'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000.0, 2),
+            'max': round(ordered[-1] * 1000.0, 2)
+        }
+
+    def to_dict(self, queued_requests, queued_items):
+        return {
+            'requests': self.requests,
+            'items': self.items,
+            'queued_requests': queued_requests,
+            'queued_items': queued_items,
+            'promoted_by_starvation_guard': self.promoted,
+            'queue_wait_ms': self._summary(self.waits),
+            'latency_ms': self._summary(self.latencies)
+        }
+
+
+class MicroBatcher:
+    """
+    Collects items submitted from many threads and hands them to `handler` in
+    batches. A batch is closed once it holds max_batch_size items or max_wait_ms
+    has passed since its first item arrived, whichever comes first. `handler`
+    gets a flat list of items and must return one result per item.
+
+    Each submission has a priority class. Batches are filled from the highest
+    class first and lower classes take the remaining capacity; large submissions
+    are split across batches, so a bulk upload never holds the model for longer
+    than one batch. Starvation guard: a class that has had nothing taken for
+    starvation_ms goes first in the next batch.
+    """
+
+    def __init__(self, name, handler, max_batch_size=32, max_wait_ms=5.0, starvation_ms=500.0):
+        self.name = name
+        self.handler = handler
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.starvation = max(0.0, starvation_ms) / 1000.0
+        self.batches = 0
+        self.items = 0
+        self._lanes = {priority: collections.deque() for priority in PRIORITY_CLASSES}
+        self._class_stats = {priority: _ClassStats() for priority in PRIORITY_CLASSES}
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=f"microbatch-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, items, priority=PRIORITY_INTERACTIVE):
+        """Blocks until the items have been processed and returns their results."""
+        if priority not in self._lanes:
+            raise InferenceServerError(f"Unknown priority class '{priority}'.")
+        items = list(items)
+        if not items:
+            return []
+        request = _PendingRequest(items, priority)
+        with self._cond:
+            self._lanes[priority].append(request)
+            self._cond.notify()
+        return request.future.result()
+
+    def _lane_order(self, now):
+        """Priority order, with starved classes (longest-waiting first) moved ahead."""
+        starved = []
+        for priority in PRIORITY_CLASSES[1:]:
+            lane = self._lanes[priority]
+            if lane and now - lane[0].waiting_since >= self.starvation:
+                starved.append((lane[0].waiting_since, priority))
+        promoted = [priority for _, priority in sorted(starved)]
+        if promoted and self._lanes[PRIORITY_CLASSES[0]]:
+            for priority in promoted:
+                self._class_stats[priority].promoted += 1
+        return promoted + [priority for priority in PRIORITY_CLASSES if priority not in promoted]
+
+    def _take(self, capacity, now):
+        """Removes up to `capacity` items from the lanes. Caller holds the lock."""
+        slices = []
+        for priority in self._lane_order(now):
+            lane = self._lanes[priority]
+            while lane and capacity:
+                request = lane[0]
+                if request.future.done():
+                    # An earlier slice of it failed
+                    lane.popleft()
+                    continue
+                count = min(capacity, len(request.items) - request.next_offset)
+                slices.append((request, request.next_offset, count))
+                if request.first_taken_at is None:
+                    request.first_taken_at = now
+                    self._class_stats[priority].waits.append(now - request.enqueued_at)
+                request.next_offset += count
+                capacity -= count
+                if request.next_offset == len(request.items):
+                    lane.popleft()
+            if not capacity:
+                break
+        return slices
+
+    def _collect(self):
+        with self._cond:
+            while not any(self._lanes.values()):
+                self._cond.wait()
+            deadline = time.monotonic() + self.max_wait
+            slices = self._take(self.max_batch_size, time.monotonic())
+            count = sum(length for _, _, length in slices)
+            while count < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if not any(self._lanes.values()):
+                    self._cond.wait(timeout=remaining)
+                    continue
+                more = self._take(self.max_batch_size - count, time.monotonic())
+                slices.extend(more)
+                count += sum(length for _, _, length in more)
+            return slices
+
+    def _run(self):
+        while True:
+            slices = self._collect()
+            flat_items = [item for request, offset, length in slices for item in request.items[offset:offset + length]]
+            if not flat_items:
+                continue
+            try:
+                results = self.handler(flat_items)
+                if len(results) != len(flat_items):
+                    raise InferenceServerError(f"{self.name} handler returned {len(results)} results for {len(flat_items)} items.")
+            except Exception as e:
+                logger.error(f"Micro-batch '{self.name}' of {len(flat_items)} items failed: {e}", exc_info=True)
+                for request, _, _ in slices:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(flat_items)
+            now = time.monotonic()
+            position = 0
+            for request, offset, length in slices:
+                request.results[offset:offset + length] = results[position:position + length]
+                position += length
+                request.outstanding -= length
+                # Starvation is measured from the last time the request was served
+                request.waiting_since = now
+                if request.outstanding == 0 and not request.future.done():
+                    stats = self._class_stats[request.priority]
+                    stats.requests += 1
+                    stats.items += len(request.items)
+                    stats.latencies.append(now - request.enqueued_at)
+                    request.future.set_result(request.results)
+
+    def stats(self):
+        with self._cond:
+            classes = {
+                priority: self._class_stats[priority].to_dict(
+                    len(lane), sum(len(request.items) - request.next_offset for request in lane)
+                )
+                for priority, lane in self._lanes.items()
+            }
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'avg_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+            'queued_requests': sum(entry['queued_requests'] for entry in classes.values()),
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'starvation_ms': self.starvation * 1000.0,
+            'classes': classes
+        }
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (ConnectionError, OSError):
+                return
+            except (InferenceServerError, ValueError) as e:
+                logger.warning(f"Dropping inference connection after a malformed message: {e}")
+                return
+            try:
+                response = {'ok': True, 'result': self.server.inference.dispatch(request)}
+            except Exception as e:
+                response = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+            try:
+                send_message(self.request, response)
+            except OSError:
+                return
+
+
+class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    # Every worker thread keeps a connection open; the default backlog of 5 refuses bursts
+    request_queue_size = 128
+
+
+class InferenceServer:
+    """Serves an NLPProcessor (already set up for local models) on a Unix socket."""
+
+    def __init__(self, app, processor, socket_path, max_batch_size=32, max_wait_ms=5.0, starvation_ms=500.0):
+        self.app = app
+        self.processor = processor
+        self.socket_path = socket_path
+        self.sentiment_batcher = MicroBatcher('sentiment', self._score, max_batch_size, max_wait_ms, starvation_ms)
+        self.aspects_batcher = MicroBatcher('aspects', self._extract, max_batch_size, max_wait_ms, starvation_ms)
+
+    def _score(self, texts):
+        with self.app.app_context():
+            if not self.processor._ensure_sentiment_backend():
+                raise InferenceServerError("Sentiment backend is not available.")
+            return self.processor.sentiment_backend.score_batch(texts)
+
+    def _extract(self, texts):
+        with self.app.app_context():
+            results = [None] * len(texts)
+            for index, aspects_data in self.processor.extract_aspects_many(texts):
+                results[index] = aspects_data
+            return results
+
+    def info(self):
+        with self.app.app_context():
+            taxonomy = self.processor.current_taxonomy()
+        return {
+            'pid': os.getpid(),
+            'sentiment_model_version': self.processor.sentiment_model_version(),
+            'spacy_model_version': self.processor.spacy_model_version(),
+            'taxonomy_version': taxonomy.fingerprint,
+            'aspect_extraction_mode': self.processor.aspect_extraction_mode
+        }
+
+    def dispatch(self, request):
+        op = request.get('op')
+        # Clients that predate priority classes are served as interactive
+        priority = request.get('priority', PRIORITY_INTERACTIVE)
+        if op == 'score':
+            return self.sentiment_batcher.submit(request.get('texts', []), priority)
+        if op == 'aspects':
+            return self.aspects_batcher.submit(request.get('texts', []), priority)
+        if op == 'info':
+            return self.info()
+        if op == 'reload_taxonomy':
+            with self.app.app_context():
+                self.processor._load_aspect_categories()
+            return self.info()
+        if op == 'stats':
+            return {
+                'sentiment': self.sentiment_batcher.stats(),
+                'aspects': self.aspects_batcher.stats(),
+                'cache': self.processor.cache_stats()
+            }
+        raise InferenceServerError(f"Unknown op '{op}'.")
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        directory = os.path.dirname(self.socket_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        server = _ThreadingUnixServer(self.socket_path, _RequestHandler)
+        server.inference = self
+        os.chmod(self.socket_path, 0o660)
+        logger.info(f"Inference server listening on '{self.socket_path}' "
+                    f"(max batch {self.sentiment_batcher.max_batch_size}, max wait {self.sentiment_batcher.max_wait * 1000.0} ms, "
+                    f"starvation guard {self.sentiment_batcher.starvation * 1000.0} ms).")
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+class InferenceClient:
+    """
+    Talks to InferenceServer. Each thread keeps its own connection (re-opened after
+    a fork or a broken pipe). A call whose request could not be sent (e.g. a stale
+    connection after a daemon restart) is retried once on a fresh connection; once
+    the request is sent it is never re-sent, so a timeout does not make an
+    overloaded daemon do the same work twice.
+
+    connections_opened counts the connections this client has opened, so callers
+    can tell that the daemon they talk to may have changed.
+    """
+
+    def __init__(self, socket_path, timeout=60.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.connections_opened = 0
+        self._local = threading.local()
+        self._count_lock = threading.Lock()
+
+    def _connection(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None and self._local.pid == os.getpid():
+            return sock
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self._local.sock = sock
+        self._local.pid = os.getpid()
+        with self._count_lock:
+            self.connections_opened += 1
+        return sock
+
+    def _reset(self):
+        sock = getattr(self._local, 'sock', None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def call(self, op, **payload):
+        payload['op'] = op
+        for attempt in (1, 2):
+            try:
+                sock = self._connection()
+                send_message(sock, payload)
+                break
+            except OSError as e:
+                self._reset()
+                if attempt == 2:
+                    raise InferenceServerError(f"Inference server at '{self.socket_path}' unreachable: {e}")
+        try:
+            response = recv_message(sock)
+        except socket.timeout as e:
+            # The daemon may still be working on it; the connection is dropped so a late
+            # answer is not read as the response to the next call
+            self._reset()
+            raise InferenceServerError(f"Inference server at '{self.socket_path}' did not answer within {self.timeout}s: {e}")
+        except OSError as e:
+            self._reset()
+            raise InferenceServerError(f"Inference server at '{self.socket_path}' closed the connection: {e}")
+        if not response.get('ok'):
+            raise InferenceServerError(response.get('error', 'unknown error'))
+        return response['result']
+
+    def score(self, texts):
+        return self.call('score', texts=list(texts), priority=current_priority())
+
+    def extract_aspects(self, texts):
+        return self.call('aspects', texts=list(texts), priority=current_priority())
+
+    def info(self):
+        return self.call('info')
+
+    def reload_taxonomy(self):
+        return self.call('reload_taxonomy')
+
+    def stats(self):
+        return self.call('stats')
+
+
+class RemoteSentimentBackend(SentimentBackend):
+    """SentimentBackend whose scores come from the inference server."""
+    name = 'remote'
+
+    def __init__(self, client):
+        self.client = client
+        self._version = None
+        self._version_connections = None
+
+    def version(self):
+        # The daemon's own version, so scores cached on disk are shared with it. Fetched
+        # lazily so workers can start before the daemon; not remembered until known, and
+        # fetched again after the client reconnects, since a restarted daemon may run
+        # another model or variant.
+        if self._version is None or self._version_connections != self.client.connections_opened:
+            try:
+                version = self.client.info()['sentiment_model_version']
+            except InferenceServerError as e:
+                logger.warning(f"Could not get the sentiment model version from the inference server: {e}")
+                return 'remote:unavailable'
+            if self._version is not None and version != self._version:
+                logger.info(f"Inference server sentiment model changed from {self._version} to {version}.")
+            self._version = version
+            self._version_connections = self.client.connections_opened
+        return self._version
+
+    def score_batch(self, texts, batch_size=None):
+        return self.client.score(texts)
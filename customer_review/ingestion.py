@@ -0,0 +1,239 @@
+# ingestion.py
+"""
+Streaming CSV ingestion for review uploads.
+
+The upload is read in chunks of CSV_INGEST_CHUNK_SIZE rows, so memory stays flat
+whatever the file size. Each chunk is analyzed with the batched NLP paths
+(extract_aspects_many + analyze_reviews) and written with two bulk INSERTs
+(RawText, then AspectSentiment) in a single transaction, which also updates the
+daily rollup (rollups.py). RawText rows carry the
+upload id and their position in it, so the generated ids are fetched with one
+SELECT per chunk on any database.
+
+Reviews are stored with a hash of their text and the analysis version that
+produced them; a review seen before under the same version reuses the stored
+analysis instead of going through spaCy and the sentiment model again.
+"""
+import hashlib
+import logging
+import os
+
+from sqlalchemy import func, insert, select
+
+from models import db, RawText, AspectSentiment, UploadedFile
+from inference_server import inference_priority, PRIORITY_BULK
+from taxonomy_remap import index_reviews
+from rollups import add_reviews
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = int(os.environ.get('CSV_INGEST_CHUNK_SIZE', 500))
+DEDUP_ENABLED = os.environ.get('CSV_INGEST_DEDUP', '1') == '1'
+
+_COPIED_ASPECT_COLUMNS = (
+    'raw_extracted_aspect', 'keyword_found', 'sentence', 'sentiment', 'score', 'aspect_id', 'start_char', 'end_char'
+)
+
+
+class IngestionResult:
+    def __init__(self, uploaded_file_id):
+        self.uploaded_file_id = uploaded_file_id
+        self.reviews = 0
+        self.aspects = 0
+        self.chunks = 0
+        self.dedup_hits = 0
+        self.bytes_read = 0
+
+    def __repr__(self):
+        return f'<IngestionResult upload={self.uploaded_file_id} reviews={self.reviews} aspects={self.aspects} chunks={self.chunks} dedup_hits={self.dedup_hits}>'
+
+
+def iter_review_chunks(file_obj, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yields lists of review strings from the first column of a CSV upload (the
+    header row is skipped and empty cells are dropped, as in the upload form).
+    """
+    import pandas as pd
+    reader = pd.read_csv(file_obj, encoding='latin1', usecols=[0], dtype=str, chunksize=chunk_size)
+    for chunk in reader:
+        reviews = [str(review_text) for review_text in chunk.iloc[:, 0].dropna()]
+        if reviews:
+            yield reviews
+
+
+def _bytes_read(file_obj, previous):
+    """Position of the CSV reader in the upload (approximate: pandas reads ahead in blocks)."""
+    try:
+        return max(previous, file_obj.tell())
+    except (AttributeError, OSError, ValueError):
+        return previous
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _find_prior_analyses(hashes, analysis_version):
+    """
+    Maps content hash -> stored analysis (overall sentiment and aspect rows) of the
+    earliest review with that text analyzed under analysis_version, for any user.
+    """
+    if not hashes or not analysis_version:
+        return {}
+    donor_ids = dict(db.session.execute(
+        select(func.min(RawText.id), RawText.content_hash)
+        .where(RawText.content_hash.in_(hashes), RawText.analysis_version == analysis_version)
+        .group_by(RawText.content_hash)
+    ).all())
+    if not donor_ids:
+        return {}
+
+    prior = {}
+    for raw_text_id, sentiment, score in db.session.execute(
+        select(RawText.id, RawText.sentiment, RawText.score).where(RawText.id.in_(donor_ids))
+    ).all():
+        prior[donor_ids[raw_text_id]] = ({'label': sentiment, 'score': score}, [])
+    for aspect_sentiment in db.session.execute(
+        select(AspectSentiment).where(AspectSentiment.raw_text_id.in_(donor_ids)).order_by(AspectSentiment.id)
+    ).scalars():
+        prior[donor_ids[aspect_sentiment.raw_text_id]][1].append({
+            column: getattr(aspect_sentiment, column) for column in _COPIED_ASPECT_COLUMNS
+        })
+    return prior
+
+
+def _aspect_rows(aspects_data, aspect_sentiment_results):
+    return [
+        {
+            'raw_extracted_aspect': aspect_data_raw['raw_extracted_aspect'],
+            'keyword_found': aspect_data_raw['keyword_found'],
+            'sentence': aspect_data_raw['sentence'],
+            'sentiment': aspect_sentiment_result['label'],
+            'score': aspect_sentiment_result['score'],
+            'aspect_id': aspect_data_raw['aspect_category_id'],
+            'start_char': aspect_data_raw['start_char'],
+            'end_char': aspect_data_raw['end_char']
+        }
+        for aspect_data_raw, aspect_sentiment_result in zip(aspects_data, aspect_sentiment_results)
+    ]
+
+
+def _write_chunk(user_id, uploaded_file_id, first_seq, review_strs, hashes, analysis_version, analyses):
+    """
+    Bulk-inserts one analyzed chunk and returns the number of aspect rows written.
+    analyses holds (overall sentiment, aspect rows) per review.
+    """
+    raw_text_rows = [
+        {
+            'content': review_str,
+            'user_id': user_id,
+            'sentiment': overall_sentiment_result['label'],
+            'score': overall_sentiment_result['score'],
+            'uploaded_file_id': uploaded_file_id,
+            'upload_seq': first_seq + offset,
+            'content_hash': review_hash,
+            'analysis_version': analysis_version
+        }
+        for offset, (review_str, review_hash, (overall_sentiment_result, _))
+        in enumerate(zip(review_strs, hashes, analyses))
+    ]
+    db.session.execute(insert(RawText), raw_text_rows)
+
+    last_seq = first_seq + len(review_strs) - 1
+    raw_text_ids = dict(db.session.execute(
+        select(RawText.upload_seq, RawText.id)
+        .where(RawText.uploaded_file_id == uploaded_file_id)
+        .where(RawText.upload_seq.between(first_seq, last_seq))
+    ).all())
+
+    index_reviews([(raw_text_ids[first_seq + offset], review_str) for offset, review_str in enumerate(review_strs)])
+
+    aspect_rows = []
+    for offset, (_, review_aspect_rows) in enumerate(analyses):
+        raw_text_id = raw_text_ids[first_seq + offset]
+        aspect_rows.extend(dict(row, raw_text_id=raw_text_id) for row in review_aspect_rows)
+    if aspect_rows:
+        db.session.execute(insert(AspectSentiment), aspect_rows)
+        add_reviews(list(raw_text_ids.values()))
+    return len(aspect_rows)
+
+
+def analyze_and_write(processor, user_id, uploaded_file_id, first_seq, review_strs):
+    """
+    Analyzes a chunk of reviews with the batched NLP paths and bulk-inserts the
+    results (without committing). Returns (aspect rows written, dedup hits).
+
+    A review whose text was already analyzed under the current analysis version
+    (by any user, or earlier in the chunk) is a dedup hit: its stored results are
+    copied instead of running the models again. Model work is sent to the
+    inference server as bulk priority, behind reviews submitted interactively.
+    """
+    hashes = [content_hash(review_str) for review_str in review_strs]
+    analysis_version = processor.analysis_version()
+    prior = _find_prior_analyses(set(hashes), analysis_version) if DEDUP_ENABLED else {}
+
+    unique_positions = {}
+    unique_texts = []
+    for review_hash, review_str in zip(hashes, review_strs):
+        if review_hash not in prior and review_hash not in unique_positions:
+            unique_positions[review_hash] = len(unique_texts)
+            unique_texts.append(review_str)
+
+    analyzed = []
+    if unique_texts:
+        with inference_priority(PRIORITY_BULK):
+            aspects_per_review = [[] for _ in unique_texts]
+            for review_idx, extracted_aspects_raw in processor.extract_aspects_many(unique_texts):
+                aspects_per_review[review_idx] = extracted_aspects_raw
+            analyzed_reviews = processor.analyze_reviews(unique_texts, aspects_per_review)
+        analyzed = [
+            (overall_sentiment_result, _aspect_rows(aspects_data, aspect_sentiment_results))
+            for aspects_data, (overall_sentiment_result, aspect_sentiment_results) in zip(aspects_per_review, analyzed_reviews)
+        ]
+
+    analyses = [
+        prior[review_hash] if review_hash in prior else analyzed[unique_positions[review_hash]]
+        for review_hash in hashes
+    ]
+    aspects_written = _write_chunk(user_id, uploaded_file_id, first_seq, review_strs, hashes, analysis_version, analyses)
+    return aspects_written, len(review_strs) - len(unique_texts)
+
+
+def ingest_csv(file_obj, filename, user_id, processor, chunk_size=DEFAULT_CHUNK_SIZE,
+               uploaded_file_id=None, on_chunk=None):
+    """
+    Analyzes and stores every review of a CSV upload, one transaction per chunk.
+    Chunks committed before an error stay stored; the error is re-raised with
+    the partial IngestionResult attached as `ingestion_result`.
+
+    A new UploadedFile is recorded unless uploaded_file_id is given. on_chunk(result)
+    is called after each chunk is written and before it is committed, so progress
+    kept in the same database commits together with the rows.
+    """
+    if uploaded_file_id is None:
+        uploaded_file = UploadedFile(filename=filename, user_id=user_id)
+        db.session.add(uploaded_file)
+        db.session.commit()
+        uploaded_file_id = uploaded_file.id
+    result = IngestionResult(uploaded_file_id)
+
+    try:
+        for review_strs in iter_review_chunks(file_obj, chunk_size):
+            aspects_written, dedup_hits = analyze_and_write(processor, user_id, uploaded_file_id, result.reviews, review_strs)
+            result.reviews += len(review_strs)
+            result.aspects += aspects_written
+            result.dedup_hits += dedup_hits
+            result.chunks += 1
+            result.bytes_read = _bytes_read(file_obj, result.bytes_read)
+            if on_chunk is not None:
+                on_chunk(result)
+            db.session.commit()
+
+            logger.info(f"Upload {uploaded_file_id}: chunk {result.chunks} stored ({len(review_strs)} reviews, {aspects_written} aspects, {dedup_hits} dedup hits).")
+    except Exception as e:
+        db.session.rollback()
+        e.ingestion_result = result
+        raise
+
+    logger.info(f"Upload {uploaded_file_id} ('{filename}') done: {result.reviews} reviews ({result.dedup_hits} dedup hits), {result.aspects} aspects in {result.chunks} chunks.")
+    return result
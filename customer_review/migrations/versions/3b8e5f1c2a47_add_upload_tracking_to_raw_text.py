@@ -0,0 +1,32 @@
+"""Add upload tracking columns to raw_text
+
+Revision ID: 3b8e5f1c2a47
+Revises: d62f95dc7fe7
+Create Date: 2026-10-16 10:12:03.418220
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b8e5f1c2a47'
+down_revision = 'd62f95dc7fe7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('raw_text', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('uploaded_file_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('upload_seq', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_raw_text_uploaded_file_id', 'uploaded_file', ['uploaded_file_id'], ['id'], ondelete='SET NULL')
+        batch_op.create_index('ix_raw_text_uploaded_file_seq', ['uploaded_file_id', 'upload_seq'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('raw_text', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_raw_text_uploaded_file_id', type_='foreignkey')
+        batch_op.drop_index('ix_raw_text_uploaded_file_seq')
+        batch_op.drop_column('upload_seq')
+        batch_op.drop_column('uploaded_file_id')
@@ -0,0 +1,50 @@
+"""Add analysis_job table
+
+Revision ID: 7c4d2e9a1f03
+Revises: 3b8e5f1c2a47
+Create Date: 2026-10-16 11:02:47.901356
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c4d2e9a1f03'
+down_revision = '3b8e5f1c2a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('analysis_job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('uploaded_file_id', sa.Integer(), nullable=True),
+    sa.Column('kind', sa.String(length=30), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('file_path', sa.String(length=500), nullable=True),
+    sa.Column('filename', sa.String(length=255), nullable=True),
+    sa.Column('total_bytes', sa.BigInteger(), nullable=True),
+    sa.Column('processed_bytes', sa.BigInteger(), nullable=False),
+    sa.Column('processed_rows', sa.Integer(), nullable=False),
+    sa.Column('aspects_count', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('worker_id', sa.String(length=100), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['uploaded_file_id'], ['uploaded_file.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('analysis_job', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_analysis_job_status'), ['status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('analysis_job', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_analysis_job_status'))
+
+    op.drop_table('analysis_job')
@@ -0,0 +1,64 @@
+"""Add analysis_batch work table and batch counters to analysis_job
+
+Revision ID: 9e1a6b3d7c52
+Revises: 7c4d2e9a1f03
+Create Date: 2026-10-16 12:21:09.514873
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = '9e1a6b3d7c52'
+down_revision = '7c4d2e9a1f03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('analysis_batch',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('seq_start', sa.Integer(), nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.Text().with_variant(mysql.MEDIUMTEXT(), 'mysql'), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('available_at', sa.DateTime(), nullable=False),
+    sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+    sa.Column('worker_id', sa.String(length=100), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['job_id'], ['analysis_job.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('analysis_batch', schema=None) as batch_op:
+        batch_op.create_index('ix_analysis_batch_status_available', ['status', 'available_at'], unique=False)
+        batch_op.create_index('ix_analysis_batch_job_status', ['job_id', 'status'], unique=False)
+
+    with op.batch_alter_table('analysis_job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('total_rows', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('total_batches', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('batches_done', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('batches_quarantined', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.drop_column('file_path')
+        batch_op.drop_column('processed_bytes')
+
+
+def downgrade():
+    with op.batch_alter_table('analysis_job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('processed_bytes', sa.BigInteger(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('file_path', sa.String(length=500), nullable=True))
+        batch_op.drop_column('batches_quarantined')
+        batch_op.drop_column('batches_done')
+        batch_op.drop_column('total_batches')
+        batch_op.drop_column('total_rows')
+
+    with op.batch_alter_table('analysis_batch', schema=None) as batch_op:
+        batch_op.drop_index('ix_analysis_batch_job_status')
+        batch_op.drop_index('ix_analysis_batch_status_available')
+
+    op.drop_table('analysis_batch')
@@ -0,0 +1,36 @@
+"""Add content hash and analysis version to raw_text, dedup counter to analysis_job
+
+Revision ID: b47d0c9e2f18
+Revises: 9e1a6b3d7c52
+Create Date: 2026-10-16 13:40:52.227416
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b47d0c9e2f18'
+down_revision = '9e1a6b3d7c52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('raw_text', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('analysis_version', sa.String(length=64), nullable=True))
+        batch_op.create_index('ix_raw_text_content_hash_version', ['content_hash', 'analysis_version'], unique=False)
+
+    with op.batch_alter_table('analysis_job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('dedup_hits', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('analysis_job', schema=None) as batch_op:
+        batch_op.drop_column('dedup_hits')
+
+    with op.batch_alter_table('raw_text', schema=None) as batch_op:
+        batch_op.drop_index('ix_raw_text_content_hash_version')
+        batch_op.drop_column('analysis_version')
+        batch_op.drop_column('content_hash')
@@ -0,0 +1,49 @@
+"""Add review term index for taxonomy re-mapping, allow jobs without a user
+
+Revision ID: c5e83a1f6d24
+Revises: b47d0c9e2f18
+Create Date: 2026-10-16 14:52:31.608934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e83a1f6d24'
+down_revision = 'b47d0c9e2f18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('index_term',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('term', sa.String(length=100), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('term')
+    )
+    op.create_table('review_term',
+    sa.Column('term_id', sa.Integer(), nullable=False),
+    sa.Column('raw_text_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['raw_text_id'], ['raw_text.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['term_id'], ['index_term.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('term_id', 'raw_text_id')
+    )
+    with op.batch_alter_table('review_term', schema=None) as batch_op:
+        batch_op.create_index('ix_review_term_raw_text_id', ['raw_text_id'], unique=False)
+
+    with op.batch_alter_table('analysis_job', schema=None) as batch_op:
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=True)
+
+
+def downgrade():
+    op.execute("DELETE FROM analysis_job WHERE user_id IS NULL")
+    with op.batch_alter_table('analysis_job', schema=None) as batch_op:
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=False)
+
+    with op.batch_alter_table('review_term', schema=None) as batch_op:
+        batch_op.drop_index('ix_review_term_raw_text_id')
+
+    op.drop_table('review_term')
+    op.drop_table('index_term')
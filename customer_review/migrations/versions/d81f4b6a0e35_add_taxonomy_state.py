@@ -0,0 +1,30 @@
+"""Add taxonomy_state version counter
+
+Revision ID: d81f4b6a0e35
+Revises: c5e83a1f6d24
+Create Date: 2026-10-16 15:47:10.382645
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81f4b6a0e35'
+down_revision = 'c5e83a1f6d24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    taxonomy_state = op.create_table('taxonomy_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(taxonomy_state, [{'id': 1, 'version': 1}])
+
+
+def downgrade():
+    op.drop_table('taxonomy_state')
@@ -0,0 +1,37 @@
+"""Add aspect_daily_rollup table
+
+Revision ID: e2a7c4f9b186
+Revises: d81f4b6a0e35
+Create Date: 2026-10-16 21:24:08.517302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a7c4f9b186'
+down_revision = 'd81f4b6a0e35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('aspect_daily_rollup',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('aspect_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('category_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('positive_count', sa.Integer(), nullable=False),
+    sa.Column('negative_count', sa.Integer(), nullable=False),
+    sa.Column('neutral_count', sa.Integer(), nullable=False),
+    sa.Column('total_count', sa.Integer(), nullable=False),
+    sa.Column('score_sum', sa.Double(), nullable=False),
+    sa.Column('effective_score_sum', sa.Double(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'day', 'aspect_id', 'category_id')
+    )
+
+
+def downgrade():
+    op.drop_table('aspect_daily_rollup')
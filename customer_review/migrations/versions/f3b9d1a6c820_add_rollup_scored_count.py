@@ -0,0 +1,29 @@
+"""Add scored_count to aspect_daily_rollup
+
+Revision ID: f3b9d1a6c820
+Revises: e2a7c4f9b186
+Create Date: 2026-10-17 10:12:41.208734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b9d1a6c820'
+down_revision = 'e2a7c4f9b186'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('aspect_daily_rollup', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('scored_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # aspect_sentiment.score is NOT NULL, so every mention counted so far has a score
+    op.execute('UPDATE aspect_daily_rollup SET scored_count = total_count')
+
+
+def downgrade():
+    with op.batch_alter_table('aspect_daily_rollup', schema=None) as batch_op:
+        batch_op.drop_column('scored_count')
@@ -1,4 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.mysql import MEDIUMTEXT
 from werkzeug.security import generate_password_hash, check_password_hash
 import datetime
 
@@ -38,7 +39,20 @@ class RawText(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     sentiment = db.Column(db.String(20), nullable=True) # Overall sentiment (POSITIVE, NEGATIVE, NEUTRAL)
     score = db.Column(db.Float, nullable=True) # Overall sentiment score
-    
+    # Set for reviews that came from a CSV upload: the upload and the review's position in it.
+    # Bulk inserts use the pair to look up the generated ids in one query.
+    uploaded_file_id = db.Column(db.Integer, db.ForeignKey('uploaded_file.id', ondelete='SET NULL'), nullable=True)
+    upload_seq = db.Column(db.Integer, nullable=True)
+    # SHA-256 of the content and the NLPProcessor.analysis_version() that produced the stored
+    # analysis; ingestion copies the analysis of an earlier review with the same pair.
+    content_hash = db.Column(db.String(64), nullable=True)
+    analysis_version = db.Column(db.String(64), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_raw_text_uploaded_file_seq', 'uploaded_file_id', 'upload_seq'),
+        db.Index('ix_raw_text_content_hash_version', 'content_hash', 'analysis_version'),
+    )
+
     # Relationship to AspectSentiment
     aspect_sentiments = db.relationship('AspectSentiment', backref='raw_text', lazy=True, cascade="all, delete-orphan") 
     def __repr__(self):
@@ -97,4 +111,106 @@ class AspectSentiment(db.Model):
 
     def __repr__(self):
         aspect_name = self.aspect.name if self.aspect else "Unmapped"
-        return f'<AspectSentiment {self.id} - Aspect: {aspect_name}, Raw: {self.raw_extracted_aspect}, Sentiment: {self.sentiment}>'
\ No newline at end of file
+        return f'<AspectSentiment {self.id} - Aspect: {aspect_name}, Raw: {self.raw_extracted_aspect}, Sentiment: {self.sentiment}>'
+
+# TaxonomyState: single row whose version is bumped by every taxonomy edit, so each
+# process can tell cheaply that its loaded taxonomy is stale (see taxonomy.py)
+class TaxonomyState(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f'<TaxonomyState version={self.version}>'
+
+# AspectDailyRollup: per user, day and aspect sums of AspectSentiment rows, kept up to date
+# as reviews are stored, deleted or re-mapped (see rollups.py). aspect_id/category_id are 0
+# for mentions not mapped to an aspect. Dashboard summaries and trends read this table.
+class AspectDailyRollup(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    aspect_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    category_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    positive_count = db.Column(db.Integer, nullable=False, default=0)
+    negative_count = db.Column(db.Integer, nullable=False, default=0)
+    neutral_count = db.Column(db.Integer, nullable=False, default=0)
+    total_count = db.Column(db.Integer, nullable=False, default=0) # All mentions, whatever the label
+    scored_count = db.Column(db.Integer, nullable=False, default=0) # Mentions with a score (averages divide by this)
+    score_sum = db.Column(db.Double, nullable=False, default=0.0) # DOUBLE: a MySQL FLOAT sum drifts
+    effective_score_sum = db.Column(db.Double, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f'<AspectDailyRollup user={self.user_id} day={self.day} aspect={self.aspect_id} mentions={self.total_count}>'
+
+# IndexTerm / ReviewTerm: inverted index from the words of a review's text to the review.
+# Used to find the reviews a taxonomy edit can affect (see taxonomy_remap.py).
+class IndexTerm(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    term = db.Column(db.String(100), unique=True, nullable=False)
+
+    def __repr__(self):
+        return f'<IndexTerm {self.term}>'
+
+class ReviewTerm(db.Model):
+    term_id = db.Column(db.Integer, db.ForeignKey('index_term.id', ondelete='CASCADE'), primary_key=True)
+    raw_text_id = db.Column(db.Integer, db.ForeignKey('raw_text.id', ondelete='CASCADE'), primary_key=True)
+
+    __table_args__ = (
+        db.Index('ix_review_term_raw_text_id', 'raw_text_id'),
+    )
+
+# AnalysisJob: a queued bulk analysis -- a CSV upload, or re-mapping reviews after a
+# taxonomy edit (no user). Its work is split into AnalysisBatch rows that
+# `flask analysis-worker` processes on any node.
+class AnalysisJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    uploaded_file_id = db.Column(db.Integer, db.ForeignKey('uploaded_file.id', ondelete='SET NULL'), nullable=True)
+    kind = db.Column(db.String(30), nullable=False, default='csv_upload') # csv_upload, taxonomy_remap
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True) # splitting, queued, running, completed, failed
+    filename = db.Column(db.String(255), nullable=True)
+    total_bytes = db.Column(db.BigInteger, nullable=True)
+    total_rows = db.Column(db.Integer, nullable=False, default=0)
+    total_batches = db.Column(db.Integer, nullable=False, default=0)
+    batches_done = db.Column(db.Integer, nullable=False, default=0)
+    batches_quarantined = db.Column(db.Integer, nullable=False, default=0)
+    processed_rows = db.Column(db.Integer, nullable=False, default=0)
+    aspects_count = db.Column(db.Integer, nullable=False, default=0)
+    dedup_hits = db.Column(db.Integer, nullable=False, default=0) # Reviews whose analysis was copied, not recomputed
+    error = db.Column(db.Text, nullable=True)
+    worker_id = db.Column(db.String(100), nullable=True) # Worker that claimed the first batch
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    batches = db.relationship('AnalysisBatch', backref='job', lazy='dynamic', cascade="all, delete-orphan")
+
+    def __repr__(self):
+        return f'<AnalysisJob {self.id} ({self.status})>'
+
+# AnalysisBatch: one unit of work (a slice of an upload's reviews) in the work table.
+# Workers claim batches with SELECT ... FOR UPDATE SKIP LOCKED and hold a lease while
+# processing; failed batches are retried with backoff and quarantined after max attempts.
+class AnalysisBatch(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('analysis_job.id', ondelete='CASCADE'), nullable=False)
+    seq_start = db.Column(db.Integer, nullable=False) # upload_seq of the first review
+    row_count = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.Text().with_variant(MEDIUMTEXT(), 'mysql'), nullable=False) # JSON list of review texts (or RawText ids to re-map)
+    status = db.Column(db.String(20), nullable=False, default='pending') # pending, leased, done, quarantined
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow) # Backoff: not claimable before this
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
+    worker_id = db.Column(db.String(100), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_analysis_batch_status_available', 'status', 'available_at'),
+        db.Index('ix_analysis_batch_job_status', 'job_id', 'status'),
+    )
+
+    def __repr__(self):
+        return f'<AnalysisBatch {self.id} job={self.job_id} ({self.status})>'
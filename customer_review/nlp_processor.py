@@ -1,10 +1,15 @@
 # nlp_processor.py
-import spacy
-from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
-import torch
+# spaCy, torch and transformers are imported on first use (see init_nlp), so that
+# importing the app for CLI commands and migrations stays fast.
+import os
 import re
-from models import db, Category, Aspect, AspectKeyword
-from difflib import get_close_matches
+import threading
+import time
+from taxonomy import TaxonomySnapshot, current_taxonomy_version, load_taxonomy_aspects
+from inference_cache import LRUCache, PersistentInferenceCache
+from sentiment_rules import LexicalRuleEngine
+from sentiment_backends import create_sentiment_backend
+from inference_server import InferenceClient, InferenceServerError, RemoteSentimentBackend
 import logging
 from flask import current_app # Ensure current_app is imported
 
@@ -12,6 +17,10 @@ logger = logging.getLogger(__name__)
 
 class NLPProcessor:
     _instance = None
+    # Serializes model loading so concurrent first requests trigger a single load
+    _init_lock = threading.RLock()
+    # Lets one thread at a time build a new taxonomy snapshot
+    _taxonomy_lock = threading.Lock()
 
     def __new__(cls):
         logger.debug("NLPProcessor __new__ called.")
@@ -19,128 +28,236 @@ class NLPProcessor:
             logger.debug("Creating new NLPProcessor instance.")
             cls._instance = super(NLPProcessor, cls).__new__(cls)
             cls._instance.nlp = None
-            cls._instance.sentiment_analyzer = None
+            # Blank pipeline with a sentencizer, built by sentence_splitter() when the models are not loaded
+            cls._instance._sentence_splitter = None
+            cls._instance.sentiment_backend = None
             cls._instance.initialized = False
+            # 'transformers' (default), 'lexicon' (pure-Python word lists) or 'stub' (deterministic fake scores)
+            cls._instance.sentiment_backend_name = os.environ.get('NLP_SENTIMENT_BACKEND', 'transformers')
             cls._instance.sentiment_model_name = "cardiffnlp/twitter-roberta-base-sentiment-latest"
-            cls._instance.aspect_category_keywords = {} 
+            # 'fp32' (default), 'int8' (torch dynamic quantization) or 'onnx' (ONNX Runtime);
+            # non-fp32 variants are read from the artifact dir and need an approved evaluation
+            cls._instance.sentiment_model_variant = os.environ.get('NLP_SENTIMENT_MODEL_VARIANT', 'fp32')
+            cls._instance.sentiment_artifact_dir = os.environ.get('NLP_SENTIMENT_ARTIFACT_DIR', os.path.join('models', 'sentiment'))
+            # Current TaxonomySnapshot; replaced (never modified) when the taxonomy changes
+            cls._instance.taxonomy = TaxonomySnapshot.empty()
+            cls._instance.taxonomy_check_interval = float(os.environ.get('NLP_TAXONOMY_CHECK_SECONDS', 2))
+            cls._instance._taxonomy_checked_at = float('-inf')
+            cls._instance.sentiment_batch_size = int(os.environ.get('NLP_SENTIMENT_BATCH_SIZE', 16))
+            cls._instance.spacy_n_process = int(os.environ.get('NLP_SPACY_N_PROCESS', 1))
+            cls._instance.spacy_batch_size = int(os.environ.get('NLP_SPACY_BATCH_SIZE', 64))
+            # 'noun_chunks' (dependency parser) or 'phrase_matcher' (keyword PhraseMatcher, no parser/NER)
+            cls._instance.aspect_extraction_mode = os.environ.get('NLP_ASPECT_EXTRACTION_MODE', 'noun_chunks')
+            cls._instance.sentiment_cache = LRUCache(
+                maxsize=int(os.environ.get('NLP_SENTIMENT_CACHE_SIZE', 10000)),
+                ttl=float(os.environ.get('NLP_SENTIMENT_CACHE_TTL', 0))
+            )
+            cls._instance.persistent_cache = PersistentInferenceCache(
+                os.environ.get('NLP_PERSISTENT_CACHE_PATH', os.path.join('instance', 'inference_cache.sqlite3')),
+                max_rows=int(os.environ.get('NLP_PERSISTENT_CACHE_MAX_ROWS', 500000)),
+                max_age=float(os.environ.get('NLP_PERSISTENT_CACHE_MAX_AGE', 30 * 24 * 3600))
+            )
+            cls._instance.sentiment_rules = LexicalRuleEngine.from_config(os.environ.get('NLP_SENTIMENT_RULES_PATH'))
+            # When set, the models live in the shared inference daemon (see inference_server.py)
+            inference_socket = os.environ.get('NLP_INFERENCE_SOCKET')
+            cls._instance.inference_client = InferenceClient(
+                inference_socket, timeout=float(os.environ.get('NLP_INFERENCE_TIMEOUT', 60))
+            ) if inference_socket else None
         else:
             logger.debug("Returning existing NLPProcessor instance.")
         return cls._instance
 
     def init_nlp(self):
         logger.debug("init_nlp called.")
+        if self.inference_client is not None and self.initialized:
+            return True
         # Re-evaluate initialization state more strictly
-        # If sentiment_analyzer is None, or not initialized, always try to initialize fully.
-        if self.initialized and self.nlp is not None and self.sentiment_analyzer is not None:
+        # If sentiment_backend is None, or not initialized, always try to initialize fully.
+        if self.initialized and self.nlp is not None and self.sentiment_backend is not None:
             logger.info("NLP models appear already initialized and ready, skipping full re-initialization.")
             # Still ensure categories are loaded if they might have been cleared
-            if not self.aspect_category_keywords: 
+            if not self.taxonomy.loaded: 
                 self._load_aspect_categories() 
             return True
 
-        logger.info("Performing full NLP model initialization...")
+        with self._init_lock:
+            # Another thread may have finished loading while this one was waiting
+            if self.initialized and self.nlp is not None and self.sentiment_backend is not None:
+                logger.debug("NLP models were initialized by another thread.")
+                return True
+            if self.inference_client is not None:
+                return self._init_remote()
+
+            logger.info("Performing full NLP model initialization...")
+            try:
+                self._load_spacy_model()
+                self._load_sentiment_backend()
+                self._load_aspect_categories() # This method will now load keywords too
+
+                self.initialized = True
+                logger.info("All NLP models initialized successfully.")
+                return True
+            except Exception as e:
+                logger.critical(f"Failed to initialize NLP models: {e}", exc_info=True)
+                # Crucially, reset everything to None/empty on failure
+                self.nlp = None
+                self.sentiment_backend = None
+                self.initialized = False
+                self.taxonomy = TaxonomySnapshot.empty()
+                return False
+
+    def _load_spacy_model(self):
+        import spacy
+        logger.info("Loading spaCy model 'en_core_web_sm'...")
+        self.nlp = spacy.load("en_core_web_sm")
+        if "sentencizer" not in self.nlp.pipe_names:
+            logger.info("Adding 'sentencizer' to spaCy pipeline.")
+            self.nlp.add_pipe("sentencizer")
+        logger.info("spaCy model loaded.")
+
+    def _load_sentiment_backend(self):
+        logger.info(f"Loading '{self.sentiment_backend_name}' sentiment backend...")
+        backend = create_sentiment_backend(
+            self.sentiment_backend_name, self.sentiment_model_name, self.sentiment_model_variant,
+            self.sentiment_artifact_dir, self.sentiment_batch_size
+        )
+        backend.load()
+        self.sentiment_backend = backend
+        logger.info(f"Sentiment backend loaded ({self.sentiment_model_version()}).")
+
+    def _init_remote(self):
+        """
+        Worker-side setup when the inference daemon owns the models: sentiment scores
+        and aspect extraction are requested over its socket. A blank spaCy pipeline with
+        a sentencizer is kept locally for the sentence splitting done by the views.
+        """
+        logger.info(f"Using the inference server at '{self.inference_client.socket_path}' for NLP models.")
         try:
-            logger.info("Loading spaCy model 'en_core_web_sm'...")
-            self.nlp = spacy.load("en_core_web_sm")
-            if "sentencizer" not in self.nlp.pipe_names:
-                logger.info("Adding 'sentencizer' to spaCy pipeline.")
-                self.nlp.add_pipe("sentencizer") 
-            logger.info("spaCy model loaded.")
-
-            logger.info(f"Loading Hugging Face sentiment model '{self.sentiment_model_name}'...")
-            tokenizer = AutoTokenizer.from_pretrained(self.sentiment_model_name)
-            model = AutoModelForSequenceClassification.from_pretrained(self.sentiment_model_name)
-            device = 0 if torch.cuda.is_available() else -1
-            self.sentiment_analyzer = pipeline("sentiment-analysis", model=model, tokenizer=tokenizer, return_all_scores=True, device=device)
-            logger.info("Hugging Face sentiment model loaded.")
-
-            self._load_aspect_categories() # This method will now load keywords too
-
+            import spacy
+            self.nlp = spacy.blank("en")
+            self.nlp.add_pipe("sentencizer")
+            self.sentiment_backend = RemoteSentimentBackend(self.inference_client)
             self.initialized = True
-            logger.info("All NLP models initialized successfully.")
             return True
         except Exception as e:
-            logger.critical(f"Failed to initialize NLP models: {e}", exc_info=True)
-            # Crucially, reset everything to None/empty on failure
-            self.nlp = None 
-            self.sentiment_analyzer = None 
+            logger.critical(f"Failed to set up the inference server client: {e}", exc_info=True)
+            self.nlp = None
+            self.sentiment_backend = None
             self.initialized = False
-            self.aspect_category_keywords = {} 
             return False
 
-    def _load_aspect_categories(self):
+    def use_local_models(self):
+        """Drops the inference server client so init_nlp loads the models in this process."""
+        self.inference_client = None
+        self.nlp = None
+        self.sentiment_backend = None
+        self.initialized = False
+
+    @property
+    def aspect_category_keywords(self):
+        return self.taxonomy.aspects
+
+    @property
+    def aspect_matcher(self):
+        return self.taxonomy.matcher
+
+    @property
+    def aspect_phrase_matchers(self):
+        return self.taxonomy.phrase_matchers
+
+    @property
+    def taxonomy_version(self):
+        """Fingerprint of the loaded taxonomy (None before the first load)."""
+        return self.taxonomy.fingerprint
+
+    def _load_aspect_categories(self, version=None):
+        """Loads the taxonomy from the database into a new snapshot and swaps it in."""
+        if self.inference_client is not None:
+            # The taxonomy lives in the inference daemon; ask it to reload
+            try:
+                self.inference_client.reload_taxonomy()
+            except InferenceServerError as e:
+                logger.error(f"Could not reload aspect categories on the inference server: {e}")
+            return
+
         logger.info("Loading predefined aspect categories and keywords from database...")
+        with self._taxonomy_lock:
+            try:
+                # Always acquire app context here
+                with current_app.app_context():
+                    if version is None:
+                        # Read before the rows: an edit committed in between is picked up by the next check
+                        version = current_taxonomy_version()
+                    # Compile the mapping into hash indexes + an Aho-Corasick automaton once per load,
+                    # so per-chunk mapping cost does not grow with the number of keywords.
+                    snapshot = TaxonomySnapshot(version, load_taxonomy_aspects())
+                if self.nlp is not None and self.aspect_extraction_mode == 'phrase_matcher':
+                    snapshot = snapshot.with_phrase_matchers(self._build_aspect_phrase_matchers(snapshot))
+                self.taxonomy = snapshot
+                self._taxonomy_checked_at = time.monotonic()
+                logger.info(f"Loaded {len(snapshot.aspects)} aspects with keywords from database (taxonomy version {version}).")
+                logger.debug(f"Aspect keywords mapping: {dict(snapshot.aspects)}")
+            except Exception as e:
+                # Keep serving the previous snapshot
+                logger.error(f"Could not load aspect categories and keywords from DB. This might be normal if DB is not yet initialized or tables missing: {e}", exc_info=True)
+
+    def current_taxonomy(self, max_age=None):
+        """
+        The taxonomy snapshot to use for a request or batch. Checks the database
+        version counter at most every max_age seconds (taxonomy_check_interval by
+        default) and reloads when another process has changed the taxonomy.
+        """
+        if max_age is None:
+            max_age = self.taxonomy_check_interval
+        now = time.monotonic()
+        if self.inference_client is not None or now - self._taxonomy_checked_at < max_age:
+            return self.taxonomy
+        self._taxonomy_checked_at = now
         try:
-            # Always acquire app context here
             with current_app.app_context():
-                categories = Category.query.options(db.joinedload(Category.aspects).joinedload(Aspect.keywords)).all()
-                self.aspect_category_keywords = {}
-                for category in categories:
-                    for aspect in category.aspects:
-                        aspect_keywords = [kw.keyword.lower() for kw in aspect.keywords]
-                        # Store by aspect_id for direct lookup
-                        self.aspect_category_keywords[aspect.id] = {
-                            'aspect_id': aspect.id,
-                            'aspect_name': aspect.name,
-                            'category_id': category.id,
-                            'category_name': category.name,
-                            'weightage': aspect.weightage,
-                            'keywords': aspect_keywords
-                        }
-                logger.info(f"Loaded {len(self.aspect_category_keywords)} aspects with keywords from database.")
-                logger.debug(f"Aspect keywords mapping: {self.aspect_category_keywords}")
+                version = current_taxonomy_version()
         except Exception as e:
-            logger.error(f"Could not load aspect categories and keywords from DB. This might be normal if DB is not yet initialized or tables missing: {e}", exc_info=True)
-            self.aspect_category_keywords = {}
-
-    def _map_to_predefined_category(self, extracted_aspect_text):
+            logger.warning(f"Could not check the taxonomy version: {e}")
+            return self.taxonomy
+        if not self.taxonomy.loaded or version != self.taxonomy.version:
+            logger.info(f"Taxonomy version changed ({self.taxonomy.version} -> {version}); reloading.")
+            self._load_aspect_categories(version)
+        return self.taxonomy
+
+    def _map_to_predefined_category(self, extracted_aspect_text, taxonomy=None):
         """Maps extracted aspect text to a predefined Aspect ID and matched keyword."""
         logger.debug(f"Attempting to map aspect: '{extracted_aspect_text}'")
-        if not self.aspect_category_keywords:
-            self._load_aspect_categories()
-            if not self.aspect_category_keywords:
-                logger.warning("No aspect categories or keywords loaded for mapping.")
-                return None, None
+        if taxonomy is None:
+            taxonomy = self.current_taxonomy()
+        if not taxonomy.aspects:
+            logger.warning("No aspect categories or keywords loaded for mapping.")
+            return None, None
 
         if not extracted_aspect_text:
             return None, None
 
-        normalized_extracted_aspect = re.sub(r'[^a-z0-9\s]', ' ', extracted_aspect_text.lower()).strip()
+        matcher = taxonomy.matcher
+
+        normalized_extracted_aspect = matcher.normalize(extracted_aspect_text)
         tokens = [t for t in normalized_extracted_aspect.split() if t]
 
         # First pass: Check if the extracted text matches the aspect name itself
-        for aspect_id, aspect_info in self.aspect_category_keywords.items():
-            aspect_name_normalized = aspect_info['aspect_name'].lower()
-            if normalized_extracted_aspect == aspect_name_normalized or aspect_name_normalized in tokens:
-                logger.debug(f"✓ Aspect name match: '{extracted_aspect_text}' → Aspect '{aspect_info['aspect_name']}' (ID: {aspect_id})")
-                return aspect_id, aspect_info['aspect_name'].lower()
-        
-        # Second pass: Check keywords
-        for aspect_id, aspect_info in self.aspect_category_keywords.items():
-            for keyword in aspect_info['keywords']:
-                # Exact match
-                if normalized_extracted_aspect == keyword:
-                    logger.debug(f"✓ Exact match: '{extracted_aspect_text}' → Aspect '{aspect_info['aspect_name']}' (ID: {aspect_id}), keyword: '{keyword}'")
-                    return aspect_id, keyword
-                
-                # Substring match
-                if keyword in normalized_extracted_aspect:
-                    logger.debug(f"✓ Substring match: '{extracted_aspect_text}' contains '{keyword}' → Aspect '{aspect_info['aspect_name']}' (ID: {aspect_id})")
-                    return aspect_id, keyword
-
-                # Token match
-                if keyword in tokens:
-                    logger.debug(f"✓ Token match: '{extracted_aspect_text}' has token '{keyword}' → Aspect '{aspect_info['aspect_name']}' (ID: {aspect_id})")
-                    return aspect_id, keyword
-        
+        aspect_id, aspect_name = matcher.match_name(normalized_extracted_aspect, tokens)
+        if aspect_id is not None:
+            logger.debug(f"✓ Aspect name match: '{extracted_aspect_text}' → Aspect '{aspect_name}' (ID: {aspect_id})")
+            return aspect_id, aspect_name
+
+        # Second pass: Check keywords (exact, substring and token matches)
+        aspect_id, keyword = matcher.match_keyword(normalized_extracted_aspect)
+        if aspect_id is not None:
+            logger.debug(f"✓ Keyword match: '{extracted_aspect_text}' contains '{keyword}' → Aspect ID: {aspect_id}")
+            return aspect_id, keyword
+
         # Fuzzy match against aspect names
-        aspect_names = [info['aspect_name'].lower() for info in self.aspect_category_keywords.values()]
-        close = get_close_matches(normalized_extracted_aspect, aspect_names, n=1, cutoff=0.8)
-        if close:
-            for aspect_id, aspect_info in self.aspect_category_keywords.items():
-                if aspect_info['aspect_name'].lower() == close[0]:
-                    logger.debug(f"✓ Fuzzy match: '{extracted_aspect_text}' → Aspect '{aspect_info['aspect_name']}' (ID: {aspect_id})")
-                    return aspect_id, aspect_info['aspect_name']
+        aspect_id, aspect_name = matcher.match_fuzzy(normalized_extracted_aspect)
+        if aspect_id is not None:
+            logger.debug(f"✓ Fuzzy match: '{extracted_aspect_text}' → Aspect '{aspect_name}' (ID: {aspect_id})")
+            return aspect_id, aspect_name
 
         logger.debug(f"✗ No match found for aspect: '{extracted_aspect_text}'")
         return None, None
@@ -156,146 +273,365 @@ class NLPProcessor:
         text = re.sub(r'\s+', ' ', text).strip()
         return text
 
-    def analyze_sentiment(self, text, aspect_keyword=None):
-        logger.debug(f"analyze_sentiment called for text: '{text[:50]}...' (aspect: {aspect_keyword})")
-        # ADDED CRITICAL CHECK: Ensure sentiment_analyzer is initialized HERE
-        if not self.sentiment_analyzer:
-            logger.warning("Sentiment analyzer is not initialized. Attempting re-initialization.")
+    def _ensure_sentiment_backend(self):
+        # ADDED CRITICAL CHECK: Ensure sentiment_backend is initialized HERE
+        if not self.sentiment_backend:
+            logger.info("Sentiment backend not loaded yet. Initializing NLP models on first use.")
             if not self.init_nlp(): # Try to re-initialize
                 logger.error("Failed to initialize sentiment analyzer during analyze_sentiment call. Returning default (POSITIVE as fallback).")
-                return {"label": "POSITIVE", "score": 0.0}
-        
+                return False
+
         # After attempting re-initialization, check again
-        if not self.sentiment_analyzer:
+        if not self.sentiment_backend:
             logger.error("Sentiment analyzer is still not initialized after re-attempt. Returning default (POSITIVE as fallback).")
+            return False
+        return True
+
+    def _is_price_aspect(self, aspect_keyword):
+        """The only way the aspect keyword influences scoring of a text."""
+        return self.sentiment_rules.is_price_aspect(aspect_keyword)
+
+    def _lexical_override(self, text, aspect_keyword=None):
+        """
+        Cheap rule-based checks applied before the model, evaluated by the rule engine
+        compiled at startup. Returns a sentiment dict when a rule decides the label,
+        otherwise None.
+        """
+        return self.sentiment_rules.evaluate(text, is_price_aspect=self._is_price_aspect(aspect_keyword))
+
+    def _scores_to_label(self, scores):
+        """
+        Turns one text's {'negative', 'neutral', 'positive'} probabilities from the
+        sentiment backend into the final label. Shared by every backend.
+        """
+        if not scores:
+            logger.warning("Sentiment backend returned empty or invalid results. Returning default (POSITIVE as fallback).")
             return {"label": "POSITIVE", "score": 0.0}
 
-        # Check for strong neutral phrases first (only exact matches)
-        text_lower = text.lower()
-        strong_neutral_phrases = [
-            'neither good nor bad', 'neither cheap nor expensive', 
-            'neither positive nor negative', 'neither great nor terrible'
-        ]
-        
-        # Only override for very strong neutral indicators
-        for phrase in strong_neutral_phrases:
-            if phrase in text_lower:
-                logger.debug(f"Strong neutral phrase '{phrase}' found in text. Returning NEUTRAL.")
-                return {"label": "NEUTRAL", "score": 0.7}
-        
-        # Check for clearly negative price-related phrases
-        negative_price_patterns = [
-            ('high', ['price', 'cost', 'expensive']),
-            ('expensive', ['price', 'cost', 'high']),
-            ('overpriced', []),
-            ('costly', []),
-            ('pricey', [])
-        ]
-        
-        # Check if analyzing a price-related aspect
-        is_price_aspect = aspect_keyword and any(word in aspect_keyword.lower() for word in ['price', 'cost', 'pricing'])
-        logger.debug(f"Price aspect check: aspect_keyword={aspect_keyword}, is_price_aspect={is_price_aspect}")
-        
-        # Check for softeners that make it neutral instead of negative
-        softeners = ['a bit', 'a little', 'slightly', 'somewhat', 'kind of', 'sort of', 'fairly', 'rather']
-        has_softener = any(softener in text_lower for softener in softeners)
-        
-        for neg_word, context_words in negative_price_patterns:
-            if neg_word in text_lower:
-                logger.debug(f"Found '{neg_word}' in text. Checking if price-related...")
-                # Check if it's about price/cost (either in text OR analyzing price aspect)
-                if is_price_aspect or not context_words or any(ctx in text_lower for ctx in context_words):
-                    logger.debug(f"Price context confirmed. Checking negation and softeners...")
-                    # Check for negation (e.g., "not high")
-                    if 'not ' + neg_word in text_lower or "n't " + neg_word in text_lower:
-                        logger.debug(f"Negation found, skipping.")
-                        continue
-                    # Check for softeners (e.g., "a bit high")
-                    if has_softener:
-                        logger.debug(f"Softener found ('{[s for s in softeners if s in text_lower]}'), treating as neutral, skipping negative override.")
-                        continue
-                    # Strong negative without softeners
-                    logger.info(f"✓ NEGATIVE PRICE DETECTED: '{neg_word}' (aspect: {aspect_keyword}, text: '{text_lower}'). Returning NEGATIVE.")
-                    return {"label": "NEGATIVE", "score": 0.75}
-        
-        # Check for single neutral keywords (but only if they're the main descriptor)
-        neutral_keywords = ['average', 'okay', 'ok', 'standard', 'normal', 'typical', 'usual', 'regular', 'moderate']
+        logger.debug(f"Extracted Scores Dict: {scores}")
+
+        neg_score = scores.get('negative', 0.0)
+        neu_score = scores.get('neutral', 0.0)
+        pos_score = scores.get('positive', 0.0)
+        logger.debug(f"Individual Scores: Neg={neg_score}, Neu={neu_score}, Pos={pos_score}")
+
+        # Determine sentiment based on highest score
+        max_score = max(neg_score, neu_score, pos_score)
         
-        # Only apply if the keyword is prominent and not mixed with strong positive/negative words
-        has_neutral_keyword = any(keyword in text_lower for keyword in neutral_keywords)
-        has_strong_negative = any(word in text_lower for word in ['terrible', 'awful', 'horrible', 'worst', 'disappointing', 'poor', 'bad'])
-        has_strong_positive = any(word in text_lower for word in ['excellent', 'amazing', 'great', 'awesome', 'fantastic', 'perfect', 'wonderful'])
+        # Only prefer neutral if it's clearly the highest OR if all scores are very close
+        score_diff = max_score - min(neg_score, neu_score, pos_score)
         
-        if has_neutral_keyword and not has_strong_negative and not has_strong_positive:
-            logger.debug(f"Neutral keyword found without strong sentiment words. Returning NEUTRAL.")
-            return {"label": "NEUTRAL", "score": 0.7}
+        if max_score == neu_score and neu_score > max(neg_score, pos_score):
+            # Neutral is clearly the highest
+            final_label = 'NEUTRAL'
+            final_score = neu_score
+        elif score_diff < 0.1:
+            # All scores are very close, prefer neutral
+            final_label = 'NEUTRAL'
+            final_score = neu_score
+        elif max_score == pos_score:
+            final_label = 'POSITIVE'
+            final_score = pos_score
+        elif max_score == neg_score:
+            final_label = 'NEGATIVE'
+            final_score = neg_score
+        else:
+            final_label = 'NEUTRAL'
+            final_score = neu_score
 
-        try:
-            results = self.sentiment_analyzer(text)
-            logger.debug(f"Sentiment Analyzer Raw Results: {results}")
+        logger.debug(f"Final Sentiment: Label={final_label}, Score={final_score}")
+        return {"label": final_label, "score": final_score}
 
-            if not results or not results[0]:
-                logger.warning("Sentiment analyzer returned empty or invalid results. Returning default (POSITIVE as fallback).")
-                return {"label": "POSITIVE", "score": 0.0}
-            
-            scores = {item['label']: item['score'] for item in results[0]}
-            logger.debug(f"Extracted Scores Dict: {scores}")
+    def analyze_sentiment(self, text, aspect_keyword=None):
+        logger.debug(f"analyze_sentiment called for text: '{text[:50]}...' (aspect: {aspect_keyword})")
+        return self.analyze_sentiment_batch([text], [aspect_keyword])[0]
 
-            neg_score = scores.get('negative', 0.0)
-            neu_score = scores.get('neutral', 0.0)
-            pos_score = scores.get('positive', 0.0)
-            logger.debug(f"Individual Scores: Neg={neg_score}, Neu={neu_score}, Pos={pos_score}")
+    def analyze_sentiment_batch(self, texts, aspect_keywords=None, batch_size=None):
+        """
+        Scores many texts at once. Lexical override rules are applied first; only the
+        remaining texts go through the model, in padded batches of `batch_size`.
+        Results are returned in input order.
+        """
+        texts = list(texts)
+        if aspect_keywords is None:
+            aspect_keywords = [None] * len(texts)
+        logger.debug(f"analyze_sentiment_batch called for {len(texts)} texts.")
 
-            # Determine sentiment based on highest score
-            max_score = max(neg_score, neu_score, pos_score)
-            
-            # Only prefer neutral if it's clearly the highest OR if all scores are very close
-            score_diff = max_score - min(neg_score, neu_score, pos_score)
-            
-            if max_score == neu_score and neu_score > max(neg_score, pos_score):
-                # Neutral is clearly the highest
-                final_label = 'NEUTRAL'
-                final_score = neu_score
-            elif score_diff < 0.1:
-                # All scores are very close, prefer neutral
-                final_label = 'NEUTRAL'
-                final_score = neu_score
-            elif max_score == pos_score:
-                final_label = 'POSITIVE'
-                final_score = pos_score
-            elif max_score == neg_score:
-                final_label = 'NEGATIVE'
-                final_score = neg_score
+        if not texts:
+            return []
+        if not self._ensure_sentiment_backend():
+            return [{"label": "POSITIVE", "score": 0.0} for _ in texts]
+
+        results = [None] * len(texts)
+        pending = {}  # cache key -> indices waiting for the model
+        overrides = 0
+        for idx, (text, aspect_keyword) in enumerate(zip(texts, aspect_keywords)):
+            override = self._lexical_override(text, aspect_keyword=aspect_keyword)
+            if override is not None:
+                results[idx] = override
+                overrides += 1
+                continue
+
+            cache_key = self._sentiment_cache_key(text, aspect_keyword)
+            if cache_key in pending:
+                pending[cache_key].append(idx)
+                continue
+            cached = self.sentiment_cache.get(cache_key)
+            if cached is not None:
+                results[idx] = dict(cached)
             else:
-                final_label = 'NEUTRAL'
-                final_score = neu_score
+                pending[cache_key] = [idx]
+
+        if pending:
+            # Second level: the on-disk cache shared by all workers on this node
+            persistent_keys = {cache_key: self._persistent_sentiment_key(cache_key) for cache_key in pending}
+            stored = self.persistent_cache.get_many('sentiment', persistent_keys.values())
+            for cache_key in list(pending):
+                result = stored.get(persistent_keys[cache_key])
+                if result is not None:
+                    self.sentiment_cache.set(cache_key, result)
+                    for idx in pending.pop(cache_key):
+                        results[idx] = dict(result)
+
+        if pending:
+            cache_keys = list(pending)
+            try:
+                model_outputs = self.sentiment_backend.score_batch(
+                    [cache_key[0] for cache_key in cache_keys],
+                    batch_size=batch_size or self.sentiment_batch_size
+                )
+                logger.debug(f"Sentiment Backend Raw Results: {model_outputs}")
+                to_persist = {}
+                for cache_key, output in zip(cache_keys, model_outputs):
+                    result = self._scores_to_label(output)
+                    self.sentiment_cache.set(cache_key, result)
+                    to_persist[persistent_keys[cache_key]] = result
+                    for idx in pending[cache_key]:
+                        results[idx] = dict(result)
+                self.persistent_cache.set_many('sentiment', to_persist)
+            except Exception as e:
+                logger.critical(f"Exception during sentiment analysis: {e}", exc_info=True)
+                for indices in pending.values():
+                    for idx in indices:
+                        results[idx] = {"label": "POSITIVE", "score": 0.0}
+
+        logger.debug(f"Batch sentiment: {overrides} rule overrides, {len(texts) - overrides - len(pending)} cache hits, {len(pending)} model inferences.")
+        return results
+
+    def _sentiment_cache_key(self, text, aspect_keyword=None):
+        """
+        Key for the sentiment cache: whitespace-normalized text, the price-aspect flag
+        (the only part of aspect_keyword that affects scoring) and the model version.
+        The normalized text is also what gets sent to the model.
+        """
+        normalized_text = re.sub(r'\s+', ' ', text).strip()
+        return (normalized_text, self._is_price_aspect(aspect_keyword), self.sentiment_model_version())
 
-            logger.debug(f"Final Sentiment: Label={final_label}, Score={final_score}")
-            return {"label": final_label, "score": final_score}
+    def _persistent_sentiment_key(self, cache_key):
+        normalized_text, is_price_aspect, _ = cache_key
+        return self.persistent_cache.make_key(normalized_text, is_price_aspect, self.sentiment_model_version())
 
-        except Exception as e:
-            logger.critical(f"Exception during sentiment analysis: {e}", exc_info=True)
-            return {"label": "POSITIVE", "score": 0.0}
+    def _persistent_aspects_key(self, text, taxonomy):
+        return self.persistent_cache.make_key(
+            text, self.aspect_extraction_mode, self.spacy_model_version(), taxonomy.fingerprint
+        )
 
-    def extract_aspects(self, text):
-        logger.debug(f"extract_aspects called for text: '{text[:50]}...'")
+    def sentiment_model_version(self):
+        """Identifies the backend (and model) producing sentiment scores, for cache keys."""
+        if not self.sentiment_backend:
+            return None
+        return self.sentiment_backend.version()
+
+    def analysis_version(self):
+        """
+        Fingerprint of everything that determines a review's stored analysis: sentiment
+        model, spaCy model, extraction mode, taxonomy and lexical rules. Reviews with the
+        same text and analysis version get identical results. None if the models or the
+        taxonomy are not available (nothing should then be reused).
+        """
+        if not self.initialized and not self.init_nlp():
+            return None
+        if self.inference_client is not None:
+            # Aspects are extracted by the daemon, with its model and taxonomy
+            try:
+                info = self.inference_client.info()
+            except InferenceServerError as e:
+                logger.warning(f"Could not get the analysis version from the inference server: {e}")
+                return None
+            spacy_version, extraction_mode, taxonomy_version = (
+                info['spacy_model_version'], info['aspect_extraction_mode'], info['taxonomy_version']
+            )
+        else:
+            spacy_version, extraction_mode, taxonomy_version = (
+                self.spacy_model_version(), self.aspect_extraction_mode, self.current_taxonomy().fingerprint
+            )
+        sentiment_version = self.sentiment_model_version()
+        if None in (sentiment_version, spacy_version, taxonomy_version):
+            return None
+        return PersistentInferenceCache.make_key(
+            sentiment_version, spacy_version, extraction_mode, taxonomy_version, self.sentiment_rules.rules
+        )
+
+    def spacy_model_version(self):
+        if not self.nlp:
+            return None
+        return f"{self.nlp.meta.get('name')}-{self.nlp.meta.get('version')}"
+
+    def cache_stats(self):
+        """Hit/miss counters of the in-process sentiment cache and the on-disk cache."""
+        stats = self.sentiment_cache.stats()
+        stats['persistent'] = self.persistent_cache.stats()
+        return stats
+
+    def sentence_splitter(self):
+        """
+        A spaCy pipeline that splits sentences, for views that only need sentence
+        boundaries. Reuses the loaded pipeline if there is one; otherwise builds a
+        blank pipeline with a sentencizer (as _init_remote does) without loading the
+        models. Returns None if spaCy cannot be imported.
+        """
+        if self.nlp is not None:
+            return self.nlp
+        if self._sentence_splitter is None:
+            with self._init_lock:
+                if self._sentence_splitter is None:
+                    try:
+                        import spacy
+                        splitter = spacy.blank("en")
+                        splitter.add_pipe("sentencizer")
+                        self._sentence_splitter = splitter
+                    except Exception as e:
+                        logger.error(f"Failed to build the spaCy sentence splitter: {e}", exc_info=True)
+                        return None
+        return self._sentence_splitter
+
+    def _ensure_nlp(self):
         # ADDED CRITICAL CHECK: Ensure nlp model is initialized HERE
         if not self.nlp:
-            logger.warning("spaCy NLP model not initialized for aspect extraction. Attempting re-initialization.")
+            logger.info("spaCy NLP model not loaded yet. Initializing NLP models on first use.")
             if not self.init_nlp(): # Try to re-initialize
                 logger.error("Failed to initialize spaCy NLP model during extract_aspects call. Returning empty list.")
-                return []
+                return False
         
         # After attempting re-initialization, check again
         if not self.nlp:
             logger.error("spaCy NLP model is still not initialized after re-attempt. Returning empty list.")
+            return False
+        return True
+
+    def extract_aspects(self, text):
+        logger.debug(f"extract_aspects called for text: '{text[:50]}...'")
+        if self.inference_client is not None:
+            try:
+                return self.inference_client.extract_aspects([text])[0]
+            except InferenceServerError as e:
+                logger.critical(f"Exception during remote aspect extraction: {e}")
+                return []
+        if not self._ensure_nlp():
             return []
 
+        taxonomy = self.current_taxonomy()
+        persistent_key = self._persistent_aspects_key(text, taxonomy)
+        cached = self.persistent_cache.get('aspects', persistent_key)
+        if cached is not None:
+            logger.debug(f"Aspect extraction cache hit ({len(cached)} aspects).")
+            return cached
+
         try:
             preprocessed_text = self._preprocess_text_for_spacy(text)
             logger.debug(f"Preprocessed text for spaCy: '{preprocessed_text[:50]}...'")
+            doc = self.nlp(preprocessed_text, disable=self._extraction_disabled_pipes())
+        except Exception as e:
+            logger.critical(f"Exception during aspect extraction: {e}", exc_info=True)
+            return []
+        aspects_data = self._aspects_from_doc(doc, text, taxonomy)
+        if aspects_data is None:
+            return []
+        self.persistent_cache.set('aspects', persistent_key, aspects_data)
+        return aspects_data
 
-            doc = self.nlp(preprocessed_text)
+    def extract_aspects_many(self, texts, n_process=None, batch_size=None):
+        """
+        Bulk variant of extract_aspects built on nlp.pipe. Parsing is spread over
+        `n_process` worker processes; results are streamed as (index, aspects) pairs
+        in input order, with each aspects list in the same format as extract_aspects.
+        """
+        if self.inference_client is not None:
+            yield from self._extract_aspects_remote(texts, batch_size or self.spacy_batch_size)
+            return
+        if not self._ensure_nlp():
+            for index, _ in enumerate(texts):
+                yield index, []
+            return
+
+        # One snapshot for the whole batch, even if a reload swaps in a newer one meanwhile
+        taxonomy = self.current_taxonomy()
+
+        # Reviews already in the on-disk cache skip parsing; their results are held
+        # here until the stream reaches their position, so output stays in input order.
+        cached_results = {}
+
+        def _pipe_inputs():
+            for index, text in enumerate(texts):
+                persistent_key = self._persistent_aspects_key(text, taxonomy)
+                cached = self.persistent_cache.get('aspects', persistent_key)
+                if cached is not None:
+                    cached_results[index] = cached
+                    continue
+                yield self._preprocess_text_for_spacy(text), (index, text, persistent_key)
+
+        docs = self.nlp.pipe(
+            _pipe_inputs(),
+            as_tuples=True,
+            n_process=n_process or self.spacy_n_process,
+            batch_size=batch_size or self.spacy_batch_size,
+            disable=self._extraction_disabled_pipes()
+        )
+        next_index = 0
+        for doc, (index, text, persistent_key) in docs:
+            while next_index < index:
+                yield next_index, cached_results.pop(next_index)
+                next_index += 1
+            aspects_data = self._aspects_from_doc(doc, text, taxonomy)
+            if aspects_data is None:
+                aspects_data = []
+            else:
+                self.persistent_cache.set('aspects', persistent_key, aspects_data)
+            yield index, aspects_data
+            next_index = index + 1
+        for index in sorted(cached_results):
+            yield index, cached_results.pop(index)
+
+    def _extract_aspects_remote(self, texts, batch_size):
+        """extract_aspects_many through the inference server, one request per chunk."""
+        chunk = []
+        start = 0
+        for index, text in enumerate(texts):
+            chunk.append(text)
+            if len(chunk) >= batch_size:
+                yield from self._extract_remote_chunk(start, chunk)
+                start, chunk = index + 1, []
+        if chunk:
+            yield from self._extract_remote_chunk(start, chunk)
+
+    def _extract_remote_chunk(self, start, chunk):
+        try:
+            results = self.inference_client.extract_aspects(chunk)
+        except InferenceServerError as e:
+            logger.critical(f"Exception during remote aspect extraction: {e}")
+            results = [[] for _ in chunk]
+        for offset, aspects_data in enumerate(results):
+            yield start + offset, aspects_data
+
+    def _aspects_from_doc(self, doc, text, taxonomy):
+        """Aspects found in a parsed review, or None if extraction failed."""
+        if self.aspect_extraction_mode == 'phrase_matcher':
+            return self._aspects_from_phrase_matches(doc, text, taxonomy)
+        return self._aspects_from_noun_chunks(doc, text, taxonomy)
+
+    def _aspects_from_noun_chunks(self, doc, text, taxonomy):
+        """Maps the noun chunks of a parsed review to predefined aspects."""
+        try:
             aspects_data = []
             
             for sent_idx, sent in enumerate(doc.sents):
@@ -310,7 +646,7 @@ class NLPProcessor:
                     normalized_tokens = [token.lemma_.lower() for token in chunk if token.pos_ in ("NOUN", "PROPN")]
                     normalized_extracted_aspect = " ".join(normalized_tokens) if normalized_tokens else full_chunk_text.lower()
 
-                    aspect_category_id, matched_keyword = self._map_to_predefined_category(normalized_extracted_aspect)
+                    aspect_category_id, matched_keyword = self._map_to_predefined_category(normalized_extracted_aspect, taxonomy)
                     
                     # Skip if no aspect matched
                     if not aspect_category_id:
@@ -324,55 +660,160 @@ class NLPProcessor:
                     # Mark this aspect as seen in this sentence
                     seen_aspects_in_sentence.add(aspect_category_id)
 
-                    chunk_start_in_sent = chunk.start_char - sent.start_char
-                    chunk_end_in_sent = chunk.end_char - sent.start_char
-
-                    context_start_char_in_sent = max(0, chunk_start_in_sent - 20)
-                    context_end_char_in_sent = min(len(sentence_text), chunk_end_in_sent + 20)
-                    
-                    context_snippet = sentence_text[context_start_char_in_sent:context_end_char_in_sent].strip()
-
-                    if not context_snippet or len(context_snippet) <= len(matched_keyword) + 5:
-                        context_snippet = sentence_text
-
-                    # Find the position of the matched keyword in the original text
-                    # Search for the keyword within the sentence context
-                    keyword_pattern = re.compile(re.escape(matched_keyword), re.IGNORECASE)
-                    match = keyword_pattern.search(text)
-                    start_char_original = -1
-                    end_char_original = -1
-
-                    if match:
-                        start_char_original = match.start()
-                        end_char_original = match.end()
-                    else:
-                        logger.warning(f"Could not find exact match for keyword '{matched_keyword}' in original text. Skipping.")
-                        continue
-
-                    aspects_data.append({
-                        'raw_extracted_aspect': normalized_extracted_aspect,
-                        'aspect_category_id': aspect_category_id,
-                        'keyword_found': matched_keyword,
-                        'sentence': sentence_text,
-                        'context_snippet': context_snippet,
-                        'start_char': start_char_original,
-                        'end_char': end_char_original
-                    })
+                    aspect_record = self._build_aspect_record(
+                        text, sent, chunk, normalized_extracted_aspect, aspect_category_id, matched_keyword
+                    )
+                    if aspect_record:
+                        aspects_data.append(aspect_record)
             logger.debug(f"Extracted {len(aspects_data)} aspects.")
             return aspects_data
         except Exception as e:
             logger.critical(f"Exception during aspect extraction: {e}", exc_info=True)
+            return None
+
+    def _build_aspect_record(self, text, sent, span, raw_extracted_aspect, aspect_category_id, matched_keyword):
+        """Builds the aspect dict returned by extract_aspects for one matched span of a sentence."""
+        sentence_text = sent.text
+
+        span_start_in_sent = span.start_char - sent.start_char
+        span_end_in_sent = span.end_char - sent.start_char
+
+        context_start_char_in_sent = max(0, span_start_in_sent - 20)
+        context_end_char_in_sent = min(len(sentence_text), span_end_in_sent + 20)
+        
+        context_snippet = sentence_text[context_start_char_in_sent:context_end_char_in_sent].strip()
+
+        if not context_snippet or len(context_snippet) <= len(matched_keyword) + 5:
+            context_snippet = sentence_text
+
+        # Find the position of the matched keyword in the original text
+        # Search for the keyword within the sentence context
+        keyword_pattern = re.compile(re.escape(matched_keyword), re.IGNORECASE)
+        match = keyword_pattern.search(text)
+        start_char_original = -1
+        end_char_original = -1
+
+        if match:
+            start_char_original = match.start()
+            end_char_original = match.end()
+        else:
+            logger.warning(f"Could not find exact match for keyword '{matched_keyword}' in original text. Skipping.")
+            return None
+
+        return {
+            'raw_extracted_aspect': raw_extracted_aspect,
+            'aspect_category_id': aspect_category_id,
+            'keyword_found': matched_keyword,
+            'sentence': sentence_text,
+            'context_snippet': context_snippet,
+            'start_char': start_char_original,
+            'end_char': end_char_original
+        }
+
+    def _extraction_disabled_pipes(self):
+        """Pipeline components skipped during extraction in the current mode."""
+        if self.aspect_extraction_mode != 'phrase_matcher' or not self.nlp:
             return []
+        return [name for name in ('parser', 'ner') if name in self.nlp.pipe_names]
 
-    def analyze_aspect_sentiment(self, sentence, aspect_keyword=None, aspect_start=None, aspect_end=None):
+    def _build_aspect_phrase_matchers(self, taxonomy):
         """
-        Analyzes sentiment for an aspect within a sentence.
-        Extracts a context window around the aspect for more accurate sentiment.
+        Compiles the aspect names and keywords of a taxonomy snapshot into two PhraseMatchers: one on lemmas
+        (so "batteries" hits "battery") and one on lowercase surface forms.
+        Match ids encode the rank of the pattern so overlapping hits can be resolved
+        with the same precedence as _map_to_predefined_category.
+        """
+        from spacy.matcher import PhraseMatcher
+        lemma_matcher = PhraseMatcher(self.nlp.vocab, attr="LEMMA")
+        lower_matcher = PhraseMatcher(self.nlp.vocab, attr="LOWER")
+        match_info = {}
+
+        patterns = []
+        for aspect_rank, (aspect_id, aspect_info) in enumerate(taxonomy.aspects.items()):
+            # Aspect names take precedence over keywords, like in the mapping passes
+            patterns.append(((0, aspect_rank, 0), aspect_id, aspect_info['aspect_name'].lower()))
+            for keyword_rank, keyword in enumerate(aspect_info['keywords']):
+                if keyword.strip():
+                    patterns.append(((1, aspect_rank, keyword_rank), aspect_id, keyword))
+
+        disabled = [name for name in ('parser', 'ner') if name in self.nlp.pipe_names]
+        pattern_docs = self.nlp.pipe([pattern for _, _, pattern in patterns], disable=disabled)
+        for (rank, aspect_id, pattern), pattern_doc in zip(patterns, pattern_docs):
+            key = f"aspect_pattern:{aspect_id}:{pattern}"
+            match_id = self.nlp.vocab.strings.add(key)
+            if match_id not in match_info or rank < match_info[match_id][0]:
+                match_info[match_id] = (rank, aspect_id, pattern)
+            lemma_matcher.add(key, [pattern_doc])
+            lower_matcher.add(key, [self.nlp.make_doc(pattern)])
+
+        logger.info(f"Compiled {len(match_info)} aspect name/keyword patterns into PhraseMatchers.")
+        return (lemma_matcher, lower_matcher, match_info)
+
+    def _aspects_from_phrase_matches(self, doc, text, taxonomy):
+        """
+        Finds aspects by matching compiled keywords against the review, without the
+        dependency parser. Overlapping hits keep the longest span (then the
+        highest-precedence pattern); each aspect is reported once per sentence.
+        """
+        try:
+            phrase_matchers = taxonomy.phrase_matchers
+            if phrase_matchers is None:
+                # Snapshot loaded before spaCy or in another mode; compile once and publish
+                phrase_matchers = self._build_aspect_phrase_matchers(taxonomy)
+                if self.taxonomy is taxonomy:
+                    self.taxonomy = taxonomy.with_phrase_matchers(phrase_matchers)
+            lemma_matcher, lower_matcher, match_info = phrase_matchers
+
+            # Collect hits per token span, keeping the highest-precedence pattern for each
+            hits = {}
+            for matcher in (lemma_matcher, lower_matcher):
+                for match_id, start, end in matcher(doc):
+                    rank, aspect_id, pattern = match_info[match_id]
+                    if (start, end) not in hits or rank < hits[(start, end)][0]:
+                        hits[(start, end)] = (rank, aspect_id, pattern)
+
+            # Longest span first, then precedence; drop spans overlapping an accepted one
+            ordered = sorted(hits.items(), key=lambda item: (-(item[0][1] - item[0][0]), item[1][0], item[0][0]))
+            taken_tokens = set()
+            accepted = []
+            for (start, end), hit in ordered:
+                if any(i in taken_tokens for i in range(start, end)):
+                    continue
+                taken_tokens.update(range(start, end))
+                accepted.append((start, end, hit))
+
+            aspects_data = []
+            seen_aspects_by_sentence = {}  # Track which aspects we've already found in each sentence
+            for start, end, (rank, aspect_id, matched_keyword) in sorted(accepted):
+                span = doc[start:end]
+                sent = span.sent
+                seen_aspects_in_sentence = seen_aspects_by_sentence.setdefault(sent.start, set())
+                if aspect_id in seen_aspects_in_sentence:
+                    logger.debug(f"Skipping duplicate aspect '{matched_keyword}' (Aspect ID: {aspect_id}) in same sentence")
+                    continue
+                seen_aspects_in_sentence.add(aspect_id)
+
+                raw_extracted_aspect = " ".join(token.lemma_.lower() for token in span)
+                aspect_record = self._build_aspect_record(
+                    text, sent, span, raw_extracted_aspect, aspect_id, matched_keyword
+                )
+                if aspect_record:
+                    aspects_data.append(aspect_record)
+            logger.debug(f"Extracted {len(aspects_data)} aspects (phrase matcher).")
+            return aspects_data
+        except Exception as e:
+            logger.critical(f"Exception during aspect extraction: {e}", exc_info=True)
+            return None
+
+    def aspect_context_window(self, sentence, aspect_keyword=None, aspect_start=None, aspect_end=None):
+        """
+        Returns the text to score for an aspect: a window of words around the aspect,
+        or the whole sentence when the aspect cannot be located.
         """
         if not aspect_keyword or aspect_start is None or aspect_end is None:
             # Fallback: analyze entire sentence
             logger.debug(f"Analyzing entire sentence (no aspect position): '{sentence[:50]}...'")
-            return self.analyze_sentiment(sentence, aspect_keyword=aspect_keyword)
+            return sentence
         
         # Extract context window: aspect + surrounding words (5 words before and after)
         words = sentence.split()
@@ -402,11 +843,70 @@ class NLPProcessor:
             
             context = ' '.join(words[context_start:context_end])
             logger.debug(f"Aspect '{aspect_keyword}' context window: '{context}'")
-            return self.analyze_sentiment(context, aspect_keyword=aspect_keyword)
+            return context
         else:
             # Fallback if aspect not found in sentence
             logger.debug(f"Aspect '{aspect_keyword}' not found in sentence, analyzing full sentence")
-            return self.analyze_sentiment(sentence, aspect_keyword=aspect_keyword)
+            return sentence
+
+    def analyze_review(self, text, aspects_data):
+        """
+        Scores a review and all of its extracted aspects in one batched model call.
+        Returns (overall_result, aspect_results) with aspect_results aligned to aspects_data.
+        """
+        return self.analyze_reviews([text], [aspects_data])[0]
+
+    def analyze_reviews(self, texts, aspects_per_text):
+        """
+        Batched form of analyze_review. Context windows are collected for every aspect,
+        identical (window, price-aspect) pairs are scored once, and everything -- the
+        overall review texts included -- goes through a single analyze_sentiment_batch call.
+        """
+        unique_slots = {}
+        batch_texts = []
+        batch_keywords = []
+
+        def _slot(window, aspect_keyword):
+            key = (window, self._is_price_aspect(aspect_keyword))
+            if key not in unique_slots:
+                unique_slots[key] = len(batch_texts)
+                batch_texts.append(window)
+                batch_keywords.append(aspect_keyword)
+            return unique_slots[key]
+
+        plan = []
+        for text, aspects_data in zip(texts, aspects_per_text):
+            overall_slot = _slot(text, None)
+            aspect_slots = [
+                _slot(
+                    self.aspect_context_window(
+                        aspect_data.get('sentence'),
+                        aspect_keyword=aspect_data.get('keyword_found'),
+                        aspect_start=aspect_data.get('start_char'),
+                        aspect_end=aspect_data.get('end_char')
+                    ),
+                    aspect_data.get('keyword_found')
+                )
+                for aspect_data in aspects_data
+            ]
+            plan.append((overall_slot, aspect_slots))
+
+        total_windows = sum(1 + len(aspect_slots) for _, aspect_slots in plan)
+        logger.debug(f"analyze_reviews: {total_windows} texts/windows, {len(batch_texts)} unique after dedup.")
+        scored = self.analyze_sentiment_batch(batch_texts, batch_keywords)
+
+        return [
+            (dict(scored[overall_slot]), [dict(scored[slot]) for slot in aspect_slots])
+            for overall_slot, aspect_slots in plan
+        ]
+
+    def analyze_aspect_sentiment(self, sentence, aspect_keyword=None, aspect_start=None, aspect_end=None):
+        """
+        Analyzes sentiment for an aspect within a sentence.
+        Extracts a context window around the aspect for more accurate sentiment.
+        """
+        context = self.aspect_context_window(sentence, aspect_keyword, aspect_start, aspect_end)
+        return self.analyze_sentiment(context, aspect_keyword=aspect_keyword)
 
 
     def highlight_review_aspects(self, review_content, aspects_data):
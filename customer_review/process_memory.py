@@ -0,0 +1,47 @@
+# process_memory.py
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def memory_usage(pid='self'):
+    """
+    Memory of a process in kB, read from /proc/<pid>/smaps_rollup (Linux only).
+
+    uss is the memory only this process holds (private pages); with a preloaded
+    gunicorn master it is what each extra worker really costs. pss splits the
+    shared pages evenly across the processes sharing them. Returns None when
+    the information is not available.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding='ascii') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1])
+    except OSError:
+        return None
+
+    private = fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    shared = fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)
+    return {
+        'pid': os.getpid() if pid == 'self' else pid,
+        'rss_kb': fields.get('Rss', 0),
+        'pss_kb': fields.get('Pss', 0),
+        'uss_kb': private,
+        'shared_kb': shared
+    }
+
+
+def log_memory_usage(label, log=None):
+    log = log or logger
+    usage = memory_usage()
+    if usage is None:
+        log.debug(f"{label}: memory usage unavailable on this platform.")
+        return None
+    log.info(f"{label}: pid {usage['pid']} uss={usage['uss_kb'] / 1024:.1f}MB "
+             f"pss={usage['pss_kb'] / 1024:.1f}MB rss={usage['rss_kb'] / 1024:.1f}MB "
+             f"shared={usage['shared_kb'] / 1024:.1f}MB")
+    return usage
@@ -0,0 +1,221 @@
+# rollups.py
+"""
+Per-user daily rollup of aspect mentions (the aspect_daily_rollup table).
+
+Each row holds, for one user, day, aspect and category, the number of mentions
+per sentiment label, the number of mentions overall and with a score, and the
+sums of the sentiment scores and of the effective scores (see
+effective_score_expression).
+Category summaries and sentiment/category trends are computed from these rows,
+so their cost depends on the number of days and aspects shown, not on how many
+reviews are stored.
+
+The table is kept in step with AspectSentiment in the transaction that changes
+it: add_reviews() after reviews and their aspects are inserted, remove_reviews()
+before they are deleted, and both around a re-mapping or an aspect delete. The
+deltas are computed from the stored rows with one grouped query and applied with
+an upsert that adds to the counters, so concurrent writers for the same day and
+aspect do not lose updates. `flask rebuild-rollups` recomputes the table from scratch.
+"""
+import datetime
+import logging
+
+from sqlalchemy import Integer, case, cast, delete, func, select, update
+
+from models import db, RawText, AspectSentiment, Aspect, AspectDailyRollup
+
+logger = logging.getLogger(__name__)
+
+UNMAPPED_ID = 0  # aspect_id / category_id of mentions not mapped to an aspect
+GRANULARITIES = ('day', 'week', 'month', 'quarter', 'year')
+
+KEY_COLUMNS = ('user_id', 'day', 'aspect_id', 'category_id')
+SUM_COLUMNS = (
+    'positive_count', 'negative_count', 'neutral_count', 'total_count', 'scored_count', 'score_sum',
+    'effective_score_sum'
+)
+
+
+def effective_score_expression():
+    """
+    SQL expression of a mention's effective score: 0.5 + score/2 when positive,
+    -0.5 - score/2 when negative, 0 otherwise.
+    """
+    sentiment = func.lower(AspectSentiment.sentiment)
+    return case(
+        (sentiment == 'positive', 0.5 + AspectSentiment.score * 0.5),
+        (sentiment == 'negative', -0.5 - AspectSentiment.score * 0.5),
+        else_=0.0
+    )
+
+
+def _label_count(label):
+    return func.sum(case((func.lower(AspectSentiment.sentiment) == label, 1), else_=0))
+
+
+def to_date(value):
+    """Day or bucket value read back from the database as a date (SQLite returns strings)."""
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value))
+
+
+def bucket_start_expression(granularity):
+    """
+    SQL expression of the first day of the bucket holding AspectDailyRollup.day:
+    the day itself, the Monday of its week, or the first day of its month, quarter
+    or year.
+    """
+    day = AspectDailyRollup.day
+    if granularity == 'day':
+        return day
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity '{granularity}'.")
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        if granularity == 'week':
+            return func.subdate(day, func.weekday(day))
+        if granularity == 'quarter':
+            return func.concat(func.year(day), '-', func.lpad(func.quarter(day) * 3 - 2, 2, '0'), '-01')
+        if granularity == 'year':
+            return func.date_format(day, '%Y-01-01')
+        return func.date_format(day, '%Y-%m-01')
+    if dialect == 'sqlite':
+        if granularity == 'week':
+            return func.date(day, 'weekday 0', '-6 days')
+        if granularity == 'quarter':
+            months_into_quarter = (cast(func.strftime('%m', day), Integer) - 1) % 3
+            return func.date(day, 'start of month', func.printf('-%d months', months_into_quarter))
+        if granularity == 'year':
+            return func.date(day, 'start of year')
+        return func.date(day, 'start of month')
+    return func.date_trunc(granularity, day)
+
+
+def _review_deltas(review_filter):
+    """Rollup rows of the stored AspectSentiment rows of the reviews matching review_filter."""
+    day = func.date(RawText.timestamp)
+    aspect_id = func.coalesce(AspectSentiment.aspect_id, UNMAPPED_ID)
+    category_id = func.coalesce(Aspect.category_id, UNMAPPED_ID)
+    rows = db.session.execute(
+        select(
+            RawText.user_id, day, aspect_id, category_id,
+            _label_count('positive'), _label_count('negative'), _label_count('neutral'),
+            func.count(AspectSentiment.id),
+            func.count(AspectSentiment.score),
+            func.sum(AspectSentiment.score),
+            func.sum(effective_score_expression())
+        )
+        .select_from(AspectSentiment)
+        .join(RawText, AspectSentiment.raw_text_id == RawText.id)
+        .outerjoin(Aspect, AspectSentiment.aspect_id == Aspect.id)
+        .where(review_filter, RawText.timestamp.isnot(None))
+        .group_by(RawText.user_id, day, aspect_id, category_id)
+    ).all()
+    return [
+        {
+            'user_id': user_id,
+            'day': to_date(row_day),
+            'aspect_id': row_aspect_id,
+            'category_id': row_category_id,
+            'positive_count': int(positive or 0),
+            'negative_count': int(negative or 0),
+            'neutral_count': int(neutral or 0),
+            'total_count': int(total or 0),
+            'scored_count': int(scored or 0),
+            'score_sum': float(score_sum or 0.0),
+            'effective_score_sum': float(effective_sum or 0.0)
+        }
+        for (user_id, row_day, row_aspect_id, row_category_id,
+             positive, negative, neutral, total, scored, score_sum, effective_sum) in rows
+    ]
+
+
+def _apply_deltas(deltas):
+    """Adds the deltas to the rollup rows with the same key, creating missing rows."""
+    if not deltas:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(AspectDailyRollup)
+        stmt = stmt.on_duplicate_key_update({
+            column: getattr(AspectDailyRollup, column) + stmt.inserted[column] for column in SUM_COLUMNS
+        })
+    elif dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as upsert_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as upsert_insert
+        stmt = upsert_insert(AspectDailyRollup)
+        stmt = stmt.on_conflict_do_update(index_elements=list(KEY_COLUMNS), set_={
+            column: getattr(AspectDailyRollup, column) + stmt.excluded[column] for column in SUM_COLUMNS
+        })
+    else:
+        for delta in deltas:
+            key = [getattr(AspectDailyRollup, column) == delta[column] for column in KEY_COLUMNS]
+            updated = db.session.execute(
+                update(AspectDailyRollup).where(*key).values({
+                    column: getattr(AspectDailyRollup, column) + delta[column] for column in SUM_COLUMNS
+                }).execution_options(synchronize_session=False)
+            ).rowcount
+            if not updated:
+                db.session.add(AspectDailyRollup(**delta))
+        db.session.flush()
+        return
+    db.session.execute(stmt, deltas)
+
+
+def add_reviews(raw_text_ids):
+    """Counts the stored aspects of the given reviews into the rollup (without committing)."""
+    if raw_text_ids:
+        _apply_deltas(_review_deltas(RawText.id.in_(raw_text_ids)))
+
+
+def remove_reviews(raw_text_ids):
+    """Takes the stored aspects of the given reviews out of the rollup (without committing)."""
+    if not raw_text_ids:
+        return
+    deltas = _review_deltas(RawText.id.in_(raw_text_ids))
+    for delta in deltas:
+        for column in SUM_COLUMNS:
+            delta[column] = -delta[column]
+    _apply_deltas(deltas)
+    # Rows left without mentions
+    db.session.execute(
+        delete(AspectDailyRollup)
+        .where(AspectDailyRollup.user_id.in_({delta['user_id'] for delta in deltas}),
+               AspectDailyRollup.total_count <= 0)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def remove_user(user_id):
+    """Drops every rollup row of a user (without committing)."""
+    db.session.execute(
+        delete(AspectDailyRollup).where(AspectDailyRollup.user_id == user_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def rebuild_rollups(batch_size=5000):
+    """
+    Recomputes the rollup from every stored review. Returns the number of reviews
+    counted. Reviews stored while the rebuild runs may be counted twice, so run it
+    while uploads are paused.
+    """
+    db.session.execute(delete(AspectDailyRollup))
+    db.session.commit()
+    last_id = 0
+    counted = 0
+    while True:
+        raw_text_ids = db.session.execute(
+            select(RawText.id).where(RawText.id > last_id).order_by(RawText.id).limit(batch_size)
+        ).scalars().all()
+        if not raw_text_ids:
+            return counted
+        _apply_deltas(_review_deltas(RawText.id.between(raw_text_ids[0], raw_text_ids[-1])))
+        db.session.commit()
+        last_id = raw_text_ids[-1]
+        counted += len(raw_text_ids)
+        logger.info(f"Rollup rebuilt for {counted} reviews.")
@@ -1,13 +1,29 @@
 
 from flask import Blueprint, render_template, session, redirect, url_for, flash, request
-from models import db, User, RawText, Admin, AspectSentiment, Category, Aspect
+from models import db, User, RawText, Admin, AspectSentiment, Category, Aspect, UploadedFile, AnalysisJob, AspectDailyRollup
 from werkzeug.security import check_password_hash
 import functools
+import os
 from nlp_processor import nlp_processor
-from sqlalchemy import func 
+from sqlalchemy import case, func, select
+from analysis_jobs import enqueue_taxonomy_remap
+from taxonomy_remap import taxonomy_patterns, changed_patterns
+from taxonomy import bump_taxonomy_version
+from rollups import remove_user, add_reviews, remove_reviews
+from inference_cache import LRUCache
 
 admin_dashboard_bp = Blueprint('admin_dashboard', __name__)
 
+# Landing page counters are cached per process for this many seconds (0 = no cache)
+ADMIN_STATS_CACHE_SECONDS = float(os.environ.get('ADMIN_STATS_CACHE_SECONDS', 30))
+_dashboard_stats_cache = LRUCache(maxsize=1 if ADMIN_STATS_CACHE_SECONDS > 0 else 0, ttl=ADMIN_STATS_CACHE_SECONDS)
+
+# User management list
+USERS_PER_PAGE = int(os.environ.get('ADMIN_USERS_PER_PAGE', 50))
+MAX_USERS_PER_PAGE = 200
+USER_COLUMN_SORTS = {'id': User.id, 'username': User.username, 'email': User.email}
+USER_SORT_OPTIONS = ('id', 'username', 'email', 'reviews', 'positive', 'negative', 'aspects', 'confidence')
+
 # Admin login required decorator
 def admin_login_required(view):
     @functools.wraps(view)
@@ -18,6 +34,40 @@ def admin_login_required(view):
         return view(**kwargs)
     return wrapped_view
 
+def _delete_taxonomy_entry(entry, aspect_ids):
+    """
+    Deletes an aspect or category (without committing). Its mentions are un-mapped
+    by the ORM, so the reviews mentioning the deleted aspects are taken out of the
+    rollup before the delete and counted back, under the unmapped bucket, after it.
+    """
+    raw_text_ids = db.session.execute(
+        select(AspectSentiment.raw_text_id).where(AspectSentiment.aspect_id.in_(aspect_ids)).distinct()
+    ).scalars().all() if aspect_ids else []
+    remove_reviews(raw_text_ids)
+    db.session.delete(entry)
+    db.session.flush()
+    add_reviews(raw_text_ids)
+
+def _apply_taxonomy_change(patterns_before):
+    """
+    Reloads the taxonomy after a committed edit and queues re-mapping of the stored
+    reviews that contain an added, removed or moved aspect name or keyword. The edit
+    bumped the taxonomy version, so other workers reload on their next check.
+    """
+    if nlp_processor.initialized:
+        nlp_processor._load_aspect_categories()
+    changed = changed_patterns(patterns_before, taxonomy_patterns())
+    if not changed:
+        return
+    try:
+        job = enqueue_taxonomy_remap(changed)
+    except Exception as e:
+        db.session.rollback()
+        flash(f"Taxonomy saved, but re-mapping existing reviews could not be queued: {e}", "warning")
+        return
+    if job is not None:
+        flash(f"Re-mapping {job.total_rows} existing reviews to the updated aspects in the background (job #{job.id}).", "info")
+
 # Route to add a new aspect to a category
 @admin_dashboard_bp.route('/admin/categories/<int:category_id>/add_aspect', methods=['POST'])
 @admin_login_required
@@ -35,6 +85,7 @@ def add_aspect_to_category(category_id):
         return redirect(url_for('admin_dashboard.manage_aspect_categories'))
 
     try:
+        patterns_before = taxonomy_patterns()
         aspect = Aspect(
             name=aspect_name,
             description=aspect_description,
@@ -45,7 +96,9 @@ def add_aspect_to_category(category_id):
         db.session.flush()  # Get aspect.id before adding keywords
         for kw in keywords_list:
             db.session.add(AspectKeyword(keyword=kw, aspect_id=aspect.id))
+        bump_taxonomy_version()
         db.session.commit()
+        _apply_taxonomy_change(patterns_before)
         flash(f"Aspect '{aspect_name}' added to category '{category.name}'.", 'success')
     except Exception as e:
         db.session.rollback()
@@ -74,34 +127,34 @@ def admin_logout():
     flash("You have been logged out as Admin.", "info")
     return redirect(url_for('admin_dashboard.admin_login'))
 
-@admin_dashboard_bp.route('/admin')
-@admin_login_required
-def admin_home():
+def _dashboard_stats():
+    """
+    Global counters of the admin landing page, from SQL aggregates: one GROUP BY over
+    the reviews' overall sentiment and one sum over the daily aspect rollup.
+    """
     # Initialize a dictionary to hold all dashboard statistics
     stats = {}
     chart_data = {'positive': 0, 'negative': 0, 'neutral': 0} # Initialize for safety
 
-    # 1. Total Users and Reviews
-    stats['total_users'] = User.query.count()
-    stats['total_reviews'] = RawText.query.count()
+    # 1. Total Users and Reviews, with the sentiment distribution
+    stats['total_users'] = db.session.query(func.count(User.id)).scalar()
+    sentiment_counts = db.session.query(
+        RawText.sentiment,
+        func.count(RawText.id)
+    ).group_by(RawText.sentiment).all()
+    stats['total_reviews'] = sum(count for sentiment, count in sentiment_counts)
 
     # 2. Sentiment Distribution and Percentages
     if stats['total_reviews'] > 0:
-        sentiment_counts = db.session.query(
-            RawText.sentiment,
-            func.count(RawText.id)
-        ).group_by(RawText.sentiment).all()
-
-        total_analyzed_reviews = sum(count for sentiment, count in sentiment_counts)
-
         # Ensure all sentiment types are covered, even if count is 0
         sentiment_dict = {s.lower(): 0 for s in ['POSITIVE', 'NEGATIVE', 'NEUTRAL']}
         for sentiment, count in sentiment_counts:
-            sentiment_dict[sentiment.lower()] = count
+            if sentiment:
+                sentiment_dict[sentiment.lower()] = sentiment_dict.get(sentiment.lower(), 0) + count
         
         for key, count in sentiment_dict.items():
             chart_data[key] = count
-            stats[f'{key}_percentage'] = round((count / total_analyzed_reviews) * 100, 2)
+            stats[f'{key}_percentage'] = round((count / stats['total_reviews']) * 100, 2)
     else:
         # If no reviews, all percentages are 0
         stats['positive_percentage'] = 0
@@ -110,120 +163,166 @@ def admin_home():
         # chart_data already initialized to 0s
 
     # 3. Recent Reviews (e.g., last 5, ordered by timestamp)
-    # Use 'options(db.joinedload(RawText.user))' if you need User details in recent_reviews_for_template
     recent_reviews = RawText.query.order_by(RawText.timestamp.desc()).limit(5).all()
     
     recent_reviews_for_template = []
     for review in recent_reviews:
-        sentiment_label = review.sentiment if hasattr(review, 'sentiment') else 'UNKNOWN'
-        
         recent_reviews_for_template.append({
             'user_id': review.user_id,
             'content': review.content,
-            'sentiment_label': sentiment_label,
+            'sentiment_label': review.sentiment,
             'timestamp': review.timestamp.strftime('%Y-%m-%d %H:%M') if review.timestamp else 'N/A' # Format timestamp
         })
 
-    # 4. Calculate aspect-based summary statistics (same as user dashboard)
-    all_reviews_with_aspects = RawText.query.options(db.joinedload(RawText.aspect_sentiments)).all()
-    
-    total_aspects = 0
-    positive_count = 0
-    negative_count = 0
-    neutral_count = 0
-    total_confidence = 0
-    confidence_count = 0
-    
-    for text in all_reviews_with_aspects:
-        total_aspects += len(text.aspect_sentiments)
-        for aspect in text.aspect_sentiments:
-            if aspect.sentiment:
-                sentiment_upper = aspect.sentiment.upper()
-                if sentiment_upper == 'POSITIVE':
-                    positive_count += 1
-                elif sentiment_upper == 'NEGATIVE':
-                    negative_count += 1
-                else:
-                    neutral_count += 1
-                
-                if aspect.score is not None:
-                    total_confidence += aspect.score
-                    confidence_count += 1
-    
-    avg_confidence = round((total_confidence / confidence_count * 100)) if confidence_count > 0 else 0
+    # 4. Aspect-based summary statistics (same as user dashboard); labels other than
+    # positive and negative count as neutral, and the confidence averages scored mentions only
+    total_aspects, positive_count, negative_count, scored_count, total_confidence = db.session.query(
+        func.coalesce(func.sum(AspectDailyRollup.total_count), 0),
+        func.coalesce(func.sum(AspectDailyRollup.positive_count), 0),
+        func.coalesce(func.sum(AspectDailyRollup.negative_count), 0),
+        func.coalesce(func.sum(AspectDailyRollup.scored_count), 0),
+        func.coalesce(func.sum(AspectDailyRollup.score_sum), 0.0)
+    ).one()
+    total_aspects, positive_count, negative_count = int(total_aspects), int(positive_count), int(negative_count)
+    scored_count = int(scored_count)
+
+    return {
+        'stats': stats,
+        'recent_reviews': recent_reviews_for_template,
+        'chart_data': chart_data,
+        'total_aspects': total_aspects,
+        'positive_count': positive_count,
+        'negative_count': negative_count,
+        'neutral_count': total_aspects - positive_count - negative_count,
+        'avg_confidence': round(float(total_confidence) / scored_count * 100) if scored_count > 0 else 0
+    }
+
+
+@admin_dashboard_bp.route('/admin')
+@admin_login_required
+def admin_home():
+    # Shared by all admins; recomputed at most every ADMIN_STATS_CACHE_SECONDS
+    dashboard = _dashboard_stats_cache.get('dashboard')
+    if dashboard is None:
+        dashboard = _dashboard_stats()
+        _dashboard_stats_cache.set('dashboard', dashboard)
 
     # Render the template, passing all required data
-    return render_template(
-        'admin_home.html',
-        stats=stats,
-        recent_reviews=recent_reviews_for_template,
-        chart_data=chart_data,
-        total_aspects=total_aspects,
-        positive_count=positive_count,
-        negative_count=negative_count,
-        neutral_count=neutral_count,
-        avg_confidence=avg_confidence
-    )
+    return render_template('admin_home.html', **dashboard)
+
+def _user_stats_subqueries(user_ids=None):
+    """
+    Per-user review statistics (grouped over RawText) and aspect statistics (grouped
+    over the daily rollup), optionally limited to some users.
+    """
+    review_sentiment = func.lower(RawText.sentiment)
+    review_stats = db.session.query(
+        RawText.user_id.label('user_id'),
+        func.count(RawText.id).label('review_count'),
+        func.sum(case((review_sentiment == 'positive', 1), else_=0)).label('positive_count'),
+        func.sum(case((review_sentiment == 'negative', 1), else_=0)).label('negative_count'),
+        func.sum(case((review_sentiment == 'neutral', 1), else_=0)).label('neutral_count')
+    ).group_by(RawText.user_id)
+    aspect_stats = db.session.query(
+        AspectDailyRollup.user_id.label('user_id'),
+        func.sum(AspectDailyRollup.total_count).label('total_aspects'),
+        func.sum(AspectDailyRollup.positive_count).label('positive_aspects'),
+        func.sum(AspectDailyRollup.negative_count).label('negative_aspects'),
+        func.sum(AspectDailyRollup.scored_count).label('scored_aspects'),
+        func.sum(AspectDailyRollup.score_sum).label('score_sum')
+    ).group_by(AspectDailyRollup.user_id)
+    if user_ids is not None:
+        review_stats = review_stats.filter(RawText.user_id.in_(user_ids))
+        aspect_stats = aspect_stats.filter(AspectDailyRollup.user_id.in_(user_ids))
+    return review_stats.subquery(), aspect_stats.subquery()
+
+
+def _user_sort_expression(sort, review_stats, aspect_stats):
+    total_aspects = func.coalesce(aspect_stats.c.total_aspects, 0)
+    scored_aspects = func.coalesce(aspect_stats.c.scored_aspects, 0)
+    return {
+        'reviews': func.coalesce(review_stats.c.review_count, 0),
+        'positive': func.coalesce(review_stats.c.positive_count, 0),
+        'negative': func.coalesce(review_stats.c.negative_count, 0),
+        'aspects': total_aspects,
+        'confidence': case((scored_aspects > 0, aspect_stats.c.score_sum / scored_aspects), else_=0)
+    }[sort]
+
 
 @admin_dashboard_bp.route('/admin/users')
 @admin_login_required
 def user_management():
-    # Get all users with their review statistics
-    users = User.query.all()
-    
-    # Calculate statistics for each user
+    # Sorting and pagination happen in the database; statistics are grouped per user in one query
+    sort = request.args.get('sort', 'id')
+    if sort not in USER_SORT_OPTIONS:
+        sort = 'id'
+    order = 'desc' if request.args.get('order') == 'desc' else 'asc'
+    per_page = min(max(request.args.get('per_page', USERS_PER_PAGE, type=int), 1), MAX_USERS_PER_PAGE)
+    total_users = db.session.query(func.count(User.id)).scalar()
+    pages = max((total_users + per_page - 1) // per_page, 1)
+    page = min(max(request.args.get('page', 1, type=int), 1), pages)
+
+    def ordered(query, expression):
+        expression = expression.desc() if order == 'desc' else expression.asc()
+        return query.order_by(expression, User.id.asc())
+
+    if sort in USER_COLUMN_SORTS:
+        # Page through the users table first and aggregate only the users shown
+        user_column = USER_COLUMN_SORTS[sort]
+        page_ids = [user_id for user_id, in ordered(db.session.query(User.id), user_column)
+                    .limit(per_page).offset((page - 1) * per_page)]
+        review_stats, aspect_stats = _user_stats_subqueries(page_ids)
+        sort_expression = user_column
+    else:
+        page_ids = None
+        review_stats, aspect_stats = _user_stats_subqueries()
+        sort_expression = _user_sort_expression(sort, review_stats, aspect_stats)
+
+    query = db.session.query(
+        User.id, User.username, User.email,
+        review_stats.c.review_count, review_stats.c.positive_count,
+        review_stats.c.negative_count, review_stats.c.neutral_count,
+        aspect_stats.c.total_aspects, aspect_stats.c.positive_aspects,
+        aspect_stats.c.negative_aspects, aspect_stats.c.scored_aspects, aspect_stats.c.score_sum
+    ).outerjoin(review_stats, review_stats.c.user_id == User.id)\
+     .outerjoin(aspect_stats, aspect_stats.c.user_id == User.id)
+    query = ordered(query, sort_expression)
+    if page_ids is not None:
+        query = query.filter(User.id.in_(page_ids))
+    else:
+        query = query.limit(per_page).offset((page - 1) * per_page)
+
     users_with_stats = []
-    for user in users:
-        # Get all reviews for this user
-        user_reviews = RawText.query.filter_by(user_id=user.id).all()
-        
-        # Calculate sentiment counts
-        positive_count = sum(1 for r in user_reviews if r.sentiment and r.sentiment.lower() == 'positive')
-        negative_count = sum(1 for r in user_reviews if r.sentiment and r.sentiment.lower() == 'negative')
-        neutral_count = sum(1 for r in user_reviews if r.sentiment and r.sentiment.lower() == 'neutral')
-        
-        # Calculate average confidence and aspect statistics
-        total_confidence = 0
-        confidence_count = 0
-        total_aspects = 0
-        positive_aspects = 0
-        negative_aspects = 0
-        
-        for review in user_reviews:
-            total_aspects += len(review.aspect_sentiments)
-            for aspect in review.aspect_sentiments:
-                if aspect.score is not None:
-                    total_confidence += aspect.score
-                    confidence_count += 1
-                
-                # Count aspect sentiments
-                if aspect.sentiment:
-                    sentiment_upper = aspect.sentiment.upper()
-                    if sentiment_upper == 'POSITIVE':
-                        positive_aspects += 1
-                    elif sentiment_upper == 'NEGATIVE':
-                        negative_aspects += 1
-        
-        avg_confidence = round((total_confidence / confidence_count * 100)) if confidence_count > 0 else 0
-        aspect_confidence = avg_confidence  # Same as overall confidence for aspects
-        
+    for row in query.all():
+        total_aspects = int(row.total_aspects or 0)
+        scored_aspects = int(row.scored_aspects or 0)
+        avg_confidence = round(float(row.score_sum or 0.0) / scored_aspects * 100) if scored_aspects > 0 else 0
         users_with_stats.append({
-            'id': user.id,
-            'username': user.username,
-            'email': user.email,
+            'id': row.id,
+            'username': row.username,
+            'email': row.email,
             'created_at': None,  # User model doesn't have created_at field
-            'review_count': len(user_reviews),
-            'positive_count': positive_count,
-            'negative_count': negative_count,
-            'neutral_count': neutral_count,
+            'review_count': int(row.review_count or 0),
+            'positive_count': int(row.positive_count or 0),
+            'negative_count': int(row.negative_count or 0),
+            'neutral_count': int(row.neutral_count or 0),
             'avg_confidence': avg_confidence,
             'total_aspects': total_aspects,
-            'positive_aspects': positive_aspects,
-            'negative_aspects': negative_aspects,
-            'aspect_confidence': aspect_confidence
+            'positive_aspects': int(row.positive_aspects or 0),
+            'negative_aspects': int(row.negative_aspects or 0),
+            'aspect_confidence': avg_confidence  # Same as overall confidence for aspects
         })
     
-    return render_template('admin_user_management.html', users=users_with_stats)
+    return render_template(
+        'admin_user_management.html',
+        users=users_with_stats,
+        total_users=total_users,
+        page=page,
+        pages=pages,
+        per_page=per_page,
+        sort=sort,
+        order=order
+    )
 
 @admin_dashboard_bp.route('/admin/users/delete/<int:user_id>', methods=['POST'])
 @admin_login_required
@@ -236,7 +335,10 @@ def delete_user(user_id):
     try:
         # Delete all reviews and associated data for this user
         # The cascade delete should handle aspect_sentiments automatically
+        remove_user(user_id)
         RawText.query.filter_by(user_id=user_id).delete()
+        AnalysisJob.query.filter_by(user_id=user_id).delete()
+        UploadedFile.query.filter_by(user_id=user_id).delete()
         
         # Delete the user
         db.session.delete(user)
@@ -375,6 +477,7 @@ def manage_aspect_categories():
         new_category = Category(name=category_name, description=category_description)
         
         try:
+            patterns_before = taxonomy_patterns()
             db.session.add(new_category)
             db.session.flush()  # Get new_category.id before adding aspects
             
@@ -419,11 +522,11 @@ def manage_aspect_categories():
                 
                 aspect_index += 1
             
+            bump_taxonomy_version()
             db.session.commit()
             
-            # Reload NLP processor categories
-            if nlp_processor.initialized:
-                nlp_processor._load_aspect_categories()
+            # Reload NLP processor categories and re-map affected reviews
+            _apply_taxonomy_change(patterns_before)
             
             if aspects_count > 0:
                 flash(f"Category '{category_name}' created with {aspects_count} aspect(s)!", "success")
@@ -471,6 +574,7 @@ def edit_aspect_category(category_id):
             category.description = new_description
             # Update keywords: remove old, add new
             # Aspects and keywords will be updated in a separate step/UI
+            bump_taxonomy_version()
             db.session.commit()
             # After adding/modifying categories, force a re-load in the nlp_processor
             if nlp_processor.initialized:
@@ -491,12 +595,13 @@ def delete_aspect_category(category_id):
     category_name = category.name # Store name before deletion
 
     try:
+        patterns_before = taxonomy_patterns()
         # When a Category is deleted, its aspects and related data will be handled by cascade rules.
-        db.session.delete(category)
+        _delete_taxonomy_entry(category, [aspect.id for aspect in category.aspects])
+        bump_taxonomy_version()
         db.session.commit()
-        # After adding/modifying categories, force a re-load in the nlp_processor
-        if nlp_processor.initialized:
-            nlp_processor._load_aspect_categories()
+        # After adding/modifying categories, force a re-load in the nlp_processor and re-map affected reviews
+        _apply_taxonomy_change(patterns_before)
         flash(f"Category '{category_name}' deleted successfully!", "success")
     except Exception as e:
         db.session.rollback()
@@ -525,6 +630,7 @@ def edit_aspect(aspect_id):
         weightage_float = 3.0
     
     try:
+        patterns_before = taxonomy_patterns()
         aspect.name = aspect_name
         aspect.description = aspect_description
         aspect.weightage = weightage_float
@@ -541,11 +647,11 @@ def edit_aspect(aspect_id):
                 new_keyword = AspectKeyword(aspect_id=aspect.id, keyword=keyword)
                 db.session.add(new_keyword)
         
+        bump_taxonomy_version()
         db.session.commit()
         
-        # Reload NLP processor
-        if nlp_processor.initialized:
-            nlp_processor._load_aspect_categories()
+        # Reload NLP processor and re-map affected reviews
+        _apply_taxonomy_change(patterns_before)
         
         flash(f"Aspect '{aspect.name}' updated successfully!", "success")
     except Exception as e:
@@ -562,12 +668,13 @@ def delete_aspect(aspect_id):
     aspect_name = aspect.name
     
     try:
-        db.session.delete(aspect)
+        patterns_before = taxonomy_patterns()
+        _delete_taxonomy_entry(aspect, [aspect.id])
+        bump_taxonomy_version()
         db.session.commit()
         
-        # Reload NLP processor
-        if nlp_processor.initialized:
-            nlp_processor._load_aspect_categories()
+        # Reload NLP processor and re-map affected reviews
+        _apply_taxonomy_change(patterns_before)
         
         flash(f"Aspect '{aspect_name}' deleted successfully!", "success")
     except Exception as e:
@@ -603,6 +710,7 @@ def edit_category_ajax(category_id):
     try:
         category.name = new_name
         category.description = new_description
+        bump_taxonomy_version()
         db.session.commit()
         
         # Reload NLP processor
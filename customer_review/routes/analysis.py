@@ -1,47 +1,89 @@
 from flask import Blueprint, render_template, session, redirect, url_for, flash, current_app, request, jsonify, send_file, make_response
 from nlp_processor import nlp_processor
-import pandas as pd
-from models import db, User, RawText, AspectSentiment, Category, Aspect
+from models import db, User, RawText, AspectSentiment, Category, Aspect, AspectDailyRollup
+from rollups import effective_score_expression, bucket_start_expression, to_date, GRANULARITIES
 from sqlalchemy.orm import joinedload # To efficiently load related category data
+from sqlalchemy import case, func
 from datetime import datetime, timedelta
 import io
 import csv
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image
-from reportlab.lib.units import inch
-from reportlab.graphics.shapes import Drawing
-from reportlab.graphics.charts.linecharts import HorizontalLineChart
-from reportlab.graphics.charts.legends import Legend
+import os
+import importlib.util
+
+# pandas, reportlab and matplotlib are imported inside the views that use them,
+# so importing the app (CLI commands, migrations, worker start) stays fast.
 
 # Optional: matplotlib for sentiment trends graph in PDF
-try:
-    import matplotlib
-    matplotlib.use('Agg')  # Use non-GUI backend
-    import matplotlib.pyplot as plt
-    import matplotlib.dates as mdates
-    MATPLOTLIB_AVAILABLE = True
-except ImportError:
-    MATPLOTLIB_AVAILABLE = False
+MATPLOTLIB_AVAILABLE = importlib.util.find_spec('matplotlib') is not None
+if not MATPLOTLIB_AVAILABLE:
     print("Warning: matplotlib not installed. PDF will not include sentiment trends graph.")
 
 analysis_bp = Blueprint('analysis', __name__)
 
 
+SUMMARY_SENTIMENTS = ['positive', 'negative', 'neutral']
+
+# Trend charts: bucket sizes offered, and the most points 'auto' lets a chart have
+TREND_GRANULARITIES = ('auto',) + GRANULARITIES
+TREND_MAX_POINTS = int(os.environ.get('TREND_MAX_POINTS', 120))
+
+
+def _round2(value):
+    """Rounds like pandas' round(2) (half to even on the scaled float)."""
+    return round(value * 100) / 100
+
+
+def _summarize_aspect_group(group_name, counts, total_rows, score_sum, effective_sum):
+    """One summary row, with the keys and rounding of the former pandas implementation."""
+    total_mentions = sum(counts[s] for s in SUMMARY_SENTIMENTS)
+    summary = {'aspect': group_name}
+    summary.update(counts)
+    summary['average_sentiment_strength'] = _round2(effective_sum / total_rows)
+    summary['average_original_confidence_score'] = _round2(score_sum / total_rows)
+    summary['total_mentions'] = total_mentions
+    for sentiment_type in SUMMARY_SENTIMENTS:
+        summary[f'{sentiment_type}_percentage'] = (
+            _round2(counts[sentiment_type] / total_mentions * 100) if total_mentions else 0.0
+        )
+
+    if total_mentions == 0:
+        summary['dominant_sentiment'] = 'N/A'
+    else:
+        # Ties go to positive, then negative, then neutral
+        max_sentiment_count = max(counts.values())
+        summary['dominant_sentiment'] = next(
+            s.capitalize() for s in SUMMARY_SENTIMENTS if counts[s] == max_sentiment_count
+        )
+    return summary
+
+
 def get_aspect_sentiment_summary(user_id, start_date=None, end_date=None):
     """
     Retrieves and aggregates aspect sentiment data for a given user.
     Separates aggregated predefined categories from aggregated individual uncategorized aspects.
     Returns two lists of dictionaries: categorized_summary and uncategorized_summary.
+
+    Counts and sums are computed with one GROUP BY in the database; mapped mentions
+    are grouped by aspect name, unmapped ones by their raw extracted aspect.
     """
+    sentiment = func.lower(AspectSentiment.sentiment)
+    is_categorized = Aspect.id.isnot(None)
+    group_name = case(
+        (is_categorized, Aspect.name),
+        else_=func.coalesce(func.nullif(AspectSentiment.raw_extracted_aspect, ''), 'Unknown Aspect')
+    )
+    effective_score = effective_score_expression()
+    categorized_flag = case((is_categorized, 1), else_=0).label('categorized')
+    group_label = group_name.label('aspect_group_name')
+
     query = db.session.query(
-        AspectSentiment.raw_extracted_aspect,
-        AspectSentiment.sentiment,
-        AspectSentiment.score,
-        Aspect.name.label('aspect_name'),
-        Aspect.id.label('aspect_id')
-    ).join(RawText).outerjoin(Aspect, AspectSentiment.aspect_id == Aspect.id)\
+        categorized_flag,
+        group_label,
+        *[func.sum(case((sentiment == s, 1), else_=0)).label(s) for s in SUMMARY_SENTIMENTS],
+        func.count().label('total_rows'),
+        func.sum(AspectSentiment.score).label('score_sum'),
+        func.sum(effective_score).label('effective_sum')
+    ).select_from(AspectSentiment).join(RawText).outerjoin(Aspect, AspectSentiment.aspect_id == Aspect.id)\
     .filter(RawText.user_id == user_id)
     
     # Apply date filters if provided
@@ -58,174 +100,115 @@ def get_aspect_sentiment_summary(user_id, start_date=None, end_date=None):
             query = query.filter(RawText.timestamp < end_dt)
         except ValueError:
             pass
-    
-    aspect_data_raw_query = query.all()
-
-    print(f"DEBUG: aspect_data_raw_query for user {user_id}: {aspect_data_raw_query}") # Keep debug print for now
-
-    if not aspect_data_raw_query:
-        print(f"DEBUG: No raw aspect data found for user {user_id}.") # Keep debug print for now
-        return [], []
-
-    categorized_items = []
-    uncategorized_items = []
-
-    for aspect_item in aspect_data_raw_query:
-        effective_score = 0.0
-        if aspect_item.sentiment.lower() == 'positive':
-            effective_score = 0.5 + (aspect_item.score * 0.5)
-        elif aspect_item.sentiment.lower() == 'negative':
-            effective_score = -0.5 - (aspect_item.score * 0.5)
-
-        # Ensure raw_extracted_aspect is a string, even if None from DB
-        current_raw_aspect = aspect_item.raw_extracted_aspect if aspect_item.raw_extracted_aspect else "Unknown Aspect"
-
-        processed_item = {
-            'raw_extracted_aspect': current_raw_aspect, # Use the cleaned raw aspect name
-            'sentiment': aspect_item.sentiment.lower(),
-            'score': aspect_item.score,
-            'effective_sentiment_score': effective_score
-        }
-
-        if aspect_item.aspect_id:
-            processed_item['aspect_group_name'] = aspect_item.aspect_name
-            categorized_items.append(processed_item)
-        else:
-            processed_item['aspect_group_name'] = current_raw_aspect # Group by its raw name (now guaranteed non-None)
-            uncategorized_items.append(processed_item)
-
-    # Helper function to process a list of items (no change here)
-    def _process_sentiment_data(items, is_categorized=False):
-        # ... (rest of _process_sentiment_data function remains the same as before) ...
-        if not items:
-            return []
-
-        df = pd.DataFrame(items)
-        
-        if df.empty:
-            return []
-
-        all_sentiments = ['positive', 'negative', 'neutral'] # Ensure all possible sentiments are considered
-
-        # Group by the 'aspect_group_name'
-        sentiment_counts = df.groupby(['aspect_group_name', 'sentiment']).size().unstack(fill_value=0)
-        sentiment_counts = sentiment_counts.reindex(columns=all_sentiments, fill_value=0)
-
-        avg_effective_scores = df.groupby('aspect_group_name')['effective_sentiment_score'].mean().round(2)
-        avg_original_scores = df.groupby('aspect_group_name')['score'].mean().round(2)
-
-        summary_df = sentiment_counts.join(avg_effective_scores)
-        summary_df.rename(columns={'effective_sentiment_score': 'average_sentiment_strength'}, inplace=True)
-
-        summary_df = summary_df.join(avg_original_scores)
-        summary_df.rename(columns={'score': 'average_original_confidence_score'}, inplace=True)
-
-        summary_df['total_mentions'] = summary_df[all_sentiments].sum(axis=1)
-
-        for sentiment_type in all_sentiments:
-            summary_df[f'{sentiment_type}_percentage'] = (
-                (summary_df[sentiment_type] / summary_df['total_mentions']) * 100
-            ).fillna(0).round(2)
-
-        def get_dominant_sentiment(row):
-            sentiments = {s: row.get(s, 0) for s in all_sentiments}
-            total = row['total_mentions']
-            if total == 0:
-                return 'N/A'
-
-            max_sentiment_count = max(sentiments.values())
-            dominant_list = [s for s, count in sentiments.items() if count == max_sentiment_count]
-
-            if 'positive' in dominant_list: return 'Positive'
-            if 'negative' in dominant_list: return 'Negative'
-            if 'neutral' in dominant_list: return 'Neutral'
-            return 'N/A'
-
-        summary_df['dominant_sentiment'] = summary_df.apply(get_dominant_sentiment, axis=1)
-
-        summary_df = summary_df.rename_axis('aspect').reset_index()
-
-        summary_list = summary_df.to_dict(orient='records')
-        return summary_list
-
-    categorized_summary = _process_sentiment_data(categorized_items, is_categorized=True)
-    uncategorized_summary = _process_sentiment_data(uncategorized_items, is_categorized=False)
-    print(f"DEBUG: Final Categorized Summary for user {user_id}: {categorized_summary}")
-    print(f"DEBUG: Final Uncategorized Summary for user {user_id}: {uncategorized_summary}")
-
 
+    grouped_rows = query.group_by(categorized_flag, group_label).all()
+
+    categorized_summary = []
+    uncategorized_summary = []
+    for row in grouped_rows:
+        summary = _summarize_aspect_group(
+            row.aspect_group_name,
+            {s: int(getattr(row, s) or 0) for s in SUMMARY_SENTIMENTS},
+            row.total_rows,
+            float(row.score_sum or 0.0),
+            float(row.effective_sum or 0.0)
+        )
+        (categorized_summary if row.categorized else uncategorized_summary).append(summary)
+
+    # Same order as before (pandas groupby sorts by group name)
+    categorized_summary.sort(key=lambda summary: summary['aspect'])
+    uncategorized_summary.sort(key=lambda summary: summary['aspect'])
     return categorized_summary, uncategorized_summary
 
 
-def get_category_summary(user_id, start_date=None, end_date=None):
-    """
-    Get aggregated sentiment data grouped by category.
-    Returns list of dictionaries with category-wise statistics.
-    """
-    # Query to get all aspects with their categories and sentiments
-    query = db.session.query(
-        Category.id.label('category_id'),
-        Category.name.label('category_name'),
-        AspectSentiment.sentiment,
-        AspectSentiment.score
-    ).join(Aspect, Category.id == Aspect.category_id)\
-     .join(AspectSentiment, Aspect.id == AspectSentiment.aspect_id)\
-     .join(RawText, AspectSentiment.raw_text_id == RawText.id)\
-     .filter(RawText.user_id == user_id)
-    
-    # Apply date filters
+def _filter_rollup_days(query, start_date=None, end_date=None):
+    """Applies the optional 'YYYY-MM-DD' date range (both ends inclusive) to a rollup query."""
     if start_date:
         try:
             start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-            query = query.filter(RawText.timestamp >= start_dt)
+            query = query.filter(AspectDailyRollup.day >= start_dt.date())
         except ValueError:
             pass
     
     if end_date:
         try:
             end_dt = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
-            query = query.filter(RawText.timestamp < end_dt)
+            query = query.filter(AspectDailyRollup.day < end_dt.date())
         except ValueError:
             pass
-    
-    results = query.all()
-    
-    # Aggregate by category
-    category_data = {}
-    for row in results:
-        cat_id = row.category_id
-        if cat_id not in category_data:
-            category_data[cat_id] = {
-                'category_id': cat_id,
-                'category_name': row.category_name,
-                'total_mentions': 0,
-                'positive': 0,
-                'negative': 0,
-                'neutral': 0,
-                'avg_score': 0,
-                'scores': []
-            }
-        
-        category_data[cat_id]['total_mentions'] += 1
-        category_data[cat_id]['scores'].append(row.score)
-        
-        sentiment = row.sentiment.upper()
-        if sentiment == 'POSITIVE':
-            category_data[cat_id]['positive'] += 1
-        elif sentiment == 'NEGATIVE':
-            category_data[cat_id]['negative'] += 1
-        elif sentiment == 'NEUTRAL':
-            category_data[cat_id]['neutral'] += 1
+    return query
+
+
+def resolve_trend_granularity(user_id, granularity=None, start_date=None, end_date=None):
+    """
+    Bucket size of the trend charts: granularity itself when it is one of GRANULARITIES;
+    otherwise (auto, missing or unknown) the finest one that keeps the user's data in
+    the date range within TREND_MAX_POINTS points. Spans longer than TREND_MAX_POINTS
+    years (unlikely) still get yearly buckets.
+    """
+    if granularity in GRANULARITIES:
+        return granularity
+    query = db.session.query(func.min(AspectDailyRollup.day), func.max(AspectDailyRollup.day))\
+        .filter(AspectDailyRollup.user_id == user_id)
+    first_day, last_day = _filter_rollup_days(query, start_date, end_date).one()
+    if first_day is None:
+        return 'day'
+    span_days = (to_date(last_day) - to_date(first_day)).days + 1
+    if span_days <= TREND_MAX_POINTS:
+        return 'day'
+    # A span can touch one more week than it covers
+    if span_days // 7 + 2 <= TREND_MAX_POINTS:
+        return 'week'
+    first_day, last_day = to_date(first_day), to_date(last_day)
+    span_months = (last_day.year - first_day.year) * 12 + last_day.month - first_day.month + 1
+    if span_months <= TREND_MAX_POINTS:
+        return 'month'
+    span_quarters = (last_day.year - first_day.year) * 4 + (last_day.month - 1) // 3 - (first_day.month - 1) // 3 + 1
+    if span_quarters <= TREND_MAX_POINTS:
+        return 'quarter'
+    return 'year'
+
+
+def get_category_summary(user_id, start_date=None, end_date=None):
+    """
+    Get aggregated sentiment data grouped by category.
+    Returns list of dictionaries with category-wise statistics.
+    Reads the daily rollup, so the cost depends on days x aspects, not on review count.
+    """
+    query = db.session.query(
+        Category.id.label('category_id'),
+        Category.name.label('category_name'),
+        func.sum(AspectDailyRollup.total_count).label('total_mentions'),
+        func.sum(AspectDailyRollup.positive_count).label('positive'),
+        func.sum(AspectDailyRollup.negative_count).label('negative'),
+        func.sum(AspectDailyRollup.neutral_count).label('neutral'),
+        func.sum(AspectDailyRollup.score_sum).label('score_sum')
+    ).select_from(AspectDailyRollup)\
+     .join(Aspect, Aspect.id == AspectDailyRollup.aspect_id)\
+     .join(Category, Category.id == AspectDailyRollup.category_id)\
+     .filter(AspectDailyRollup.user_id == user_id)
+    query = _filter_rollup_days(query, start_date, end_date)
+    
+    results = query.group_by(Category.id, Category.name).all()
     
     # Calculate percentages and averages
     category_summary = []
-    for cat_id, data in category_data.items():
+    for row in results:
+        data = {
+            'category_id': row.category_id,
+            'category_name': row.category_name,
+            'total_mentions': int(row.total_mentions or 0),
+            'positive': int(row.positive or 0),
+            'negative': int(row.negative or 0),
+            'neutral': int(row.neutral or 0),
+            'avg_score': 0
+        }
         total = data['total_mentions']
         if total > 0:
             data['positive_percentage'] = round((data['positive'] / total) * 100, 1)
             data['negative_percentage'] = round((data['negative'] / total) * 100, 1)
             data['neutral_percentage'] = round((data['neutral'] / total) * 100, 1)
-            data['avg_score'] = round(sum(data['scores']) / len(data['scores']), 2)
+            data['avg_score'] = round(float(row.score_sum or 0.0) / total, 2)
             
             # Determine dominant sentiment
             if data['positive'] > data['negative'] and data['positive'] > data['neutral']:
@@ -235,7 +218,6 @@ def get_category_summary(user_id, start_date=None, end_date=None):
             else:
                 data['dominant_sentiment'] = 'Neutral'
         
-        del data['scores']  # Remove raw scores list
         category_summary.append(data)
     
     # Sort by total mentions descending
@@ -244,77 +226,44 @@ def get_category_summary(user_id, start_date=None, end_date=None):
     return category_summary
 
 
-def get_category_trends(user_id, start_date=None, end_date=None):
+def get_category_trends(user_id, start_date=None, end_date=None, granularity='day'):
     """
     Get sentiment trends over time grouped by category.
-    Returns time-series data for category-wise sentiment analysis.
+    Returns time-series data for category-wise sentiment analysis, keyed by the first
+    day of each bucket (day, week, month, quarter or year).
     """
-    # Query to get category sentiments over time
+    bucket = bucket_start_expression(granularity).label('bucket')
     query = db.session.query(
-        RawText.timestamp,
-        Category.id.label('category_id'),
+        bucket,
         Category.name.label('category_name'),
-        AspectSentiment.sentiment,
-        AspectSentiment.score
-    ).join(AspectSentiment, RawText.id == AspectSentiment.raw_text_id)\
-     .join(Aspect, AspectSentiment.aspect_id == Aspect.id)\
-     .join(Category, Aspect.category_id == Category.id)\
-     .filter(RawText.user_id == user_id)
-    
-    # Apply date filters
-    if start_date:
-        try:
-            start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-            query = query.filter(RawText.timestamp >= start_dt)
-        except ValueError:
-            pass
-    
-    if end_date:
-        try:
-            end_dt = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
-            query = query.filter(RawText.timestamp < end_dt)
-        except ValueError:
-            pass
-    
-    query = query.order_by(RawText.timestamp.asc())
-    results = query.all()
+        func.sum(AspectDailyRollup.positive_count).label('positive'),
+        func.sum(AspectDailyRollup.negative_count).label('negative'),
+        func.sum(AspectDailyRollup.neutral_count).label('neutral'),
+        func.sum(AspectDailyRollup.total_count).label('total')
+    ).select_from(AspectDailyRollup)\
+     .join(Aspect, Aspect.id == AspectDailyRollup.aspect_id)\
+     .join(Category, Category.id == AspectDailyRollup.category_id)\
+     .filter(AspectDailyRollup.user_id == user_id)
+    query = _filter_rollup_days(query, start_date, end_date)
+    
+    results = query.group_by(bucket, Category.name).order_by(bucket.asc(), Category.name.asc()).all()
     
     # Group by date and category
     trends_data = {}
     for row in results:
-        date_key = row.timestamp.strftime('%Y-%m-%d')
-        cat_name = row.category_name
-        
-        if date_key not in trends_data:
-            trends_data[date_key] = {}
-        
-        if cat_name not in trends_data[date_key]:
-            trends_data[date_key][cat_name] = {
-                'positive': 0,
-                'negative': 0,
-                'neutral': 0,
-                'total': 0,
-                'avg_sentiment': 0
-            }
-        
-        trends_data[date_key][cat_name]['total'] += 1
-        sentiment = row.sentiment.upper()
-        if sentiment == 'POSITIVE':
-            trends_data[date_key][cat_name]['positive'] += 1
-        elif sentiment == 'NEGATIVE':
-            trends_data[date_key][cat_name]['negative'] += 1
-        elif sentiment == 'NEUTRAL':
-            trends_data[date_key][cat_name]['neutral'] += 1
-    
-    # Calculate average sentiment score for each date/category
-    for date_key in trends_data:
-        for cat_name in trends_data[date_key]:
-            data = trends_data[date_key][cat_name]
-            total = data['total']
-            if total > 0:
-                # Calculate sentiment score: positive=1, neutral=0, negative=-1
-                score = (data['positive'] - data['negative']) / total
-                data['avg_sentiment'] = round(score, 2)
+        date_key = to_date(row.bucket).strftime('%Y-%m-%d')
+        data = {
+            'positive': int(row.positive or 0),
+            'negative': int(row.negative or 0),
+            'neutral': int(row.neutral or 0),
+            'total': int(row.total or 0),
+            'avg_sentiment': 0
+        }
+        if data['total'] > 0:
+            # Calculate sentiment score: positive=1, neutral=0, negative=-1
+            score = (data['positive'] - data['negative']) / data['total']
+            data['avg_sentiment'] = round(score, 2)
+        trends_data.setdefault(date_key, {})[row.category_name] = data
     
     return trends_data
 
@@ -361,11 +310,13 @@ def aspect_analysis_page():
     # Get date range from query parameters
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
+    granularity = request.args.get('granularity', 'auto')
     
     with current_app.app_context():
         categorized_aspect_summary, uncategorized_aspect_summary = get_aspect_sentiment_summary(user_id, start_date, end_date)
         category_summary = get_category_summary(user_id, start_date, end_date)
-        category_trends = get_category_trends(user_id, start_date, end_date)
+        bucket = resolve_trend_granularity(user_id, granularity, start_date, end_date)
+        category_trends = get_category_trends(user_id, start_date, end_date, bucket)
 
     return render_template(
         'aspect_analysis.html',
@@ -374,78 +325,58 @@ def aspect_analysis_page():
         category_summary=category_summary,
         category_trends=category_trends,
         start_date=start_date,
-        end_date=end_date
+        end_date=end_date,
+        granularity=granularity,
+        bucket=bucket,
+        granularities=TREND_GRANULARITIES
     )
 
 
-def get_sentiment_trends(user_id, start_date=None, end_date=None):
+def get_sentiment_trends(user_id, start_date=None, end_date=None, granularity='day'):
     """
     Get sentiment trends over time for aspects.
-    Returns time-series data grouped by date and aspect.
+    Returns time-series data grouped by date and aspect: the mean effective score
+    per bucket (day, week, month, quarter or year, keyed by its first day) for each aspect
+    (unmapped mentions as 'Uncategorized'), 0 in buckets without mentions.
     """
-    # Base query
+    bucket = bucket_start_expression(granularity).label('bucket')
     query = db.session.query(
-        RawText.timestamp,
-        AspectSentiment.sentiment,
-        AspectSentiment.score,
+        bucket,
         Aspect.name.label('aspect_name'),
-        Aspect.id.label('aspect_id')
-    ).join(AspectSentiment, RawText.id == AspectSentiment.raw_text_id)\
-     .outerjoin(Aspect, AspectSentiment.aspect_id == Aspect.id)\
-     .filter(RawText.user_id == user_id)
+        func.sum(AspectDailyRollup.effective_score_sum).label('effective_score_sum'),
+        func.sum(AspectDailyRollup.total_count).label('total')
+    ).select_from(AspectDailyRollup)\
+     .outerjoin(Aspect, Aspect.id == AspectDailyRollup.aspect_id)\
+     .filter(AspectDailyRollup.user_id == user_id)
+    query = _filter_rollup_days(query, start_date, end_date)
     
-    # Apply date filters if provided
-    if start_date:
-        try:
-            start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-            query = query.filter(RawText.timestamp >= start_dt)
-        except ValueError:
-            pass
-    
-    if end_date:
-        try:
-            end_dt = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
-            query = query.filter(RawText.timestamp < end_dt)
-        except ValueError:
-            pass
-    
-    results = query.all()
+    results = query.group_by(bucket, Aspect.name).all()
     
     if not results:
         return {}
     
-    # Convert to DataFrame for easier processing
-    df = pd.DataFrame([{
-        'date': r.timestamp.date(),
-        'aspect': r.aspect_name if r.aspect_name else 'Uncategorized',
-        'sentiment': r.sentiment.lower(),
-        'score': r.score
-    } for r in results])
-    
-    # Calculate effective sentiment score
-    def calc_effective_score(row):
-        if row['sentiment'] == 'positive':
-            return 0.5 + (row['score'] * 0.5)
-        elif row['sentiment'] == 'negative':
-            return -0.5 - (row['score'] * 0.5)
-        return 0.0
-    
-    df['effective_score'] = df.apply(calc_effective_score, axis=1)
-    
-    # Group by date and aspect, calculate average sentiment
-    trends = df.groupby(['date', 'aspect'])['effective_score'].mean().reset_index()
+    # (date, aspect) -> [effective score sum, mentions]
+    sums = {}
+    for row in results:
+        key = (to_date(row.bucket), row.aspect_name if row.aspect_name else 'Uncategorized')
+        entry = sums.setdefault(key, [0.0, 0])
+        entry[0] += float(row.effective_score_sum or 0.0)
+        entry[1] += int(row.total or 0)
     
-    # Pivot to get aspects as columns
-    trends_pivot = trends.pivot(index='date', columns='aspect', values='effective_score').fillna(0)
+    dates = sorted({day for day, _ in sums})
+    aspects = sorted({aspect for _, aspect in sums})
     
     # Convert to format suitable for Chart.js
     trends_data = {
-        'dates': [d.strftime('%Y-%m-%d') for d in sorted(trends_pivot.index)],
+        'dates': [d.strftime('%Y-%m-%d') for d in dates],
         'aspects': {}
     }
     
-    for aspect in trends_pivot.columns:
-        trends_data['aspects'][aspect] = trends_pivot[aspect].tolist()
+    for aspect in aspects:
+        trends_data['aspects'][aspect] = [
+            sums[(day, aspect)][0] / sums[(day, aspect)][1] if sums.get((day, aspect), [0, 0])[1] else 0.0
+            for day in dates
+        ]
     
     return trends_data
 
@@ -460,14 +391,19 @@ def sentiment_trends_page():
     user_id = session["user_id"]
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
+    granularity = request.args.get('granularity', 'auto')
     
-    trends_data = get_sentiment_trends(user_id, start_date, end_date)
+    bucket = resolve_trend_granularity(user_id, granularity, start_date, end_date)
+    trends_data = get_sentiment_trends(user_id, start_date, end_date, bucket)
     
     return render_template(
         'sentiment_trends.html',
         trends_data=trends_data,
         start_date=start_date,
-        end_date=end_date
+        end_date=end_date,
+        granularity=granularity,
+        bucket=bucket,
+        granularities=TREND_GRANULARITIES
     )
 
 
@@ -480,14 +416,19 @@ def sentiment_trends_embed():
     user_id = session["user_id"]
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
+    granularity = request.args.get('granularity', 'auto')
     
-    trends_data = get_sentiment_trends(user_id, start_date, end_date)
+    bucket = resolve_trend_granularity(user_id, granularity, start_date, end_date)
+    trends_data = get_sentiment_trends(user_id, start_date, end_date, bucket)
     
     return render_template(
         'sentiment_trends_embed.html',
         trends_data=trends_data,
         start_date=start_date,
-        end_date=end_date
+        end_date=end_date,
+        granularity=granularity,
+        bucket=bucket,
+        granularities=TREND_GRANULARITIES
     )
 
 
@@ -560,6 +501,12 @@ def export_pdf():
     """Export comprehensive aspect analysis to PDF with sentiment trends and detailed reviews"""
     if "user_id" not in session:
         return jsonify({'error': 'Unauthorized'}), 401
+
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image
+    from reportlab.lib.units import inch
     
     user_id = session["user_id"]
     username = User.query.get(user_id).username
@@ -695,6 +642,10 @@ def export_pdf():
     # Generate Overall Aspect Sentiment Scores Chart (if aspects exist and matplotlib available)
     if include_aspects and MATPLOTLIB_AVAILABLE and (categorized_summary or uncategorized_summary):
         try:
+            import matplotlib
+            matplotlib.use('Agg')  # Use non-GUI backend
+            import matplotlib.pyplot as plt
+
             # Combine both categorized and uncategorized aspects
             all_aspects = categorized_summary + uncategorized_summary
             
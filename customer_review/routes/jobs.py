@@ -0,0 +1,28 @@
+from flask import Blueprint, session, jsonify
+from models import db, AnalysisJob
+from analysis_jobs import job_status, ACTIVE_JOB_STATUSES
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/jobs/<int:job_id>')
+def get_job(job_id):
+    """Progress, throughput and errors of one of the user's analysis jobs (polled by the UI)."""
+    if "user_id" not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    job = db.session.get(AnalysisJob, job_id)
+    if job is None or job.user_id != session["user_id"]:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_status(job))
+
+@jobs_bp.route('/jobs')
+def list_active_jobs():
+    """The user's queued and running jobs."""
+    if "user_id" not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    jobs = AnalysisJob.query.filter(
+        AnalysisJob.user_id == session["user_id"],
+        AnalysisJob.status.in_(ACTIVE_JOB_STATUSES)
+    ).order_by(AnalysisJob.id).all()
+    return jsonify([job_status(job) for job in jobs])
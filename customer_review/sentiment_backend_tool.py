@@ -0,0 +1,122 @@
+"""
+Export and evaluate CPU-optimised variants of the sentiment model.
+
+    # 1. Build the artifacts (written to models/sentiment/<variant>)
+    python sentiment_backend_tool.py export int8
+    python sentiment_backend_tool.py export onnx --quantize
+
+    # 2. Compare against the fp32 pipeline on a labeled CSV (columns: text,label
+    #    with labels positive/negative/neutral). Writes evaluation.json next to
+    #    the artifacts; the variant can only be enabled once it is approved.
+    python sentiment_backend_tool.py evaluate int8 labeled_sample.csv --max-accuracy-drop 0.01
+
+    # 3. Enable it
+    NLP_SENTIMENT_MODEL_VARIANT=int8
+"""
+import argparse
+import csv
+import datetime
+import os
+import time
+
+from nlp_processor import NLPProcessor
+from sentiment_backends import (
+    export_variant, load_sentiment_pipeline, write_evaluation, MODEL_VARIANTS
+)
+
+
+def load_labeled_sample(path, limit):
+    texts, labels = [], []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if not row.get('text') or not row.get('label'):
+                continue
+            texts.append(row['text'])
+            labels.append(row['label'].strip().upper())
+            if limit and len(texts) >= limit:
+                break
+    return texts, labels
+
+
+def predict(sentiment_pipeline, texts, batch_size):
+    processor = NLPProcessor()
+    started = time.perf_counter()
+    outputs = sentiment_pipeline(texts, batch_size=batch_size, truncation=True)
+    elapsed = time.perf_counter() - started
+    # Same label decision as NLPProcessor.analyze_sentiment (without the lexical rules,
+    # which are identical for every variant)
+    return [processor._scores_to_label({item['label']: item['score'] for item in output})['label']
+            for output in outputs], elapsed
+
+
+def evaluate(args):
+    processor = NLPProcessor()
+    texts, labels = load_labeled_sample(args.labeled_csv, args.limit)
+    if not texts:
+        print("No labeled rows found (expected 'text' and 'label' columns).")
+        return
+
+    baseline = load_sentiment_pipeline(processor.sentiment_model_name)
+    candidate = load_sentiment_pipeline(
+        processor.sentiment_model_name, args.variant, args.artifact_dir, require_evaluation=False
+    )
+
+    baseline_predictions, baseline_seconds = predict(baseline, texts, args.batch_size)
+    candidate_predictions, candidate_seconds = predict(candidate, texts, args.batch_size)
+
+    def accuracy(predictions):
+        return sum(p == l for p, l in zip(predictions, labels)) / len(labels)
+
+    baseline_accuracy = accuracy(baseline_predictions)
+    candidate_accuracy = accuracy(candidate_predictions)
+    agreement = sum(a == b for a, b in zip(baseline_predictions, candidate_predictions)) / len(texts)
+    approved = baseline_accuracy - candidate_accuracy <= args.max_accuracy_drop
+
+    report = {
+        'variant': args.variant,
+        'model_name': processor.sentiment_model_name,
+        'sample': os.path.abspath(args.labeled_csv),
+        'sample_size': len(texts),
+        'fp32_accuracy': round(baseline_accuracy, 4),
+        'variant_accuracy': round(candidate_accuracy, 4),
+        'agreement_with_fp32': round(agreement, 4),
+        'fp32_ms_per_text': round(baseline_seconds * 1000 / len(texts), 3),
+        'variant_ms_per_text': round(candidate_seconds * 1000 / len(texts), 3),
+        'max_accuracy_drop': args.max_accuracy_drop,
+        'approved': approved,
+        'evaluated_at': datetime.datetime.utcnow().isoformat()
+    }
+    write_evaluation(args.artifact_dir, args.variant, report)
+
+    for key, value in report.items():
+        print(f"{key:>22}: {value}")
+    if not approved:
+        print(f"Variant '{args.variant}' NOT approved: accuracy drop exceeds {args.max_accuracy_drop}.")
+
+
+def main():
+    processor = NLPProcessor()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--artifact-dir', default=processor.sentiment_artifact_dir)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='Write the artifacts for a variant')
+    export_parser.add_argument('variant', choices=[v for v in MODEL_VARIANTS if v != 'fp32'])
+    export_parser.add_argument('--quantize', action='store_true', help='int8-quantize the ONNX export')
+
+    evaluate_parser = subparsers.add_parser('evaluate', help='Compare a variant with fp32 on a labeled sample')
+    evaluate_parser.add_argument('variant', choices=[v for v in MODEL_VARIANTS if v != 'fp32'])
+    evaluate_parser.add_argument('labeled_csv')
+    evaluate_parser.add_argument('--limit', type=int, default=0)
+    evaluate_parser.add_argument('--batch-size', type=int, default=processor.sentiment_batch_size)
+    evaluate_parser.add_argument('--max-accuracy-drop', type=float, default=0.01)
+
+    args = parser.parse_args()
+    if args.command == 'export':
+        export_variant(processor.sentiment_model_name, args.variant, args.artifact_dir, quantize_onnx=args.quantize)
+    else:
+        evaluate(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+# sentiment_backends.py
+import hashlib
+import importlib.util
+import json
+import logging
+import math
+import os
+import re
+import time
+
+# Optional: ONNX Runtime backend (pip install "optimum[onnxruntime]").
+# Only probed here; optimum pulls in torch/transformers, which the lexicon and
+# stub backends must not need.
+ONNXRUNTIME_AVAILABLE = (importlib.util.find_spec('optimum') is not None
+                         and importlib.util.find_spec('onnxruntime') is not None)
+
+logger = logging.getLogger(__name__)
+
+# fp32: the Hugging Face model as published (default)
+# int8: torch dynamic int8 quantization of the Linear layers
+# onnx: ONNX Runtime export (optionally int8-quantized at export time)
+MODEL_VARIANTS = ('fp32', 'int8', 'onnx')
+
+INT8_STATE_DICT = 'pytorch_model_int8.pt'
+ONNX_QUANTIZED_FILE = 'model_quantized.onnx'
+EVALUATION_REPORT = 'evaluation.json'
+
+
+def variant_dir(artifact_dir, variant):
+    return os.path.join(artifact_dir, variant)
+
+
+def _quantize_dynamic(model):
+    import torch
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def export_variant(model_name, variant, artifact_dir, quantize_onnx=False):
+    """Writes the artifacts for a non-fp32 variant to <artifact_dir>/<variant>."""
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    target = variant_dir(artifact_dir, variant)
+    os.makedirs(target, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    if variant == 'int8':
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        model.eval()
+        quantized = _quantize_dynamic(model)
+        model.config.save_pretrained(target)
+        tokenizer.save_pretrained(target)
+        torch.save(quantized.state_dict(), os.path.join(target, INT8_STATE_DICT))
+    elif variant == 'onnx':
+        if not ONNXRUNTIME_AVAILABLE:
+            raise RuntimeError("The onnx variant needs optimum[onnxruntime] installed.")
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+        ort_model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+        ort_model.save_pretrained(target)
+        tokenizer.save_pretrained(target)
+        if quantize_onnx:
+            from optimum.onnxruntime import ORTQuantizer
+            from optimum.onnxruntime.configuration import AutoQuantizationConfig
+            quantizer = ORTQuantizer.from_pretrained(target)
+            quantizer.quantize(
+                save_dir=target,
+                quantization_config=AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+            )
+    else:
+        raise ValueError(f"Nothing to export for variant '{variant}'.")
+
+    # A fresh export has not been evaluated yet
+    report_path = os.path.join(target, EVALUATION_REPORT)
+    if os.path.exists(report_path):
+        os.remove(report_path)
+    logger.info(f"Exported '{model_name}' ({variant}) to '{target}'.")
+    return target
+
+
+def read_evaluation(artifact_dir, variant):
+    try:
+        with open(os.path.join(variant_dir(artifact_dir, variant), EVALUATION_REPORT), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_evaluation(artifact_dir, variant, report):
+    with open(os.path.join(variant_dir(artifact_dir, variant), EVALUATION_REPORT), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+
+def _load_model_and_tokenizer(model_name, variant, artifact_dir):
+    import torch
+    from transformers import AutoConfig, AutoTokenizer, AutoModelForSequenceClassification
+
+    if variant == 'fp32':
+        return (AutoModelForSequenceClassification.from_pretrained(model_name),
+                AutoTokenizer.from_pretrained(model_name))
+
+    source = variant_dir(artifact_dir, variant)
+    if not os.path.isdir(source):
+        raise RuntimeError(f"No '{variant}' artifacts in '{source}'. Run sentiment_backend_tool.py export first.")
+    tokenizer = AutoTokenizer.from_pretrained(source)
+
+    if variant == 'int8':
+        config = AutoConfig.from_pretrained(source)
+        model = _quantize_dynamic(AutoModelForSequenceClassification.from_config(config))
+        model.load_state_dict(torch.load(os.path.join(source, INT8_STATE_DICT)))
+        model.eval()
+        return model, tokenizer
+
+    if variant == 'onnx':
+        if not ONNXRUNTIME_AVAILABLE:
+            raise RuntimeError("The onnx variant needs optimum[onnxruntime] installed.")
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+        kwargs = {}
+        if os.path.exists(os.path.join(source, ONNX_QUANTIZED_FILE)):
+            kwargs['file_name'] = ONNX_QUANTIZED_FILE
+        return ORTModelForSequenceClassification.from_pretrained(source, **kwargs), tokenizer
+
+    raise ValueError(f"Unknown sentiment model variant '{variant}'. Expected one of {MODEL_VARIANTS}.")
+
+
+def load_sentiment_pipeline(model_name, variant='fp32', artifact_dir=None, require_evaluation=True):
+    """
+    Builds the Hugging Face text-classification pipeline for the requested variant.
+    Non-fp32 variants are loaded from <artifact_dir>/<variant> and, unless
+    require_evaluation is False, only if their evaluation report was approved.
+    """
+    if variant != 'fp32' and require_evaluation:
+        report = read_evaluation(artifact_dir, variant)
+        if not report or not report.get('approved'):
+            raise RuntimeError(
+                f"Sentiment variant '{variant}' has no approved evaluation report. "
+                f"Run sentiment_backend_tool.py evaluate before enabling it."
+            )
+
+    import torch
+    from transformers import pipeline
+
+    model, tokenizer = _load_model_and_tokenizer(model_name, variant, artifact_dir)
+    device = 0 if variant == 'fp32' and torch.cuda.is_available() else -1
+    return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer, return_all_scores=True, device=device)
+
+
+class SentimentBackend:
+    """
+    Something that turns texts into sentiment probabilities.
+
+    score_batch(texts) returns one {'negative': p, 'neutral': p, 'positive': p}
+    dict per text, in input order. Turning those into a label (and the lexical
+    override rules) stays in NLPProcessor, so every backend is judged the same way.
+    """
+    name = None
+
+    def load(self):
+        """Loads whatever the backend needs; called once from NLPProcessor.init_nlp."""
+
+    def version(self):
+        """Identifies the scores this backend produces, for cache keys."""
+        return self.name
+
+    def score_batch(self, texts, batch_size=None):
+        raise NotImplementedError
+
+
+class TransformersBackend(SentimentBackend):
+    """The Hugging Face model, in any of the MODEL_VARIANTS (falls back to fp32)."""
+    name = 'transformers'
+
+    def __init__(self, model_name, variant='fp32', artifact_dir=None, batch_size=16):
+        self.model_name = model_name
+        self.variant = variant
+        self.artifact_dir = artifact_dir
+        self.batch_size = batch_size
+        self.pipeline = None
+
+    def load(self):
+        logger.info(f"Loading Hugging Face sentiment model '{self.model_name}' ({self.variant})...")
+        try:
+            self.pipeline = load_sentiment_pipeline(self.model_name, self.variant, self.artifact_dir)
+        except Exception as e:
+            if self.variant == 'fp32':
+                raise
+            logger.error(f"Could not load '{self.variant}' sentiment model, falling back to fp32: {e}")
+            self.variant = 'fp32'
+            self.pipeline = load_sentiment_pipeline(self.model_name)
+        logger.info("Hugging Face sentiment model loaded.")
+
+    def version(self):
+        return f"{self.model_name}:{self.variant}"
+
+    def score_batch(self, texts, batch_size=None):
+        outputs = self.pipeline(list(texts), batch_size=batch_size or self.batch_size, truncation=True)
+        return [{item['label']: item['score'] for item in output} for output in outputs]
+
+
+# Small general-purpose review lexicon: word -> polarity weight
+DEFAULT_SENTIMENT_LEXICON = {
+    'excellent': 3.0, 'amazing': 3.0, 'awesome': 3.0, 'fantastic': 3.0, 'perfect': 3.0,
+    'outstanding': 3.0, 'wonderful': 3.0, 'superb': 3.0, 'love': 3.0, 'loved': 3.0,
+    'great': 2.5, 'best': 2.5, 'delicious': 2.5, 'friendly': 2.0, 'good': 2.0, 'nice': 2.0,
+    'happy': 2.0, 'recommend': 2.0, 'recommended': 2.0, 'clean': 1.5, 'fast': 1.5, 'quick': 1.5,
+    'helpful': 2.0, 'comfortable': 2.0, 'fresh': 1.5, 'enjoyed': 2.0, 'pleasant': 1.5,
+    'reliable': 1.5, 'worth': 1.5, 'cheap': 1.0, 'affordable': 1.5, 'fine': 1.0, 'like': 1.0,
+    'terrible': -3.0, 'awful': -3.0, 'horrible': -3.0, 'worst': -3.0, 'hate': -3.0,
+    'disgusting': -3.0, 'useless': -2.5, 'broken': -2.5, 'rude': -2.5, 'bad': -2.5,
+    'poor': -2.0, 'disappointing': -2.5, 'disappointed': -2.5, 'dirty': -2.0, 'slow': -1.5,
+    'cold': -1.0, 'overpriced': -2.0, 'expensive': -1.5, 'pricey': -1.5, 'costly': -1.5,
+    'noisy': -1.5, 'late': -1.5, 'waste': -2.5, 'refund': -1.5, 'problem': -1.5,
+    'issue': -1.0, 'unfortunately': -1.5, 'never': -1.0, 'mediocre': -1.5, 'bland': -1.5
+}
+NEGATORS = frozenset(['not', 'no', "n't", 'never', 'hardly', 'without', 'nor', 'neither'])
+INTENSIFIERS = {'very': 1.5, 'really': 1.4, 'extremely': 1.8, 'so': 1.3, 'super': 1.5, 'too': 1.3,
+                'slightly': 0.5, 'somewhat': 0.6, 'bit': 0.6, 'little': 0.6, 'fairly': 0.7}
+_LEXICON_TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)?|n't")
+
+
+class LexiconBackend(SentimentBackend):
+    """
+    Pure-Python word-list scorer: sums lexicon weights with negation and intensifier
+    handling and maps the total to three probabilities. Far less accurate than the
+    model, but needs no downloads and scores a text in well under a millisecond.
+    """
+    name = 'lexicon'
+
+    def __init__(self, lexicon=None, neutral_band=1.0):
+        self.lexicon = dict(DEFAULT_SENTIMENT_LEXICON)
+        if lexicon:
+            self.lexicon.update({word.lower(): weight for word, weight in lexicon.items()})
+        self.neutral_band = neutral_band
+
+    @classmethod
+    def from_config(cls, path=None):
+        """Builds the backend from a JSON {word: weight} file, falling back to the default lexicon."""
+        if not path:
+            return cls()
+        try:
+            with open(path, encoding='utf-8') as f:
+                lexicon = json.load(f)
+            logger.info(f"Loaded sentiment lexicon from '{path}'.")
+            return cls(lexicon)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load sentiment lexicon from '{path}', using defaults: {e}")
+            return cls()
+
+    def version(self):
+        digest = hashlib.sha256(json.dumps(sorted(self.lexicon.items())).encode('utf-8')).hexdigest()[:12]
+        return f"{self.name}:{digest}"
+
+    def polarity(self, text):
+        total = 0.0
+        negate_window = 0
+        multiplier = 1.0
+        for token in _LEXICON_TOKEN_RE.findall(text.lower().replace("n't", " n't")):
+            if token in NEGATORS:
+                negate_window = 3
+                continue
+            if token in INTENSIFIERS:
+                multiplier *= INTENSIFIERS[token]
+                continue
+            weight = self.lexicon.get(token)
+            if weight is not None:
+                if negate_window:
+                    weight = -0.5 * weight
+                total += weight * multiplier
+            multiplier = 1.0
+            negate_window = max(negate_window - 1, 0)
+        return total
+
+    def score_batch(self, texts, batch_size=None):
+        results = []
+        for text in texts:
+            polarity = self.polarity(text)
+            # Softmax over (negative, neutral, positive) logits
+            logits = (-polarity, self.neutral_band, polarity)
+            peak = max(logits)
+            exps = [math.exp(logit - peak) for logit in logits]
+            total = sum(exps)
+            results.append({'negative': exps[0] / total, 'neutral': exps[1] / total, 'positive': exps[2] / total})
+        return results
+
+
+class StubBackend(SentimentBackend):
+    """
+    Deterministic fake scores derived from a hash of the text, for tests and load
+    tests. latency_ms adds a fixed per-batch delay to mimic model cost.
+    """
+    name = 'stub'
+
+    def __init__(self, latency_ms=0.0):
+        self.latency_ms = latency_ms
+
+    def score_batch(self, texts, batch_size=None):
+        texts = list(texts)
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000.0)
+        results = []
+        for text in texts:
+            digest = hashlib.sha256(text.encode('utf-8')).digest()
+            raw = [digest[0] + 1, digest[1] + 1, digest[2] + 1]
+            total = sum(raw)
+            results.append({'negative': raw[0] / total, 'neutral': raw[1] / total, 'positive': raw[2] / total})
+        return results
+
+
+SENTIMENT_BACKENDS = ('transformers', 'lexicon', 'stub')
+
+
+def create_sentiment_backend(name, model_name=None, variant='fp32', artifact_dir=None, batch_size=16):
+    """Builds the backend selected by NLP_SENTIMENT_BACKEND (not loaded yet)."""
+    if name == 'transformers':
+        return TransformersBackend(model_name, variant, artifact_dir, batch_size)
+    if name == 'lexicon':
+        return LexiconBackend.from_config(os.environ.get('NLP_SENTIMENT_LEXICON_PATH'))
+    if name == 'stub':
+        return StubBackend(latency_ms=float(os.environ.get('NLP_SENTIMENT_STUB_LATENCY_MS', 0)))
+    raise ValueError(f"Unknown sentiment backend '{name}'. Expected one of {SENTIMENT_BACKENDS}.")
@@ -0,0 +1,124 @@
+# sentiment_rules.py
+import json
+import logging
+
+from aspect_matcher import KeywordAutomaton
+
+logger = logging.getLogger(__name__)
+
+# Rule sets applied before the sentiment model. Any of these can be overridden
+# from a JSON file with the same keys (see LexicalRuleEngine.from_config).
+DEFAULT_SENTIMENT_RULES = {
+    'strong_neutral_phrases': [
+        'neither good nor bad', 'neither cheap nor expensive',
+        'neither positive nor negative', 'neither great nor terrible'
+    ],
+    # (negative word, context words required unless the aspect is price-related)
+    'negative_price_patterns': [
+        ['high', ['price', 'cost', 'expensive']],
+        ['expensive', ['price', 'cost', 'high']],
+        ['overpriced', []],
+        ['costly', []],
+        ['pricey', []]
+    ],
+    'price_aspect_words': ['price', 'cost', 'pricing'],
+    'negation_prefixes': ['not ', "n't "],
+    'softeners': ['a bit', 'a little', 'slightly', 'somewhat', 'kind of', 'sort of', 'fairly', 'rather'],
+    'neutral_keywords': ['average', 'okay', 'ok', 'standard', 'normal', 'typical', 'usual', 'regular', 'moderate'],
+    'strong_negative_words': ['terrible', 'awful', 'horrible', 'worst', 'disappointing', 'poor', 'bad'],
+    'strong_positive_words': ['excellent', 'amazing', 'great', 'awesome', 'fantastic', 'perfect', 'wonderful'],
+    'neutral_score': 0.7,
+    'negative_price_score': 0.75
+}
+
+
+class LexicalRuleEngine:
+    """
+    The lexical override rules of NLPProcessor.analyze_sentiment, compiled once.
+
+    Every phrase the rules look for (including the negated forms such as "not high")
+    goes into a single Aho-Corasick automaton, so one pass over the lowercased text
+    yields all the substring hits the decision needs.
+    """
+
+    def __init__(self, rules=None):
+        self.rules = dict(DEFAULT_SENTIMENT_RULES)
+        if rules:
+            self.rules.update(rules)
+
+        self.strong_neutral_phrases = [p.lower() for p in self.rules['strong_neutral_phrases']]
+        self.negative_price_patterns = [
+            (neg_word.lower(), [ctx.lower() for ctx in context_words],
+             [prefix + neg_word.lower() for prefix in self.rules['negation_prefixes']])
+            for neg_word, context_words in self.rules['negative_price_patterns']
+        ]
+        self.price_aspect_words = [w.lower() for w in self.rules['price_aspect_words']]
+        self.softeners = [s.lower() for s in self.rules['softeners']]
+        self.neutral_keywords = [k.lower() for k in self.rules['neutral_keywords']]
+        self.strong_negative_words = [w.lower() for w in self.rules['strong_negative_words']]
+        self.strong_positive_words = [w.lower() for w in self.rules['strong_positive_words']]
+        self.neutral_score = self.rules['neutral_score']
+        self.negative_price_score = self.rules['negative_price_score']
+
+        patterns = set(self.strong_neutral_phrases + self.softeners + self.neutral_keywords
+                       + self.strong_negative_words + self.strong_positive_words)
+        for neg_word, context_words, negated_forms in self.negative_price_patterns:
+            patterns.add(neg_word)
+            patterns.update(context_words)
+            patterns.update(negated_forms)
+        self.automaton = KeywordAutomaton(patterns)
+
+        self._softener_set = set(self.softeners)
+        self._neutral_keyword_set = set(self.neutral_keywords)
+        self._strong_negative_set = set(self.strong_negative_words)
+        self._strong_positive_set = set(self.strong_positive_words)
+
+    @classmethod
+    def from_config(cls, path=None):
+        """Builds the engine from a JSON rules file, falling back to the defaults."""
+        if not path:
+            return cls()
+        try:
+            with open(path, encoding='utf-8') as f:
+                rules = json.load(f)
+            logger.info(f"Loaded sentiment override rules from '{path}'.")
+            return cls(rules)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load sentiment rules from '{path}', using defaults: {e}")
+            return cls()
+
+    def is_price_aspect(self, aspect_keyword):
+        return bool(aspect_keyword and any(word in aspect_keyword.lower() for word in self.price_aspect_words))
+
+    def evaluate(self, text, is_price_aspect=False):
+        """Returns a sentiment dict when a rule decides the label, otherwise None."""
+        hits = self.automaton.find_all(text.lower())
+        if not hits:
+            return None
+
+        # Only override for very strong neutral indicators
+        for phrase in self.strong_neutral_phrases:
+            if phrase in hits:
+                logger.debug(f"Strong neutral phrase '{phrase}' found in text. Returning NEUTRAL.")
+                return {"label": "NEUTRAL", "score": self.neutral_score}
+
+        has_softener = not self._softener_set.isdisjoint(hits)
+        for neg_word, context_words, negated_forms in self.negative_price_patterns:
+            if neg_word not in hits:
+                continue
+            # Check if it's about price/cost (either in text OR analyzing price aspect)
+            if is_price_aspect or not context_words or any(ctx in hits for ctx in context_words):
+                # Negation (e.g., "not high") or softeners (e.g., "a bit high") skip the override
+                if any(form in hits for form in negated_forms) or has_softener:
+                    continue
+                logger.info(f"✓ NEGATIVE PRICE DETECTED: '{neg_word}' (price aspect: {is_price_aspect}, text: '{text.lower()}'). Returning NEGATIVE.")
+                return {"label": "NEGATIVE", "score": self.negative_price_score}
+
+        # Neutral keyword only counts when not mixed with strong positive/negative words
+        if (not self._neutral_keyword_set.isdisjoint(hits)
+                and self._strong_negative_set.isdisjoint(hits)
+                and self._strong_positive_set.isdisjoint(hits)):
+            logger.debug(f"Neutral keyword found without strong sentiment words. Returning NEUTRAL.")
+            return {"label": "NEUTRAL", "score": self.neutral_score}
+
+        return None
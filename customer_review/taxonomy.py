@@ -0,0 +1,91 @@
+# taxonomy.py
+"""
+Versioned, immutable snapshots of the aspect taxonomy.
+
+Every admin edit of categories, aspects or keywords bumps a counter in the
+taxonomy_state table in the same transaction. NLPProcessor holds the taxonomy
+as a TaxonomySnapshot (the aspects plus everything compiled from them) and
+replaces it by assigning a new snapshot, so a batch that grabbed a snapshot
+keeps a consistent view while a reload happens. Each process compares the
+counter with its snapshot at most every NLP_TAXONOMY_CHECK_SECONDS, which lets
+all gunicorn workers, analysis workers and the inference daemon converge on an
+edit within a few seconds without reloading on every call.
+"""
+import types
+
+from sqlalchemy import select, update
+
+from models import db, Category, Aspect, TaxonomyState
+from aspect_matcher import AspectMatcher
+from inference_cache import PersistentInferenceCache
+
+TAXONOMY_STATE_ID = 1
+
+
+class TaxonomySnapshot:
+    """
+    One loaded version of the taxonomy. Never modified after construction; derived
+    structures that are built later (the spaCy phrase matchers) produce a new snapshot.
+    """
+
+    def __init__(self, version, aspects, phrase_matchers=None, loaded=True):
+        self.version = version  # taxonomy_state counter at load time
+        self.aspects = types.MappingProxyType(dict(aspects))
+        self.matcher = AspectMatcher(self.aspects)
+        self.phrase_matchers = phrase_matchers
+        self.loaded = loaded
+        # Fingerprint of the content; part of every cached extraction key
+        self.fingerprint = PersistentInferenceCache.make_key(sorted(
+            (aspect_id, info['aspect_name'], info['category_id'], info['keywords'])
+            for aspect_id, info in self.aspects.items()
+        )) if loaded else None
+
+    @classmethod
+    def empty(cls):
+        """Placeholder until the first load."""
+        return cls(None, {}, loaded=False)
+
+    def with_phrase_matchers(self, phrase_matchers):
+        snapshot = TaxonomySnapshot.__new__(TaxonomySnapshot)
+        snapshot.__dict__.update(self.__dict__)
+        snapshot.phrase_matchers = phrase_matchers
+        return snapshot
+
+    def __repr__(self):
+        return f'<TaxonomySnapshot version={self.version} aspects={len(self.aspects)}>'
+
+
+def load_taxonomy_aspects():
+    """aspect_id -> aspect info (name, category, weightage, lowercased keywords) from the database."""
+    categories = Category.query.options(db.joinedload(Category.aspects).joinedload(Aspect.keywords)).all()
+    aspects = {}
+    for category in categories:
+        for aspect in category.aspects:
+            aspects[aspect.id] = {
+                'aspect_id': aspect.id,
+                'aspect_name': aspect.name,
+                'category_id': category.id,
+                'category_name': category.name,
+                'weightage': aspect.weightage,
+                'keywords': [kw.keyword.lower() for kw in aspect.keywords]
+            }
+    return aspects
+
+
+def current_taxonomy_version():
+    """The taxonomy_state counter (0 before the first edit). One primary-key lookup."""
+    version = db.session.execute(
+        select(TaxonomyState.version).where(TaxonomyState.id == TAXONOMY_STATE_ID)
+    ).scalar_one_or_none()
+    return version or 0
+
+
+def bump_taxonomy_version():
+    """Increments the counter. Call before committing a taxonomy edit, in the same transaction."""
+    bumped = db.session.execute(
+        update(TaxonomyState)
+        .where(TaxonomyState.id == TAXONOMY_STATE_ID)
+        .values(version=TaxonomyState.version + 1)
+    ).rowcount
+    if not bumped:
+        db.session.add(TaxonomyState(id=TAXONOMY_STATE_ID, version=1))
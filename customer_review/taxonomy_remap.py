@@ -0,0 +1,213 @@
+# taxonomy_remap.py
+"""
+Incremental re-mapping of stored reviews after an aspect taxonomy edit.
+
+Every stored review's words are kept in an inverted index (IndexTerm holds the
+vocabulary, ReviewTerm the postings). When an admin adds, removes or renames
+aspects or keywords, only the reviews whose text contains one of the changed
+patterns are re-processed: aspects are extracted again with the new taxonomy,
+and the stored sentiment of an aspect is reused whenever its context window
+(and price-aspect flag) is unchanged, so the sentiment model only sees windows
+that are new.
+
+Candidate lookup is deliberately generous: the longest word of a pattern is
+stemmed (up to two trailing letters dropped, e.g. "battery" -> "batte") and
+matched as a substring of the indexed words, which covers the substring and
+lemma matching done by AspectMatcher. Fuzzy matches against a renamed aspect
+are not covered.
+"""
+import logging
+
+from sqlalchemy import delete, insert, select, update
+
+from models import db, RawText, AspectSentiment, Aspect, IndexTerm, ReviewTerm
+from aspect_matcher import AspectMatcher
+from inference_server import inference_priority, PRIORITY_BULK
+from rollups import add_reviews, remove_reviews
+
+logger = logging.getLogger(__name__)
+
+MAX_TERM_LENGTH = 100
+MIN_STEM_LENGTH = 3
+
+
+def review_terms(text):
+    """Distinct normalized words of a review, as stored in the index."""
+    return {term[:MAX_TERM_LENGTH] for term in AspectMatcher.normalize(text or '').split()}
+
+
+def _term_ids(terms):
+    """Ids of the given terms, adding the ones not in the vocabulary yet."""
+    if not terms:
+        return {}
+    known = dict(db.session.execute(select(IndexTerm.term, IndexTerm.id).where(IndexTerm.term.in_(terms))).all())
+    missing = [{'term': term} for term in terms if term not in known]
+    if missing:
+        # Concurrent workers may add the same new words; duplicates are skipped
+        db.session.execute(
+            insert(IndexTerm).prefix_with('IGNORE', dialect='mysql').prefix_with('OR IGNORE', dialect='sqlite'),
+            missing
+        )
+        known.update(db.session.execute(
+            select(IndexTerm.term, IndexTerm.id).where(IndexTerm.term.in_([row['term'] for row in missing]))
+        ).all())
+    return known
+
+
+def index_reviews(reviews):
+    """Adds (raw_text_id, content) pairs to the inverted index, without committing."""
+    terms_by_review = [(raw_text_id, review_terms(content)) for raw_text_id, content in reviews]
+    term_ids = _term_ids(set().union(*(terms for _, terms in terms_by_review)) if terms_by_review else set())
+    rows = [
+        {'term_id': term_ids[term], 'raw_text_id': raw_text_id}
+        for raw_text_id, terms in terms_by_review
+        for term in terms
+    ]
+    if rows:
+        db.session.execute(insert(ReviewTerm), rows)
+    return len(rows)
+
+
+def rebuild_index(batch_size=1000):
+    """Re-indexes every stored review. Returns the number of reviews indexed."""
+    db.session.execute(delete(ReviewTerm))
+    db.session.commit()
+    last_id = 0
+    indexed = 0
+    while True:
+        reviews = db.session.execute(
+            select(RawText.id, RawText.content).where(RawText.id > last_id).order_by(RawText.id).limit(batch_size)
+        ).all()
+        if not reviews:
+            return indexed
+        index_reviews(reviews)
+        db.session.commit()
+        last_id = reviews[-1][0]
+        indexed += len(reviews)
+        logger.info(f"Indexed {indexed} reviews.")
+
+
+def taxonomy_patterns():
+    """(aspect_id, pattern) pairs of the current taxonomy: aspect names and keywords, normalized."""
+    patterns = set()
+    for aspect in Aspect.query.options(db.joinedload(Aspect.keywords)).all():
+        for pattern in [aspect.name] + [kw.keyword for kw in aspect.keywords]:
+            normalized = AspectMatcher.normalize(pattern or '')
+            if normalized:
+                patterns.add((aspect.id, normalized))
+    return patterns
+
+
+def changed_patterns(before, after):
+    """Patterns added, removed or moved to another aspect between two taxonomy_patterns()."""
+    return {pattern for _, pattern in before ^ after}
+
+
+def _stem(pattern):
+    word = max(pattern.split(), key=len)
+    if len(word) <= MIN_STEM_LENGTH:
+        return word
+    return word[:max(MIN_STEM_LENGTH, len(word) - 2)]
+
+
+def candidate_review_ids(patterns):
+    """Ids of the stored reviews whose text may match any of the patterns."""
+    stems = {_stem(pattern) for pattern in patterns if pattern.strip()}
+    if not stems:
+        return []
+    # The vocabulary is small next to the postings, so the substring scan runs on it
+    term_ids = set()
+    for stem in stems:
+        term_ids.update(db.session.execute(
+            select(IndexTerm.id).where(IndexTerm.term.contains(stem, autoescape=True))
+        ).scalars())
+    if not term_ids:
+        return []
+    return sorted(db.session.execute(
+        select(ReviewTerm.raw_text_id).distinct()
+        .join(RawText, RawText.id == ReviewTerm.raw_text_id)
+        .where(ReviewTerm.term_id.in_(term_ids))
+    ).scalars())
+
+
+def _sentiment_key(processor, sentence, keyword, start_char, end_char):
+    window = processor.aspect_context_window(sentence, aspect_keyword=keyword, aspect_start=start_char, aspect_end=end_char)
+    return window, processor._is_price_aspect(keyword)
+
+
+def remap_reviews(processor, raw_text_ids):
+    """
+    Re-extracts the aspects of the given reviews with the processor's current taxonomy
+    and replaces their AspectSentiment rows and rollup counts (without committing). Returns
+    (reviews re-mapped, aspect rows written, sentiments reused).
+    """
+    reviews = RawText.query.filter(RawText.id.in_(raw_text_ids)).options(
+        db.selectinload(RawText.aspect_sentiments)
+    ).order_by(RawText.id).all()
+    if not reviews:
+        return 0, 0, 0
+
+    with inference_priority(PRIORITY_BULK):
+        aspects_per_review = [[] for _ in reviews]
+        for review_idx, extracted_aspects_raw in processor.extract_aspects_many([review.content for review in reviews]):
+            aspects_per_review[review_idx] = extracted_aspects_raw
+
+        # Sentiment of context windows that the previous mapping already scored
+        stored = {}
+        for review in reviews:
+            for row in review.aspect_sentiments:
+                key = _sentiment_key(processor, row.sentence, row.keyword_found, row.start_char, row.end_char)
+                stored.setdefault(key, {'label': row.sentiment, 'score': row.score})
+
+        keys = [
+            [_sentiment_key(processor, aspect['sentence'], aspect['keyword_found'], aspect['start_char'], aspect['end_char'])
+             for aspect in aspects]
+            for aspects in aspects_per_review
+        ]
+        # New windows, each scored once (any keyword with the same price flag scores it the same way)
+        pending = {}
+        for aspects, review_keys in zip(aspects_per_review, keys):
+            for aspect, key in zip(aspects, review_keys):
+                if key not in stored and key not in pending:
+                    pending[key] = aspect['keyword_found']
+        new_scores = {}
+        if pending:
+            scored = processor.analyze_sentiment_batch([window for window, _ in pending], list(pending.values()))
+            new_scores = dict(zip(pending, scored))
+
+    aspect_rows = []
+    reused = 0
+    for review, aspects, review_keys in zip(reviews, aspects_per_review, keys):
+        for aspect, key in zip(aspects, review_keys):
+            if key in stored:
+                result = stored[key]
+                reused += 1
+            else:
+                result = new_scores[key]
+            aspect_rows.append({
+                'raw_text_id': review.id,
+                'raw_extracted_aspect': aspect['raw_extracted_aspect'],
+                'keyword_found': aspect['keyword_found'],
+                'sentence': aspect['sentence'],
+                'sentiment': result['label'],
+                'score': result['score'],
+                'aspect_id': aspect['aspect_category_id'],
+                'start_char': aspect['start_char'],
+                'end_char': aspect['end_char']
+            })
+
+    review_ids = [review.id for review in reviews]
+    remove_reviews(review_ids)
+    db.session.execute(
+        delete(AspectSentiment).where(AspectSentiment.raw_text_id.in_(review_ids))
+        .execution_options(synchronize_session=False)
+    )
+    if aspect_rows:
+        db.session.execute(insert(AspectSentiment), aspect_rows)
+        add_reviews(review_ids)
+    db.session.execute(
+        update(RawText).where(RawText.id.in_(review_ids)).values(analysis_version=processor.analysis_version())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.expire_all()
+    return len(reviews), len(aspect_rows), reused
@@ -0,0 +1,43 @@
+# tests/test_admin_dashboard.py
+import datetime
+
+import routes.admin_dashboard as admin_dashboard
+from models import db, AspectDailyRollup
+from routes.admin_dashboard import _dashboard_stats
+
+
+def test_avg_confidence_averages_scored_mentions_only(user):
+    day = datetime.date(2026, 1, 5)
+    db.session.add_all([
+        AspectDailyRollup(user_id=user.id, day=day, aspect_id=1, category_id=1, positive_count=2,
+                          total_count=2, scored_count=2, score_sum=1.6),
+        # Two mentions stored without a score
+        AspectDailyRollup(user_id=user.id, day=day, aspect_id=2, category_id=1, neutral_count=2,
+                          total_count=2, scored_count=0, score_sum=0.0)
+    ])
+    db.session.commit()
+
+    dashboard = _dashboard_stats()
+    assert dashboard['total_aspects'] == 4
+    assert dashboard['avg_confidence'] == 80
+
+
+def test_user_list_confidence_averages_scored_mentions_only(app, user, monkeypatch):
+    app.register_blueprint(admin_dashboard.admin_dashboard_bp)
+    day = datetime.date(2026, 1, 5)
+    db.session.add_all([
+        AspectDailyRollup(user_id=user.id, day=day, aspect_id=1, category_id=1, positive_count=1,
+                          total_count=1, scored_count=1, score_sum=0.9),
+        AspectDailyRollup(user_id=user.id, day=day, aspect_id=2, category_id=1, neutral_count=1,
+                          total_count=1, scored_count=0, score_sum=0.0)
+    ])
+    db.session.commit()
+
+    captured = {}
+    monkeypatch.setattr(admin_dashboard, 'render_template', lambda template, **context: captured.update(context) or '')
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['admin_id'] = 1
+    client.get('/admin/users?sort=confidence')
+
+    assert captured['users'][0]['avg_confidence'] == 90
@@ -0,0 +1,188 @@
+# tests/test_analysis_jobs.py
+import datetime
+import io
+import json
+
+from werkzeug.datastructures import FileStorage
+
+import analysis_jobs
+from analysis_jobs import (
+    enqueue_csv_upload, claim_next_batch, process_batch, requeue_quarantined, run_worker,
+    BATCH_PENDING, BATCH_QUARANTINED, JOB_SPLITTING, JOB_QUEUED, JOB_COMPLETED, JOB_FAILED
+)
+from models import db, AnalysisJob, AnalysisBatch, RawText
+
+
+def _upload(rows, filename='reviews.csv'):
+    csv = 'review\n' + ''.join(f'"{row}"\n' for row in rows)
+    return FileStorage(stream=io.BytesIO(csv.encode('latin1')), filename=filename)
+
+
+def test_enqueue_commits_batches_in_groups(user, monkeypatch):
+    commits = []
+    real_commit = db.session.commit
+
+    def counting_commit():
+        commits.append(db.session.query(AnalysisBatch).count())
+        real_commit()
+
+    monkeypatch.setattr(db.session, 'commit', counting_commit)
+
+    job = enqueue_csv_upload(_upload([f'review {i}' for i in range(10)]), user.id, batch_size=2, commit_batches=2)
+
+    assert job.status == JOB_QUEUED
+    assert (job.total_rows, job.total_batches) == (10, 5)
+    # Job row, then groups of 2, 2 and 1 batches, then the hand-over
+    assert commits == [0, 2, 4, 5, 5]
+    assert db.session.query(AnalysisBatch).filter_by(status=BATCH_PENDING).count() == 5
+
+
+def test_job_is_not_completed_while_splitting(user, processor):
+    job = AnalysisJob(user_id=user.id, kind='csv_upload', status=JOB_SPLITTING, total_rows=1, total_batches=1)
+    db.session.add(job)
+    db.session.flush()
+    db.session.add(AnalysisBatch(job_id=job.id, seq_start=0, row_count=1, payload='["The battery is fine."]',
+                                 status=BATCH_PENDING))
+    db.session.commit()
+
+    run_worker(processor, once=True, worker_id='w1')
+    db.session.refresh(job)
+    assert job.status == JOB_SPLITTING
+    assert job.batches_done == 1
+
+    job = analysis_jobs._end_splitting(job.id)
+    assert job.status == JOB_COMPLETED
+    assert db.session.query(RawText).count() == 1
+
+
+def _queue_job(user, reviews_per_batch):
+    job = AnalysisJob(user_id=user.id, kind='csv_upload', status=JOB_QUEUED,
+                      total_rows=sum(len(reviews) for reviews in reviews_per_batch),
+                      total_batches=len(reviews_per_batch))
+    db.session.add(job)
+    db.session.flush()
+    seq_start = 0
+    for reviews in reviews_per_batch:
+        db.session.add(AnalysisBatch(job_id=job.id, seq_start=seq_start, row_count=len(reviews),
+                                     payload=json.dumps(reviews), status=BATCH_PENDING))
+        seq_start += len(reviews)
+    db.session.commit()
+    return job
+
+
+def test_expired_lease_is_claimed_by_another_worker(user, processor):
+    job = _queue_job(user, [['The battery is fine.']])
+
+    first = claim_next_batch('w1', lease_seconds=60)
+    assert first.worker_id == 'w1'
+    assert claim_next_batch('w2') is None  # Leased and not expired
+
+    first.lease_expires_at = datetime.datetime.utcnow() - datetime.timedelta(seconds=1)
+    db.session.commit()
+    second = claim_next_batch('w2', lease_seconds=60)
+    assert (second.id, second.worker_id, second.attempts) == (first.id, 'w2', 2)
+
+    # The first worker finishing late must not store anything
+    assert process_batch(first, processor, 'w1') is False
+    assert db.session.query(RawText).count() == 0
+
+    assert process_batch(second, processor, 'w2') is True
+    db.session.refresh(job)
+    assert (job.status, job.batches_done, job.processed_rows) == (JOB_COMPLETED, 1, 1)
+    assert db.session.query(RawText).count() == 1
+
+
+def test_expired_lease_on_last_attempt_is_quarantined(user, processor, monkeypatch):
+    monkeypatch.setattr(analysis_jobs, 'MAX_ATTEMPTS', 2)
+    job = _queue_job(user, [['The battery is fine.'], ['The screen is dim.']])
+
+    for worker_id in ('w1', 'w2'):
+        batch = claim_next_batch(worker_id, lease_seconds=-1)  # Expires at once, as if the worker died
+        assert batch.seq_start == 0
+
+    # The poison batch is parked on the next claim and the rest of the job carries on
+    batch = claim_next_batch('w3')
+    assert batch.seq_start == 1
+    poisoned = db.session.query(AnalysisBatch).filter_by(seq_start=0).one()
+    assert poisoned.status == BATCH_QUARANTINED
+    assert 'Lease expired' in poisoned.last_error
+
+    assert process_batch(batch, processor, 'w3') is True
+    db.session.refresh(job)
+    assert (job.status, job.batches_done, job.batches_quarantined) == (JOB_COMPLETED, 1, 1)
+
+    assert requeue_quarantined(job.id) == 1
+    db.session.refresh(poisoned)
+    assert (poisoned.status, poisoned.attempts) == (BATCH_PENDING, 0)
+
+
+class FailingProcessor:
+    def analysis_version(self):
+        raise RuntimeError('model unavailable')
+
+
+def test_failed_batch_backs_off_then_quarantines(user, monkeypatch):
+    monkeypatch.setattr(analysis_jobs, 'MAX_ATTEMPTS', 2)
+    job = _queue_job(user, [['The battery is fine.']])
+
+    batch = claim_next_batch('w1')
+    assert process_batch(batch, FailingProcessor(), 'w1') is False
+    db.session.refresh(batch)
+    assert batch.status == BATCH_PENDING
+    assert batch.available_at > datetime.datetime.utcnow()
+    assert claim_next_batch('w1') is None  # Backing off
+
+    batch.available_at = datetime.datetime.utcnow() - datetime.timedelta(seconds=1)
+    db.session.commit()
+    batch = claim_next_batch('w1')
+    assert process_batch(batch, FailingProcessor(), 'w1') is False
+    db.session.refresh(batch)
+    db.session.refresh(job)
+    assert batch.status == BATCH_QUARANTINED
+    assert 'model unavailable' in batch.last_error
+    assert job.status == JOB_FAILED
+
+
+def test_requeue_of_a_job_never_started_returns_it_to_queued(user):
+    job = _queue_job(user, [['The battery is fine.']])
+    batch = db.session.query(AnalysisBatch).one()
+    batch.status = BATCH_QUARANTINED
+    job.batches_quarantined = 1
+    job.status = JOB_FAILED
+    db.session.commit()
+
+    assert requeue_quarantined(job.id) == 1
+    db.session.refresh(job)
+    assert (job.status, job.started_at, job.batches_quarantined) == (JOB_QUEUED, None, 0)
+
+
+def test_lease_renewal_extends_only_a_lease_still_held(user):
+    _queue_job(user, [['The battery is fine.']])
+    batch = claim_next_batch('w1', lease_seconds=5)
+    first_expiry = batch.lease_expires_at
+
+    renewer = analysis_jobs._LeaseRenewer(db.engine, batch.id, 'w1', lease_seconds=600)
+    assert renewer.renew() is True
+    db.session.refresh(batch)
+    assert batch.lease_expires_at > first_expiry + datetime.timedelta(seconds=500)
+
+    # Another worker takes the batch over: the first one can no longer renew
+    batch.lease_expires_at = datetime.datetime.utcnow() - datetime.timedelta(seconds=1)
+    db.session.commit()
+    claim_next_batch('w2')
+    assert renewer.renew() is False
+    assert renewer.lost
+
+
+def test_batch_whose_lease_was_lost_mid_run_is_not_stored(user, processor, monkeypatch):
+    _queue_job(user, [['The battery is fine.']])
+    batch = claim_next_batch('w1')
+
+    def stop_after_losing_lease(renewer):
+        renewer.lost = True
+        renewer._stopped.set()
+        renewer.join()
+
+    monkeypatch.setattr(analysis_jobs._LeaseRenewer, 'stop', stop_after_losing_lease)
+    assert process_batch(batch, processor, 'w1') is False
+    assert db.session.query(RawText).count() == 0
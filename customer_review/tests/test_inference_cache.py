@@ -0,0 +1,38 @@
+# tests/test_inference_cache.py
+from inference_cache import PersistentInferenceCache
+
+
+def _row_count(cache):
+    return cache._connection().execute("SELECT COUNT(*) FROM inference_cache").fetchone()[0]
+
+
+def test_oldest_entries_are_evicted_past_max_rows(tmp_path, monkeypatch):
+    cache = PersistentInferenceCache(str(tmp_path / 'cache.sqlite3'), max_rows=10)
+    clock = iter(range(1000))
+    monkeypatch.setattr('inference_cache.time.time', lambda: float(next(clock)))
+
+    for i in range(10):
+        cache.set('sentiment', f'key-{i}', i)
+    assert _row_count(cache) == 10
+
+    cache.set('sentiment', 'key-10', 10)
+    assert _row_count(cache) == 9
+    assert cache.evictions == 2
+    assert cache.get('sentiment', 'key-0') is None
+    assert cache.get('sentiment', 'key-1') is None
+    assert cache.get('sentiment', 'key-2') == 2
+    assert cache.get('sentiment', 'key-10') == 10
+
+
+def test_entries_older_than_max_age_are_evicted(tmp_path, monkeypatch):
+    cache = PersistentInferenceCache(str(tmp_path / 'cache.sqlite3'), max_age=100)
+    now = [1000.0]
+    monkeypatch.setattr('inference_cache.time.time', lambda: now[0])
+
+    cache.set('aspects', 'old', ['battery'])
+    now[0] += PersistentInferenceCache.AGE_PRUNE_INTERVAL + 150
+    cache.set('aspects', 'new', ['screen'])
+
+    assert cache.get('aspects', 'old') is None
+    assert cache.get('aspects', 'new') == ['screen']
+    assert cache.evictions == 1
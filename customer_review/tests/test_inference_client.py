@@ -0,0 +1,103 @@
+# tests/test_inference_client.py
+import os
+import socket
+import socketserver
+import threading
+
+import pytest
+
+from inference_server import (
+    InferenceClient, InferenceServerError, RemoteSentimentBackend, recv_message, send_message
+)
+
+
+class FakeDaemon:
+    """Unix-socket server answering with respond(request), or not at all when it returns None."""
+
+    def __init__(self, socket_path, respond):
+        self.requests = []
+        daemon = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                while True:
+                    try:
+                        request = recv_message(self.request)
+                    except (OSError, ConnectionError):
+                        return
+                    daemon.requests.append(request)
+                    result = respond(request)
+                    if result is None:
+                        return
+                    send_message(self.request, {'ok': True, 'result': result})
+
+        self.server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        os.unlink(self.server.server_address)
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return str(tmp_path / 'nlp.sock')
+
+
+def test_timed_out_request_is_not_sent_again(socket_path):
+    hold = threading.Event()
+    daemon = FakeDaemon(socket_path, lambda request: hold.wait(5) and None)
+    client = InferenceClient(socket_path, timeout=0.2)
+    try:
+        with pytest.raises(InferenceServerError, match='did not answer'):
+            client.score(['The battery is fine.'])
+        assert len(daemon.requests) == 1
+    finally:
+        hold.set()
+        daemon.close()
+
+
+def test_request_is_resent_when_the_connection_went_stale(socket_path):
+    daemon = FakeDaemon(socket_path, lambda request: [{'positive': 1.0}])
+    client = InferenceClient(socket_path, timeout=2)
+    assert client.score(['first']) == [{'positive': 1.0}]
+
+    # The daemon restarts: the client's connection now points at a closed socket
+    daemon.close()
+    client._local.sock.shutdown(socket.SHUT_RDWR)
+    daemon = FakeDaemon(socket_path, lambda request: [{'positive': 0.5}])
+    try:
+        assert client.score(['second']) == [{'positive': 0.5}]
+        assert [request['texts'] for request in daemon.requests] == [['second']]
+        assert client.connections_opened == 2
+    finally:
+        daemon.close()
+
+
+def test_remote_version_is_fetched_again_after_a_reconnect(socket_path):
+    versions = iter(['roberta:fp32', 'roberta:int8'])
+    current = {}
+
+    def respond(request):
+        if request['op'] == 'info':
+            return {'sentiment_model_version': current['version']}
+        return []
+
+    current['version'] = next(versions)
+    daemon = FakeDaemon(socket_path, respond)
+    backend = RemoteSentimentBackend(InferenceClient(socket_path, timeout=2))
+    assert backend.version() == 'roberta:fp32'
+    assert backend.version() == 'roberta:fp32'
+    assert len(daemon.requests) == 1  # Remembered while the connection lasts
+
+    daemon.close()
+    backend.client._local.sock.shutdown(socket.SHUT_RDWR)
+    current['version'] = next(versions)
+    daemon = FakeDaemon(socket_path, respond)
+    try:
+        backend.client.score(['after restart'])
+        assert backend.version() == 'roberta:int8'
+    finally:
+        daemon.close()
@@ -0,0 +1,58 @@
+# tests/test_ingestion.py
+from sqlalchemy import select
+
+from models import db, RawText, AspectSentiment, UploadedFile
+from ingestion import analyze_and_write, content_hash
+from conftest import StubProcessor
+
+COPIED_COLUMNS = ('raw_extracted_aspect', 'keyword_found', 'sentence', 'sentiment', 'score', 'aspect_id')
+
+
+def _new_upload(user):
+    uploaded_file = UploadedFile(filename='reviews.csv', user_id=user.id)
+    db.session.add(uploaded_file)
+    db.session.flush()
+    return uploaded_file.id
+
+
+def _aspects_of(raw_text_id):
+    rows = db.session.execute(
+        select(AspectSentiment).where(AspectSentiment.raw_text_id == raw_text_id).order_by(AspectSentiment.id)
+    ).scalars().all()
+    return [tuple(getattr(row, column) for column in COPIED_COLUMNS) for row in rows]
+
+
+def test_identical_reviews_reuse_the_stored_analysis(user, processor):
+    text = 'Great screen, weak battery.'
+    analyze_and_write(processor, user.id, _new_upload(user), 0, [text, 'The battery died.', text])
+    db.session.commit()
+    # Repeats within a chunk are analyzed once
+    assert processor.analyzed_texts == [text, 'The battery died.']
+
+    aspects_written, dedup_hits = analyze_and_write(processor, user.id, _new_upload(user), 0, [text, 'New text.'])
+    db.session.commit()
+    assert processor.analyzed_texts == [text, 'The battery died.', 'New text.']
+    assert dedup_hits == 1
+    assert aspects_written == 2
+
+    copies = db.session.execute(
+        select(RawText).where(RawText.content_hash == content_hash(text)).order_by(RawText.id)
+    ).scalars().all()
+    assert len(copies) == 3
+    original = _aspects_of(copies[0].id)
+    assert len(original) == 2
+    for copy in copies[1:]:
+        assert (copy.sentiment, copy.score) == (copies[0].sentiment, copies[0].score)
+        assert _aspects_of(copy.id) == original
+
+
+def test_analysis_is_not_reused_across_analysis_versions(user, taxonomy):
+    text = 'The battery lasts all day.'
+    aspect_ids = {name: aspect.id for name, aspect in taxonomy.items()}
+    analyze_and_write(StubProcessor(aspect_ids, version='v1'), user.id, _new_upload(user), 0, [text])
+    db.session.commit()
+
+    newer = StubProcessor(aspect_ids, version='v2')
+    _, dedup_hits = analyze_and_write(newer, user.id, _new_upload(user), 0, [text])
+    assert dedup_hits == 0
+    assert newer.analyzed_texts == [text]
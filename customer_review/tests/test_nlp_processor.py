@@ -0,0 +1,41 @@
+# tests/test_nlp_processor.py
+import sys
+import types
+
+import pytest
+
+from nlp_processor import NLPProcessor
+
+
+@pytest.fixture
+def fresh_processor(monkeypatch):
+    monkeypatch.setenv('NLP_PERSISTENT_CACHE_PATH', '')
+    monkeypatch.delenv('NLP_INFERENCE_SOCKET', raising=False)
+    monkeypatch.setattr(NLPProcessor, '_instance', None)
+    return NLPProcessor()
+
+
+def test_sentence_splitter_does_not_load_the_models(fresh_processor, monkeypatch):
+    built = []
+
+    class BlankPipeline:
+        def __init__(self, lang):
+            self.pipes = []
+            built.append(lang)
+
+        def add_pipe(self, name):
+            self.pipes.append(name)
+
+    monkeypatch.setitem(sys.modules, 'spacy', types.SimpleNamespace(blank=BlankPipeline))
+    monkeypatch.setattr(fresh_processor, 'init_nlp', lambda: pytest.fail('init_nlp must not be called'))
+
+    splitter = fresh_processor.sentence_splitter()
+    assert splitter.pipes == ['sentencizer']
+    assert fresh_processor.sentence_splitter() is splitter
+    assert built == ['en']
+    assert fresh_processor.nlp is None and fresh_processor.sentiment_backend is None
+
+
+def test_sentence_splitter_reuses_the_loaded_pipeline(fresh_processor):
+    fresh_processor.nlp = object()
+    assert fresh_processor.sentence_splitter() is fresh_processor.nlp
@@ -0,0 +1,89 @@
+# tests/test_rollups.py
+from sqlalchemy import func, select
+
+from models import db, AspectSentiment, AspectDailyRollup, UploadedFile
+from ingestion import analyze_and_write
+from rollups import UNMAPPED_ID, add_reviews, remove_reviews
+
+
+def _store_reviews(user, processor, review_strs):
+    uploaded_file = UploadedFile(filename='reviews.csv', user_id=user.id)
+    db.session.add(uploaded_file)
+    db.session.flush()
+    analyze_and_write(processor, user.id, uploaded_file.id, 0, review_strs)
+    db.session.commit()
+
+
+def _rollup_counts():
+    """Mentions per aspect_id (0 for unmapped) according to the rollup."""
+    rows = db.session.execute(
+        select(AspectDailyRollup.aspect_id, func.sum(AspectDailyRollup.total_count))
+        .group_by(AspectDailyRollup.aspect_id)
+    ).all()
+    return {aspect_id: int(total) for aspect_id, total in rows if total}
+
+
+def _stored_counts():
+    """Mentions per aspect_id (0 for unmapped) according to AspectSentiment."""
+    aspect_id = func.coalesce(AspectSentiment.aspect_id, UNMAPPED_ID)
+    rows = db.session.execute(select(aspect_id, func.count(AspectSentiment.id)).group_by(aspect_id)).all()
+    return {row_aspect_id: int(total) for row_aspect_id, total in rows}
+
+
+REVIEWS = [
+    'The battery lasts all day.',
+    'Great screen, weak battery.',
+    'The screen cracked in a week.',
+    'Nothing to say.'
+]
+
+
+def test_rollup_matches_aspect_sentiments_after_aspect_delete(user, taxonomy, processor):
+    from routes.admin_dashboard import _delete_taxonomy_entry
+
+    _store_reviews(user, processor, REVIEWS)
+    assert _rollup_counts() == _stored_counts() == {taxonomy['battery'].id: 2, taxonomy['screen'].id: 2}
+
+    battery = taxonomy['battery']
+    _delete_taxonomy_entry(battery, [battery.id])
+    db.session.commit()
+
+    assert _rollup_counts() == _stored_counts() == {UNMAPPED_ID: 2, taxonomy['screen'].id: 2}
+
+
+def test_rollup_matches_aspect_sentiments_after_category_delete(user, taxonomy, processor):
+    from routes.admin_dashboard import _delete_taxonomy_entry
+
+    _store_reviews(user, processor, REVIEWS)
+    category = taxonomy['battery'].category
+    _delete_taxonomy_entry(category, [aspect.id for aspect in category.aspects])
+    db.session.commit()
+
+    assert _rollup_counts() == _stored_counts() == {UNMAPPED_ID: 4}
+
+
+def _rollup_rows():
+    return sorted(
+        (row.user_id, row.day, row.aspect_id, row.category_id, row.positive_count, row.negative_count,
+         row.neutral_count, row.total_count, row.scored_count, round(row.score_sum, 9),
+         round(row.effective_score_sum, 9))
+        for row in db.session.execute(select(AspectDailyRollup)).scalars()
+    )
+
+
+def test_remove_and_add_reviews_are_symmetric(user, processor):
+    _store_reviews(user, processor, REVIEWS)
+    before = _rollup_rows()
+    raw_text_ids = db.session.execute(select(AspectSentiment.raw_text_id).distinct()).scalars().all()
+
+    remove_reviews(raw_text_ids[:2])
+    db.session.commit()
+    assert _rollup_counts() != _stored_counts()
+
+    add_reviews(raw_text_ids[:2])
+    db.session.commit()
+    assert _rollup_rows() == before
+
+    remove_reviews(raw_text_ids)
+    db.session.commit()
+    assert _rollup_rows() == []  # Rows left without mentions are dropped
@@ -0,0 +1,46 @@
+# tests/test_trends.py
+import datetime
+
+import pytest
+
+from models import db, AspectDailyRollup
+from routes.analysis import TREND_MAX_POINTS, get_sentiment_trends, resolve_trend_granularity
+
+
+def _mention_on(user, day):
+    db.session.add(AspectDailyRollup(user_id=user.id, day=day, aspect_id=0, category_id=0, positive_count=1,
+                                     total_count=1, scored_count=1, score_sum=0.9, effective_score_sum=0.95))
+
+
+@pytest.mark.parametrize('first_day, last_day, expected', [
+    (datetime.date(2026, 1, 1), datetime.date(2026, 3, 1), 'day'),
+    (datetime.date(2024, 1, 1), datetime.date(2026, 1, 1), 'week'),
+    (datetime.date(2020, 1, 1), datetime.date(2026, 1, 1), 'month'),
+    (datetime.date(2000, 1, 1), datetime.date(2026, 1, 1), 'quarter'),
+    (datetime.date(1960, 1, 1), datetime.date(2026, 1, 1), 'year'),
+])
+def test_auto_granularity_keeps_long_spans_within_max_points(user, first_day, last_day, expected):
+    _mention_on(user, first_day)
+    _mention_on(user, last_day)
+    db.session.commit()
+    assert resolve_trend_granularity(user.id, 'auto') == expected
+
+
+def test_multi_decade_span_is_bucketed_by_year(user):
+    for year in range(1960, 2027, 3):
+        _mention_on(user, datetime.date(year, 8, 17))
+    db.session.commit()
+
+    granularity = resolve_trend_granularity(user.id, 'auto')
+    trends = get_sentiment_trends(user.id, granularity=granularity)
+    assert len(trends['dates']) <= TREND_MAX_POINTS
+    assert trends['dates'][:2] == ['1960-01-01', '1963-01-01']
+
+
+def test_quarter_buckets_start_on_the_quarter(user):
+    for day in (datetime.date(2025, 2, 14), datetime.date(2025, 3, 31), datetime.date(2025, 11, 2)):
+        _mention_on(user, day)
+    db.session.commit()
+
+    trends = get_sentiment_trends(user.id, granularity='quarter')
+    assert trends['dates'] == ['2025-01-01', '2025-10-01']